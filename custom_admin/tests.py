@@ -1,3 +1,158 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.models import Order
+from restaurant.models import Category, MediaAsset, MenuItem
+from restaurant.query_plans import SUPPORTED_VENDORS, captured_full_scans
+from .views import dashboard_summary, order_event_stream
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        burgers = Category.objects.create(name='Burgers')
+        Category.objects.create(name='Hidden', is_active=False)
+        MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=burgers,
+                                is_featured=True, stock_quantity=8, low_stock_threshold=10)
+        MenuItem.objects.create(name='Ramza Special', description='Chicken', price='14.99', category=burgers,
+                                stock_quantity=50)
+        MenuItem.objects.create(name='Sold Out', description='Gone', price='9.99', category=burgers,
+                                stock_quantity=0, is_available=False)
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.client.force_login(self.admin)
+
+    def test_summary_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            summary = dashboard_summary()
+        self.assertEqual(summary, {
+            'total_categories': 1,
+            'total_items': 3,
+            'featured_items': 1,
+            # Uses each item's own threshold; unavailable items are not counted
+            'low_stock_items': 1,
+        })
+        with self.assertNumQueries(0):
+            dashboard_summary()
+
+    def test_dashboard_defers_image_galleries(self):
+        response = self.client.get(reverse('custom_admin:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('website_images', response.context)
+        self.assertContains(response, reverse('custom_admin:dashboard_website_images'))
+
+        for name in ('dashboard_website_images', 'dashboard_background_images'):
+            response = self.client.get(reverse(f'custom_admin:{name}'))
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Background Images')
+
+    def test_gallery_pages_through_the_media_inventory(self):
+        for n in range(30):
+            MediaAsset.objects.create(collection='static', owner_model='static', name=f'food-{n:02}.jpg',
+                                      label='Static Image', path=f'images/food-{n:02}.jpg', url=f'/static/images/food-{n:02}.jpg')
+
+        url = reverse('custom_admin:dashboard_website_images')
+        response = self.client.get(url, {'collection': 'static', 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image.name for image in response.context['page_obj']], [f'food-{n:02}.jpg' for n in range(24, 30)])
+        self.assertContains(response, 'Static Files (30)')
+
+    def test_orders_list_follows_cursors(self):
+        for n in range(20):
+            Order.objects.create(customer_name=f'Customer {n}', customer_phone='0800', subtotal='10.00', total='10.00')
+
+        url = reverse('custom_admin:orders')
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 15)
+        self.assertContains(response, 'About 20 orders')
+
+        response = self.client.get(url, {'cursor': response.context['page_obj'].older_cursor})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        self.assertContains(response, 'Newer')
+
+        # A mangled cursor falls back to the first page
+        response = self.client.get(url, {'cursor': 'garbage', 'status': 'pending'})
+        self.assertEqual(len(response.context['page_obj']), 15)
+
+    def test_admin_queries_stay_on_indexes(self):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            self.skipTest(f'No plan inspection for {connection.vendor}')
+        for n in range(20):
+            Order.objects.create(customer_name=f'Customer {n}', customer_phone='0800', subtotal='10.00', total='10.00')
+        older = self.client.get(reverse('custom_admin:orders')).context['page_obj'].older_cursor
+
+        requests = [
+            (reverse('custom_admin:dashboard'), {}),
+            (reverse('custom_admin:orders'), {}),
+            (reverse('custom_admin:orders'), {'status': 'pending'}),
+            (reverse('custom_admin:orders'), {'cursor': older}),
+            (reverse('custom_admin:orders'), {'cursor': older, 'status': 'pending'}),
+        ]
+        for url, params in requests:
+            cache.clear()
+            with self.subTest(url=url, params=params), CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+                self.assertEqual(captured_full_scans(captured.captured_queries), {})
+
+    def test_order_events_stream_replays_from_last_event_id(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Order.objects.create(customer_name='Thabo', customer_phone='0800', subtotal='10.00', total='10.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Order.objects.create(customer_name='Lerato', customer_phone='0800', subtotal='10.00', total='10.00')
+
+        with mock.patch('orders.events.STREAM_DURATION', 0), mock.patch('orders.events.REORDER_WINDOW', 0):
+            response = self.client.get(reverse('custom_admin:order_events'),
+                                       HTTP_LAST_EVENT_ID=str(first.events.get().pk))
+            body = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn(f'id: {second.events.get().pk}\nevent: order\n', body)
+        self.assertIn(f'data-order-id=\\"{second.pk}\\"', body)
+        self.assertNotIn(f'data-order-id=\\"{first.pk}\\"', body)
+
+    def test_order_events_stream_never_moves_last_event_id_back(self):
+        orders = []
+        for name in ('Thabo', 'Lerato', 'Sipho'):
+            with self.captureOnCommitCallbacks(execute=True):
+                orders.append(Order.objects.create(customer_name=name, customer_phone='0800', subtotal='10.00', total='10.00'))
+        second, third = orders[1].events.get(), orders[2].events.get()
+
+        # The second order's event commits after the third's was sent
+        with mock.patch('custom_admin.views.follow', return_value=iter([[third], [second]])):
+            body = ''.join(order_event_stream(orders[0].events.get().pk))
+
+        self.assertEqual(body.count(f'id: {third.pk}\nevent: order\n'), 2)
+        self.assertNotIn(f'id: {second.pk}\n', body)
+        self.assertIn(f'data-order-id=\\"{orders[1].pk}\\"', body)
+
+    def test_order_status_endpoints_enforce_the_lifecycle(self):
+        preparing = Order.objects.create(customer_name='A', customer_phone='0800', subtotal='10', total='10', status='preparing')
+        completed = Order.objects.create(customer_name='B', customer_phone='0800', subtotal='10', total='10', status='completed')
+
+        url = reverse('custom_admin:update_order_status', args=[completed.pk])
+        self.assertEqual(self.client.post(url, {'status': 'pending'}).status_code, 409)
+        self.assertEqual(self.client.post(url, {'status': 'bogus'}).status_code, 400)
+
+        response = self.client.post(
+            reverse('custom_admin:bulk_update_order_status'),
+            json.dumps({'status': 'ready', 'order_ids': [preparing.pk, completed.pk]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {
+            'success': True, 'moved': {'ready': [preparing.pk]}, 'rejected': {str(completed.pk): 'completed'},
+        })
 
-# Create your tests here.
+        for status in (['ready'], {'name': 'ready'}, 5):
+            with self.subTest(status=status):
+                response = self.client.post(
+                    reverse('custom_admin:bulk_update_order_status'),
+                    json.dumps({'status': status, 'order_ids': [preparing.pk]}),
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
@@ -7,9 +7,14 @@ urlpatterns = [
     path('', views.admin_login, name='login'),
     path('logout/', views.admin_logout, name='logout'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/website-images/', views.dashboard_website_images, name='dashboard_website_images'),
+    path('dashboard/background-images/', views.dashboard_background_images, name='dashboard_background_images'),
+    path('cache-stats/', views.cache_statistics, name='cache_stats'),
     
     # Menu Items
     path('menu-items/', views.menu_items, name='menu_items'),
+    path('menu-items/export/', views.export_menu_items, name='export_menu_items'),
+    path('menu-items/import/', views.import_menu_items, name='import_menu_items'),
     path('menu-items/add/', views.edit_menu_item, name='add_menu_item'),
     path('menu-items/edit/<int:item_id>/', views.edit_menu_item, name='edit_menu_item'),
     path('menu-items/delete/<int:item_id>/', views.delete_menu_item, name='delete_menu_item'),
@@ -21,8 +26,16 @@ urlpatterns = [
     
     # Orders
     path('orders/', views.orders, name='orders'),
+    path('orders/export/', views.export_orders, name='export_orders'),
+    path('orders/events/', views.order_events, name='order_events'),
+    path('orders/bulk-status/', views.bulk_update_order_status, name='bulk_update_order_status'),
     path('orders/update-status/<int:order_id>/', views.update_order_status, name='update_order_status'),
     
+    # Sales Reports
+    path('reports/sales/', views.sales_report, name='sales_report'),
+    path('reports/sales/series/', views.sales_report_series, name='sales_report_series'),
+    path('reports/sales/breakdown/', views.sales_report_breakdown, name='sales_report_breakdown'),
+    
     # Site Settings
     path('settings/', views.site_settings, name='site_settings'),
 ]
\ No newline at end of file
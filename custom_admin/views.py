@@ -2,15 +2,31 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.core.paginator import Paginator
-from django.db.models import Q
-from restaurant.models import MenuItem, Category, SiteSettings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from restaurant.backgrounds import background_index
+from restaurant.cache import cache_stats
+from restaurant.models import MenuItem, Category, MediaAsset, SiteSettings
+from restaurant.menu_io import FORMATS as MENU_FORMATS, export_rows, import_menu, read_rows, render_rows
+from restaurant.search import search_menu_items
 from orders.models import Order
+from orders.events import follow
+from orders.export import FORMATS as ORDER_EXPORT_FORMATS, export_queryset, iter_orders, render_orders
+from orders.lifecycle import InvalidTransition, apply_transitions, transition
+from orders.pagination import InvalidCursor, order_page
+from orders.rollups import MAX_HOURLY_BUCKETS, report_range, sales_series, sales_totals, top_sellers
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.utils import timezone
+import csv
+import io
 import json
 import os
+import time
+from datetime import datetime
 from pathlib import Path
 
 def is_admin(user):
@@ -50,105 +66,70 @@ def admin_logout(request):
 # Dashboard
 @admin_required
 def dashboard(request):
-    # Get statistics
-    total_items = MenuItem.objects.count()
-    total_categories = Category.objects.filter(is_active=True).count()
-    featured_items = MenuItem.objects.filter(is_featured=True, is_available=True).count()
-    low_stock_items = MenuItem.objects.filter(stock_quantity__lte=5, is_available=True).count()
-    
-    # Recent orders
-    recent_orders = Order.objects.all().order_by('-created_at')[:5]
-    
-    # Get website images for image gallery
-    website_images = get_website_images()
-    
-    # Get background images
-    background_images = get_background_images()
-    
-    context = {
-        'total_items': total_items,
-        'total_categories': total_categories,
-        'featured_items': featured_items,
-        'low_stock_items': low_stock_items,
-        'recent_orders': recent_orders,
-        'website_images': website_images,
-        'background_images': background_images,
-    }
+    # Image galleries are loaded separately by the page (see dashboard_*_images)
+    context = dict(dashboard_summary())
+    context['recent_orders'] = Order.objects.all().order_by('-created_at')[:5]
     return render(request, 'custom_admin/dashboard.html', context)
 
-def get_website_images():
-    """Get all images currently used on the website"""
-    images = {
-        'menu_items': [],
-        'categories': [],
-        'site_settings': [],
-        'static_images': [],
-    }
-    
-    try:
-        # Menu item images
-        menu_items_with_images = MenuItem.objects.filter(image__isnull=False).exclude(image='')
-        for item in menu_items_with_images:
-            if item.image:
-                images['menu_items'].append({
-                    'name': item.name,
-                    'image_url': item.image.url,
-                    'type': 'Menu Item',
-                    'status': 'Active' if item.is_available else 'Inactive',
-                    'featured': item.is_featured,
-                    'category': item.category.name if item.category else 'No Category'
-                })
-        
-        # Category images
-        categories_with_images = Category.objects.filter(image__isnull=False).exclude(image='')
-        for category in categories_with_images:
-            if category.image:
-                images['categories'].append({
-                    'name': category.name,
-                    'image_url': category.image.url,
-                    'type': 'Category',
-                    'status': 'Active' if category.is_active else 'Inactive',
-                    'sort_order': category.sort_order
-                })
-        
-        # Site settings images
-        try:
-            site_settings = SiteSettings.objects.first()
-            if site_settings:
-                if site_settings.logo:
-                    images['site_settings'].append({
-                        'name': 'Restaurant Logo',
-                        'image_url': site_settings.logo.url,
-                        'type': 'Site Logo',
-                        'status': 'Active'
-                    })
-                if site_settings.hero_image:
-                    images['site_settings'].append({
-                        'name': 'Hero Image',
-                        'image_url': site_settings.hero_image.url,
-                        'type': 'Hero Image',
-                        'status': 'Active'
-                    })
-        except:
-            pass
-        
-        # Static images from food folder
-        static_folder = os.path.join(settings.BASE_DIR, 'static', 'images')
-        if os.path.exists(static_folder):
-            for filename in os.listdir(static_folder):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
-                    images['static_images'].append({
-                        'name': filename,
-                        'image_url': f'/static/images/{filename}',
-                        'type': 'Static Image',
-                        'status': 'Available'
-                    })
-    
-    except Exception as e:
-        # If there's any error, return empty structure
-        pass
-    
-    return images
+DASHBOARD_SUMMARY_KEY = 'ramza:admin:dashboard_summary'
+
+def dashboard_summary():
+    """Dashboard statistics from one aggregate query, cached for DASHBOARD_SUMMARY_TIMEOUT seconds"""
+    summary = cache.get(DASHBOARD_SUMMARY_KEY)
+    if summary is not None:
+        cache_stats.record('dashboard_summary', True)
+        return summary
+
+    cache_stats.record('dashboard_summary', False)
+    # Every menu item has a category, so joining from categories sees each item exactly once
+    summary = Category.objects.aggregate(
+        total_categories=Count('pk', filter=Q(is_active=True), distinct=True),
+        total_items=Count('menu_items'),
+        featured_items=Count('menu_items', filter=Q(menu_items__is_featured=True, menu_items__is_available=True)),
+        low_stock_items=Count('menu_items', filter=Q(
+            menu_items__is_available=True,
+            menu_items__stock_quantity__lte=F('menu_items__low_stock_threshold'),
+        )),
+    )
+    cache.set(DASHBOARD_SUMMARY_KEY, summary, settings.DASHBOARD_SUMMARY_TIMEOUT)
+    return summary
+
+# Dashboard image galleries (fetched after the dashboard has rendered)
+GALLERY_PAGE_SIZE = 24
+
+@admin_required
+def dashboard_website_images(request):
+    """One page of one gallery tab, read from the media inventory"""
+    collections = dict(MediaAsset.COLLECTION_CHOICES)
+    collection = request.GET.get('collection', 'menu_items')
+    if collection not in collections and collection != 'backgrounds':
+        collection = 'menu_items'
+
+    counts = dict(MediaAsset.objects.order_by().values_list('collection').annotate(count=Count('id')))
+    tabs = [{'collection': key, 'label': label, 'count': counts.get(key, 0)} for key, label in collections.items()]
+    tabs.append({'collection': 'backgrounds', 'label': 'Backgrounds', 'count': len(background_index.images)})
+
+    if collection == 'backgrounds':
+        images = [
+            {'url': f'/static/images/background/{image.name}', 'name': image.name, 'label': 'Background Image',
+             'size_kb': round(image.size / 1024, 1)}
+            for image in background_index.images
+        ]
+    else:
+        images = MediaAsset.objects.filter(collection=collection).order_by('name', 'id')
+
+    paginator = Paginator(images, GALLERY_PAGE_SIZE)
+    return render(request, 'custom_admin/partials/website_images.html', {
+        'collection': collection,
+        'tabs': tabs,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    })
+
+@admin_required
+def dashboard_background_images(request):
+    return render(request, 'custom_admin/partials/background_images.html', {
+        'background_images': get_background_images(),
+    })
 
 def get_background_images():
     """Get all background images available for the website"""
@@ -160,34 +141,22 @@ def get_background_images():
     }
     
     try:
-        background_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'background')
-        
-        if os.path.exists(background_path):
-            background_files = []
-            
-            for filename in os.listdir(background_path):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
-                    file_path = os.path.join(background_path, filename)
-                    file_size = os.path.getsize(file_path)
-                    
-                    background_files.append({
-                        'name': filename,
-                        'display_name': filename.replace('-', ' ').replace('_', ' ').title(),
-                        'image_url': f'/static/images/background/{filename}',
-                        'file_size': round(file_size / 1024, 1),  # Size in KB
-                        'type': 'Background Image',
-                        'status': 'Active',
-                        'extension': filename.split('.')[-1].upper(),
-                        'added_date': 'Unknown'  # Could be enhanced with file modification time
-                    })
-            
-            background_images['images'] = sorted(background_files, key=lambda x: x['name'])
-            background_images['total_count'] = len(background_files)
-            
-            if len(background_files) == 0:
-                background_images['status'] = 'empty'
-        else:
-            background_images['status'] = 'folder_missing'
+        images = background_index.images
+        background_images['status'] = background_index.status
+        background_images['images'] = [
+            {
+                'name': image.name,
+                'display_name': image.name.replace('-', ' ').replace('_', ' ').title(),
+                'image_url': f'/static/images/background/{image.name}',
+                'file_size': round(image.size / 1024, 1),  # Size in KB
+                'type': 'Background Image',
+                'status': 'Active',
+                'extension': image.name.split('.')[-1].upper(),
+                'added_date': datetime.fromtimestamp(image.modified).strftime('%Y-%m-%d'),
+            }
+            for image in images
+        ]
+        background_images['total_count'] = len(images)
     
     except Exception as e:
         background_images['status'] = 'error'
@@ -195,6 +164,11 @@ def get_background_images():
     
     return background_images
 
+# Cache hit rates (per worker process)
+@admin_required
+def cache_statistics(request):
+    return JsonResponse({'caches': cache_stats.snapshot()})
+
 # Menu Items Management
 @admin_required
 def menu_items(request):
@@ -203,12 +177,13 @@ def menu_items(request):
     
     items = MenuItem.objects.all()
     
-    if search_query:
-        items = items.filter(Q(name__icontains=search_query) | Q(description__icontains=search_query))
-    
     if category_filter:
         items = items.filter(category_id=category_filter)
     
+    if search_query:
+        # Ranked full-text matches over name, description and ingredients
+        items = search_menu_items(search_query, items)
+    
     paginator = Paginator(items, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -223,6 +198,43 @@ def menu_items(request):
     }
     return render(request, 'custom_admin/menu_items.html', context)
 
+# Menu Import / Export
+@admin_required
+def export_menu_items(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in MENU_FORMATS:
+        return JsonResponse({'success': False, 'error': f'Unknown format: {fmt}'}, status=400)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/json'
+    response = StreamingHttpResponse(render_rows(export_rows(), fmt), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="menu-{datetime.now():%Y%m%d}.{fmt}"'
+    return response
+
+@admin_required
+def import_menu_items(request):
+    if request.method != 'POST' or not request.FILES.get('file'):
+        messages.error(request, 'Choose a CSV or JSON file to import.')
+        return redirect('custom_admin:menu_items')
+
+    upload = request.FILES['file']
+    fmt = os.path.splitext(upload.name)[1].lstrip('.').lower()
+    if fmt not in MENU_FORMATS:
+        messages.error(request, 'Menu imports must be .csv or .json files.')
+        return redirect('custom_admin:menu_items')
+
+    try:
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = import_menu(read_rows(stream, fmt))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        messages.error(request, f'Nothing was imported. {e}')
+        return redirect('custom_admin:menu_items')
+
+    messages.success(
+        request,
+        f'Imported {result.rows} rows in {result.seconds:.1f}s: {result.created} new items, '
+        f'{result.updated} updated, {result.categories_created} new categories.',
+    )
+    return redirect('custom_admin:menu_items')
+
 # Add/Edit Menu Item
 @user_passes_test(is_admin)
 def edit_menu_item(request, item_id=None):
@@ -325,22 +337,84 @@ def edit_category(request, category_id=None):
 @user_passes_test(is_admin)
 def orders(request):
     status_filter = request.GET.get('status', '')
-    
-    orders = Order.objects.all().order_by('-created_at')
-    
-    if status_filter:
-        orders = orders.filter(status=status_filter)
-    
-    paginator = Paginator(orders, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if status_filter not in dict(Order.ORDER_STATUS_CHOICES):
+        status_filter = ''
+
+    try:
+        page_obj = order_page(status_filter, request.GET.get('cursor') or None)
+    except InvalidCursor:
+        page_obj = order_page(status_filter)
     
     context = {
         'page_obj': page_obj,
         'status_filter': status_filter,
+        'status_choices': Order.ORDER_STATUS_CHOICES,
+        'order_type_choices': Order.ORDER_TYPE_CHOICES,
     }
     return render(request, 'custom_admin/orders.html', context)
 
+# Order Export (streamed, so month-end exports never sit in memory)
+@user_passes_test(is_admin)
+def export_orders(request):
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ORDER_EXPORT_FORMATS:
+        return JsonResponse({'success': False, 'error': f'Unknown format: {fmt}'}, status=400)
+    try:
+        queryset = export_queryset(
+            request.GET.get('status'), request.GET.get('order_type'), request.GET.get('start'), request.GET.get('end'),
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        render_orders(iter_orders(queryset), fmt), content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="orders-{datetime.now():%Y%m%d}.{fmt}"'
+    return response
+
+# Live Order Board (server-sent events)
+# Browsers wait this long (ms) before reconnecting when a stream ends
+ORDER_STREAM_RETRY_MS = 1000
+
+# Comment line sent after this many idle seconds so proxies keep the connection open
+ORDER_STREAM_HEARTBEAT = 15
+
+@user_passes_test(is_admin)
+def order_events(request):
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(order_event_stream(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def order_event_stream(last_event_id):
+    yield f'retry: {ORDER_STREAM_RETRY_MS}\n\n'
+    last_sent = time.monotonic()
+    # Sent as the SSE id so the browser's Last-Event-ID only moves forward: a late
+    # event that committed out of order carries the highest id already delivered
+    resume_id = last_event_id or 0
+    for events in follow(last_event_id):
+        for event in events:
+            resume_id = max(resume_id, event.pk)
+            data = {
+                'id': event.order_id,
+                'kind': event.kind,
+                'status': event.order.status,
+                'html': render_to_string('custom_admin/partials/order_card.html', {'order': event.order}),
+            }
+            yield f'id: {resume_id}\nevent: order\ndata: {json.dumps(data)}\n\n'
+            last_sent = time.monotonic()
+        if time.monotonic() - last_sent >= ORDER_STREAM_HEARTBEAT:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+
 # Update Order Status
 @csrf_exempt
 @user_passes_test(is_admin)
@@ -348,11 +422,108 @@ def update_order_status(request, order_id):
     if request.method == 'POST':
         order = get_object_or_404(Order, id=order_id)
         new_status = request.POST.get('status')
-        order.status = new_status
-        order.save()
+        try:
+            moved, rejected = transition([order.id], new_status)
+        except InvalidTransition as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        if rejected:
+            error = f'Order #{order.id} cannot move from {order.get_status_display()} to {new_status}'
+            return JsonResponse({'success': False, 'error': error}, status=409)
         return JsonResponse({'success': True, 'status': new_status})
     return JsonResponse({'success': False})
 
+# Bulk Order Status Update
+@user_passes_test(is_admin)
+def bulk_update_order_status(request):
+    """
+    POST {"transitions": [{"status": "ready", "order_ids": [1, 2]}, ...]}
+    (or a single {"status": ..., "order_ids": [...]}). Orders that may not
+    make their move are skipped and reported back with their status.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    try:
+        payload = json.loads(request.body)
+        groups = payload.get('transitions') or [payload]
+        groups = [(group['status'], [int(pk) for pk in group['order_ids']]) for group in groups]
+        if not all(isinstance(status, str) for status, _ in groups):
+            raise TypeError('status must be a string')
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+
+    try:
+        moved, rejected = apply_transitions(groups)
+    except InvalidTransition as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'moved': moved, 'rejected': rejected})
+
+# Sales Reports (read from the rollup tables only)
+REPORT_RANGES = [(1, 'Today'), (7, 'Last 7 days'), (30, 'Last 30 days'), (90, 'Last 90 days'), (365, 'Last year')]
+MAX_REPORT_DAYS = 366
+REPORT_TOP_SELLERS = 10
+
+def report_days(request, default=7):
+    try:
+        days = int(request.GET.get('days', default))
+    except ValueError:
+        days = default
+    return min(max(days, 1), MAX_REPORT_DAYS)
+
+@user_passes_test(is_admin)
+def sales_report(request):
+    days = report_days(request)
+    start, end = report_range(days)
+    context = {
+        'days': days,
+        'report_ranges': REPORT_RANGES,
+        'totals': sales_totals(start, end),
+        'top_items': top_sellers(start, end, 'item', REPORT_TOP_SELLERS),
+        'top_categories': top_sellers(start, end, 'category', REPORT_TOP_SELLERS),
+    }
+    return render(request, 'custom_admin/sales_report.html', context)
+
+@user_passes_test(is_admin)
+def sales_report_series(request):
+    """Chart data: revenue, orders, average basket and units per hour or day"""
+    days = report_days(request)
+    period = request.GET.get('period') or ('hour' if days <= 2 else 'day')
+    if period not in ('hour', 'day'):
+        return JsonResponse({'success': False, 'error': f'Unknown period: {period}'}, status=400)
+    if period == 'hour' and days * 24 > MAX_HOURLY_BUCKETS:
+        return JsonResponse(
+            {'success': False, 'error': f'Hourly data covers at most {MAX_HOURLY_BUCKETS // 24} days'}, status=400,
+        )
+
+    series = sales_series(period, *report_range(days))
+    label_format = '%d %b %H:%M' if period == 'hour' else '%d %b'
+    return JsonResponse({
+        'success': True,
+        'period': period,
+        'labels': [timezone.localtime(rollup.start).strftime(label_format) for rollup in series],
+        'revenue': [str(rollup.revenue) for rollup in series],
+        'orders': [rollup.order_count for rollup in series],
+        'average_basket': [str(rollup.average_basket) for rollup in series],
+        'units': [rollup.units for rollup in series],
+    })
+
+@user_passes_test(is_admin)
+def sales_report_breakdown(request):
+    """Chart data: best selling menu items or categories (?by=item|category)"""
+    by = request.GET.get('by', 'item')
+    if by not in ('item', 'category'):
+        return JsonResponse({'success': False, 'error': f'Unknown breakdown: {by}'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', REPORT_TOP_SELLERS)), 1), 100)
+    except ValueError:
+        limit = REPORT_TOP_SELLERS
+
+    rows = top_sellers(*report_range(report_days(request)), by=by, limit=limit)
+    return JsonResponse({
+        'success': True,
+        'by': by,
+        'rows': [dict(row, revenue=str(row['revenue'])) for row in rows],
+    })
+
 # Site Settings
 @user_passes_test(is_admin)
 def site_settings(request):
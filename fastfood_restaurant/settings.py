@@ -170,14 +170,67 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # WhiteNoise configuration for production
 if not DEBUG:
-    # Simplified static file serving with WhiteNoise
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    # WhiteNoise's hashed, compressed storage; collectstatic also writes
+    # resized JPEG/WebP copies of bundled images (restaurant.staticfiles)
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'restaurant.staticfiles.OptimizedStaticFilesStorage'},
+    }
     
     # Additional WhiteNoise settings
     WHITENOISE_USE_FINDERS = True
     WHITENOISE_AUTOREFRESH = True
     WHITENOISE_MANIFEST_STRICT = False
 
+# Caching
+# Each worker caches pages and {% cache %} fragments in its own memory, keyed by
+# digests of the content they render. Those digests come from snapshots that follow
+# the dataset versions shared through the database (restaurant.cache), so an edit in
+# any worker moves every worker to new keys within CACHE_VERSION_CHECK_INTERVAL and
+# long timeouts only affect memory use.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'template_fragments': {
+        'BACKEND': 'restaurant.cache_backends.InstrumentedLocMemCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 60 * 60))
+
+# How often (seconds) each worker re-reads the shared dataset versions (restaurant.DataVersion);
+# a change made in one worker reaches the others' snapshots within this long
+CACHE_VERSION_CHECK_INTERVAL = float(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 1))
+
+# How long (seconds) an order's Idempotency-Key replays the original response
+ORDER_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# How long (seconds) order events are kept for live order boards reconnecting with Last-Event-ID
+ORDER_EVENT_RETENTION = 24 * 60 * 60
+
+# How long (seconds) a menu change waits before the change feed publishes it; must outlast the
+# longest transaction that logs menu changes, or a client can skip past a change committed late
+MENU_CHANGE_FEED_LAG = int(os.environ.get('MENU_CHANGE_FEED_LAG', 5))
+
+# Popular items on the home page: a sale counts half as much after this many days
+# (run rebuild_popularity after changing it)
+POPULARITY_HALF_LIFE_DAYS = float(os.environ.get('POPULARITY_HALF_LIFE_DAYS', 7))
+
+# How long (seconds) the admin dashboard statistics may be stale
+DASHBOARD_SUMMARY_TIMEOUT = int(os.environ.get('DASHBOARD_SUMMARY_TIMEOUT', 30))
+
+# Resized WebP/JPEG copies of uploaded images are built on a thread pool after upload
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+IMAGE_VARIANTS_ASYNC = True
+
+# Processes collectstatic uses to optimize bundled images (default: one per CPU)
+STATIC_IMAGE_WORKERS = int(os.environ.get('STATIC_IMAGE_WORKERS', 0)) or None
+
+# Background image rotation: 'path' (stable per URL), 'daily' or 'random'
+BACKGROUND_ROTATION = os.environ.get('BACKGROUND_ROTATION', 'path')
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -23,6 +23,8 @@ from restaurant.views import home, menu, cart, checkout
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('dashboard/', include('custom_admin.urls')),
+    path('api/', include('menu.urls')),
+    path('orders/', include('orders.urls')),
     path('', home, name='home'),
     path('menu/', menu, name='menu'),
     path('cart/', cart, name='cart'),
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MenuConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'menu'
+
+    def ready(self):
+        # Register change log receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,98 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from restaurant.models import Category, MenuItem
+from .models import MenuChange
+
+MENU_ITEM_FIELDS = (
+    'name', 'description', 'price', 'category_id', 'is_available', 'is_featured',
+    'stock_quantity', 'low_stock_threshold', 'image', 'updated_at',
+)
+CATEGORY_FIELDS = ('name', 'description', 'sort_order', 'is_active', 'image', 'updated_at')
+
+MODEL_NAMES = {MenuItem: 'menu_item', Category: 'category'}
+MODEL_FIELDS = {MenuItem: MENU_ITEM_FIELDS, Category: CATEGORY_FIELDS}
+
+_pause_lock = threading.Lock()
+_paused = 0
+
+
+@contextmanager
+def paused():
+    """Log no changes from any thread of this process, e.g. for throwaway rows a load test creates"""
+    global _paused
+    with _pause_lock:
+        _paused += 1
+    try:
+        yield
+    finally:
+        with _pause_lock:
+            _paused -= 1
+
+
+def snapshot(instance):
+    """JSON-safe state of a MenuItem or Category as published in the change feed"""
+    data = {}
+    for field in MODEL_FIELDS[type(instance)]:
+        value = getattr(instance, field)
+        if field == 'image':
+            value = value.url if value else None
+        elif field == 'price':
+            value = str(value)
+        elif field == 'updated_at':
+            value = value.isoformat() if value else None
+        data[field] = value
+    return data
+
+
+def record_change(instance, action):
+    if _paused:
+        return None
+    return MenuChange.objects.create(
+        model=MODEL_NAMES[type(instance)],
+        object_id=instance.pk,
+        action=action,
+        data={} if action == 'delete' else snapshot(instance),
+    )
+
+
+def record_updates(model, ids):
+    """
+    Log 'update' entries for rows changed with queryset.update() or F()
+    expressions, which never fire post_save. Reads the rows back in one query.
+    """
+    ids = list(ids)
+    if not ids or _paused:
+        return []
+    return MenuChange.objects.bulk_create([
+        MenuChange(model=MODEL_NAMES[model], object_id=instance.pk, action='update', data=snapshot(instance))
+        for instance in model.objects.filter(pk__in=ids).order_by('pk')
+    ])
+
+
+def latest_change_ids(since=0, until=None):
+    """Ids of the newest change per object after `since`; older entries are superseded"""
+    changes = MenuChange.objects.filter(id__gt=since)
+    if until is not None:
+        changes = changes.filter(created_at__lte=until)
+    return changes.values('model', 'object_id').annotate(latest=Max('id')).values('latest')
+
+
+def changes_since(since, limit):
+    """
+    Compacted changes newer than `since`, oldest first. Ids are taken when a
+    change is written but seen only once its transaction commits, so a newer
+    id can become visible first; changes younger than MENU_CHANGE_FEED_LAG
+    seconds are held back until any older ones still in flight have landed.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.MENU_CHANGE_FEED_LAG)
+    return list(MenuChange.objects.filter(id__in=latest_change_ids(since, settled)).order_by('id')[:limit])
+
+
+def compact():
+    """Delete every change superseded by a newer one for the same object"""
+    deleted, _ = MenuChange.objects.exclude(id__in=latest_change_ids()).delete()
+    return deleted
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from menu.changelog import compact
+
+
+class Command(BaseCommand):
+    help = 'Drop menu change log entries superseded by a newer change to the same object'
+
+    def handle(self, *args, **options):
+        deleted = compact()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} superseded menu changes'))
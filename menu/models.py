@@ -1,3 +1,35 @@
 from django.db import models
 
-# Create your models here.
+
+class MenuChange(models.Model):
+    """
+    Append-only log of menu edits for delta-syncing clients (POS, kiosks,
+    delivery aggregators). The auto-increment id is the sync version:
+    a client stores the highest id it has seen and asks for everything newer.
+    """
+    MODEL_CHOICES = [
+        ('menu_item', 'Menu Item'),
+        ('category', 'Category'),
+    ]
+
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    data = models.JSONField(default=dict, blank=True, help_text='State of the object after the change (empty for deletes)')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Latest change per object, used by feed and log compaction
+            models.Index(fields=['model', 'object_id', 'id'], name='menu_change_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.id} {self.action} {self.model} {self.object_id}'
@@ -0,0 +1,41 @@
+from rest_framework import serializers
+
+
+class SparseFieldsMixin:
+    """
+    Let clients ask for a subset of fields, e.g. ?fields=id,name,price.
+    Unknown field names are ignored.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class MenuItemSerializer(SparseFieldsMixin, serializers.Serializer):
+    """Serializes restaurant.catalog.CatalogItem tuples"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    description = serializers.CharField()
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+    category = serializers.CharField()
+    category_id = serializers.IntegerField()
+    image = serializers.CharField(allow_null=True)
+    is_featured = serializers.BooleanField()
+    updated_at = serializers.DateTimeField()
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.Serializer):
+    """Serializes restaurant.catalog.CatalogCategory tuples"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    description = serializers.CharField()
+    image = serializers.CharField(allow_null=True)
+    sort_order = serializers.IntegerField()
+    item_count = serializers.SerializerMethodField()
+    updated_at = serializers.DateTimeField()
+
+    def get_item_count(self, category):
+        return len(category.items)
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from restaurant.models import Category, MenuItem
+from restaurant.signals import menu_items_updated
+from .changelog import record_change, record_updates
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Category)
+def log_menu_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # Skip fixture loading
+        return
+    record_change(instance, 'create' if created else 'update')
+
+
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Category)
+def log_menu_delete(sender, instance, **kwargs):
+    record_change(instance, 'delete')
+
+
+@receiver(menu_items_updated)
+def log_menu_bulk_update(sender, ids, **kwargs):
+    record_updates(MenuItem, ids)
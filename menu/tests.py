@@ -1,3 +1,221 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.recommendations import add_baskets
+from restaurant.models import Category, DataVersion, MenuItem
+
+from .changelog import paused
+from .models import MenuChange
+
+
+class MenuAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.burgers = Category.objects.create(name='Burgers')
+        self.items = [
+            MenuItem.objects.create(name=f'Burger {n}', description='Beef', price='10.00', category=self.burgers)
+            for n in range(5)
+        ]
+
+    def test_cursor_pagination_walks_every_item(self):
+        names = []
+        url = '/api/menu/?page_size=2'
+        while url:
+            payload = self.client.get(url).json()
+            names += [item['name'] for item in payload['results']]
+            url = payload['next']
+        self.assertEqual(names, [f'Burger {n}' for n in range(5)])
+
+    def test_cursor_survives_its_item_leaving_the_menu(self):
+        next_url = self.client.get('/api/menu/?page_size=2').json()['next']
+        self.items[1].delete()
+
+        payload = self.client.get(next_url).json()
+        self.assertEqual([item['name'] for item in payload['results']], ['Burger 2', 'Burger 3'])
+
+    def test_cursor_seeks_past_mixed_case_names(self):
+        # Databases may collate 'apple' between 'Burger 0' and 'Zinger'; the cursor follows the catalog's order
+        MenuItem.objects.create(name='apple pie', description='Sweet', price='4.00', category=self.burgers)
+        MenuItem.objects.create(name='Zinger', description='Spicy', price='9.00', category=self.burgers)
+        DataVersion.objects.filter(name='catalog').update(token='new-items')
+        cache.clear()
+        names = []
+        url = '/api/menu/?page_size=3'
+        while url:
+            payload = self.client.get(url).json()
+            names += [item['name'] for item in payload['results']]
+            url = payload['next']
+            # Every cursor also resumes correctly after its item leaves the menu
+            if url:
+                MenuItem.objects.filter(name=names[-1]).update(is_available=False)
+                DataVersion.objects.filter(name='catalog').update(token=f'hidden-{len(names)}')
+                cache.clear()
+        self.assertEqual(names, [f'Burger {n}' for n in range(5)] + ['Zinger', 'apple pie'])
+
+    def test_gzip_refused_with_zero_quality(self):
+        response = self.client.get('/api/categories/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.json()[0]['item_count'], 5)
+        response = self.client.get('/api/categories/', HTTP_ACCEPT_ENCODING='br, *;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_sparse_fields(self):
+        payload = self.client.get('/api/menu/?fields=id,price').json()
+        self.assertEqual(payload['results'][0], {'id': self.items[0].id, 'price': '10.00'})
+
+    def test_gzip_body_and_etag(self):
+        response = self.client.get('/api/categories/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        categories = json.loads(gzip.decompress(response.content))
+        self.assertEqual(categories[0]['item_count'], 5)
+
+        gzip_etag = response['ETag']
+        identity_etag = self.client.get('/api/categories/')['ETag']
+        self.assertNotEqual(gzip_etag, identity_etag)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=gzip_etag)
+        self.assertEqual(response.status_code, 304)
+        # A client that switched codings still holds a current copy
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=gzip_etag, HTTP_ACCEPT_ENCODING='identity')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], identity_etag)
+
+    def test_etag_changes_with_catalog(self):
+        etag = self.client.get(f'/api/menu/{self.items[0].id}/')['ETag']
+        self.items[0].price = '11.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[0].save()
+
+        response = self.client.get(f'/api/menu/{self.items[0].id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['price'], '11.00')
+
+    def test_change_in_another_worker_refreshes_cached_body(self):
+        url = f'/api/menu/{self.items[0].id}/'
+        self.assertEqual(self.client.get(url).json()['price'], '10.00')
+        MenuItem.objects.filter(pk=self.items[0].pk).update(price='12.00', updated_at=timezone.now())
+        DataVersion.objects.filter(name='catalog').update(token='other-worker')
+
+        # This worker's copy of the shared versions expires
+        cache.delete('ramza:version:catalog')
+        self.assertEqual(self.client.get(url).json()['price'], '12.00')
+
+    def test_unknown_item_and_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/menu/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/menu/?cursor=garbage').status_code, 404)
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/menu/search/', {'q': 'burgr 3', 'fields': 'id,name'})
+        self.assertEqual(response.json(), {'query': 'burgr 3', 'results': [{'id': self.items[3].id, 'name': 'Burger 3'}]})
+        self.assertEqual(len(self.client.get('/api/menu/search/', {'q': 'bur', 'limit': 2}).json()['results']), 2)
+
+    def test_search_limit_reaches_every_item_on_the_menu(self):
+        MenuItem.objects.bulk_create([
+            MenuItem(name=f'Burger {n}', description='Beef', price='10.00', category=self.burgers) for n in range(5, 60)
+        ])
+        DataVersion.objects.filter(name='catalog').update(token='more-burgers')
+        cache.clear()
+        self.assertEqual(len(self.client.get('/api/menu/search/', {'q': 'bur', 'limit': 60}).json()['results']), 60)
+        self.assertEqual(len(self.client.get('/api/menu/search/', {'q': 'bur', 'limit': 500}).json()['results']), 60)
+
+
+class RecommendationAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Menu')
+        self.burger, self.cola, self.fries = [
+            MenuItem.objects.create(name=name, description='Tasty', price='5.00', category=category)
+            for name in ('Burger', 'Cola', 'Fries')
+        ]
+
+    def recommended(self, items):
+        return [item['name'] for item in self.client.get('/api/recommendations/', {'items': items}).json()['results']]
+
+    def test_recommends_items_ordered_together(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            add_baskets([[self.burger.id, self.cola.id]] * 2 + [[self.burger.id, self.fries.id]] * 2)
+        self.assertEqual(self.recommended(f'{self.cola.id}'), ['Burger'])
+        self.assertEqual(self.recommended(f'{self.burger.id},x'), ['Cola', 'Fries'])
+
+        # New orders change the answer despite the cached body (other workers follow within CACHE_VERSION_CHECK_INTERVAL)
+        with self.captureOnCommitCallbacks(execute=True):
+            add_baskets([[self.fries.id, self.cola.id]] * 2)
+        self.assertEqual(self.recommended(f'{self.cola.id}'), ['Burger', 'Fries'])
+
+        # Items off the menu are not suggested
+        self.fries.is_available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fries.save()
+        self.assertEqual(self.recommended(f'{self.burger.id}'), ['Cola'])
+
+
+@override_settings(MENU_CHANGE_FEED_LAG=0)
+class MenuChangeFeedTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Burgers')
+        self.item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='10.00', category=self.category)
+
+    def test_client_syncs_only_what_changed(self):
+        version = self.client.get('/api/changes/').json()['version']
+
+        self.item.price = '12.00'
+        self.item.save()
+        self.item.stock_quantity = 3
+        self.item.save()
+
+        payload = self.client.get(f'/api/changes/?since={version}').json()
+        self.assertEqual(len(payload['changes']), 1)
+        change = payload['changes'][0]
+        self.assertEqual((change['model'], change['id'], change['action']), ('menu_item', self.item.id, 'update'))
+        self.assertEqual(change['data']['price'], '12.00')
+        self.assertEqual(change['data']['stock_quantity'], 3)
+        self.assertGreater(payload['version'], version)
+
+    def test_deletes_are_published(self):
+        version = self.client.get('/api/changes/').json()['version']
+        item_id = self.item.id
+        self.item.delete()
+
+        change = self.client.get(f'/api/changes/?since={version}').json()['changes'][0]
+        self.assertEqual((change['id'], change['action'], change['data']), (item_id, 'delete', {}))
+
+    def test_paging_and_compaction(self):
+        for price in ('11.00', '12.00', '13.00'):
+            self.item.price = price
+            self.item.save()
+
+        first = self.client.get('/api/changes/?limit=1').json()
+        self.assertTrue(first['has_more'])
+        second = self.client.get(f"/api/changes/?since={first['version']}&limit=1").json()
+        self.assertFalse(second['has_more'])
+        self.assertEqual(second['changes'][0]['data']['price'], '13.00')
+
+        call_command('compact_menu_changes', stdout=StringIO())
+        self.assertEqual(MenuChange.objects.count(), 2)
+        self.assertEqual(self.client.get('/api/changes/').json()['changes'], first['changes'] + second['changes'])
+
+    def test_recent_changes_wait_for_earlier_transactions(self):
+        version = self.client.get('/api/changes/').json()['version']
+        self.item.price = '12.00'
+        self.item.save()
+
+        with self.settings(MENU_CHANGE_FEED_LAG=60):
+            self.assertEqual(self.client.get(f'/api/changes/?since={version}').json()['changes'], [])
+        MenuChange.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        with self.settings(MENU_CHANGE_FEED_LAG=60):
+            self.assertEqual(len(self.client.get(f'/api/changes/?since={version}').json()['changes']), 1)
+
+    def test_paused_changelog_records_nothing(self):
+        before = MenuChange.objects.count()
+        with paused():
+            item = MenuItem.objects.create(name='Benchmark Burger', description='Load', price='10.00', category=self.category)
+            item.delete()
+        self.assertEqual(MenuChange.objects.count(), before)
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = 'menu'
+
+urlpatterns = [
+    path('menu/', views.MenuItemList.as_view(), name='item_list'),
+    path('menu/search/', views.MenuSearch.as_view(), name='item_search'),
+    path('menu/<int:item_id>/', views.MenuItemDetail.as_view(), name='item_detail'),
+    path('recommendations/', views.Recommendations.as_view(), name='recommendations'),
+    path('categories/', views.CategoryList.as_view(), name='category_list'),
+    path('changes/', views.MenuChangeFeed.as_view(), name='change_feed'),
+]
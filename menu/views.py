@@ -1,3 +1,263 @@
-from django.shortcuts import render
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from restaurant.cache import cache_stats
+from restaurant.catalog import get_catalog
+from restaurant.instant_search import get_search_index
+from orders.recommendations import get_recommendation_index, recommend
+from .changelog import changes_since
+from .serializers import CategorySerializer, MenuItemSerializer
 
-# Create your views here.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CHANGE_FEED_LIMIT = 500
+MAX_CHANGE_FEED_LIMIT = 5000
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+RECOMMENDATION_LIMIT = 4
+MAX_RECOMMENDATION_LIMIT = 20
+
+# Cart items a recommendation request may name
+MAX_RECOMMENDATION_ITEMS = 50
+
+# Bodies are keyed by the digest of this worker's catalog, which is rebuilt within
+# CACHE_VERSION_CHECK_INTERVAL of a change in any worker; the timeout only frees memory
+API_CACHE_TIMEOUT = 60 * 60
+
+
+def encode_cursor(key):
+    """Cursor pointing just past `key`, a catalog sort key (see MenuCatalog.sort_key)"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(key, list) or [type(value) for value in key] != [int, str, int, str, int]:
+            raise ValueError(cursor)
+        return tuple(key)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise NotFound('Invalid cursor')
+
+
+def accepts_gzip(request):
+    """Whether Accept-Encoding allows gzip: listed (or covered by *) without q=0"""
+    accepted = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    return accepted.get('gzip', accepted.get('*', 0.0)) > 0
+
+
+def requested_fields(request):
+    fields = request.query_params.get('fields', '')
+    return [name.strip() for name in fields.split(',') if name.strip()] or None
+
+
+def requested_page_size(request, param='page_size', default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        page_size = int(request.query_params.get(param, default))
+    except ValueError:
+        return default
+    return max(1, min(page_size, maximum))
+
+
+class CatalogAPIView(ABC, APIView):
+    """
+    Read-only view over the compiled menu catalog.
+
+    The JSON body for a given URL is rendered and gzipped once per catalog
+    version, then served from cache with a strong ETag, so polling clients
+    cost a cache lookup (or a 304) rather than a serializer run. The gzip
+    and identity bodies are different representations, so each has its own
+    ETag; a client holding either gets a 304.
+    """
+
+    @abstractmethod
+    def build_payload(self, request, catalog, **kwargs):
+        """The data to render for this request, read from `catalog`; URL kwargs are passed through"""
+
+    def content_digest(self, catalog):
+        """Digest of everything the payload is built from"""
+        return catalog.digest
+
+    def get(self, request, **kwargs):
+        catalog = get_catalog()
+        url = request.build_absolute_uri()
+        version = hashlib.sha1(f'{self.content_digest(catalog)}|{url}'.encode('utf-8')).hexdigest()
+        use_gzip = accepts_gzip(request)
+        etags = (f'"{version}"', f'"{version}-gz"')
+        etag = etags[use_gzip]
+
+        if set(etags) & set(parse_etags(request.headers.get('If-None-Match', ''))):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+        key = f'ramza:api:{version}'
+        bodies = cache.get(key)
+        cache_stats.record('api', bodies is not None)
+        if bodies is None:
+            body = JSONRenderer().render(self.build_payload(request, catalog, **kwargs))
+            bodies = (body, gzip.compress(body))
+            cache.set(key, bodies, API_CACHE_TIMEOUT)
+
+        body, compressed = bodies
+        if use_gzip:
+            response = HttpResponse(compressed, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class MenuItemList(CatalogAPIView):
+    """Available items in catalog order, cursor paginated: ?cursor=&page_size=&fields="""
+
+    def build_payload(self, request, catalog):
+        start = 0
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            after = decode_cursor(cursor)
+            item = catalog.get_item(after[-1])
+            if item is not None and catalog.sort_key(item) == after:
+                start = catalog.positions[item.id] + 1
+            else:
+                # The item was deleted, hidden or renamed since: resume at the first item sorting after it
+                start = next(
+                    (index for index, item in enumerate(catalog.items) if catalog.sort_key(item) > after),
+                    len(catalog.items),
+                )
+
+        page_size = requested_page_size(request)
+        page = catalog.items[start:start + page_size]
+
+        url = request.build_absolute_uri()
+        next_url = None
+        if start + page_size < len(catalog.items):
+            next_url = replace_query_param(url, 'cursor', encode_cursor(catalog.sort_key(page[-1])))
+
+        return {
+            'count': len(catalog.items),
+            'next': next_url,
+            'results': MenuItemSerializer(page, many=True, fields=requested_fields(request)).data,
+        }
+
+
+class MenuItemDetail(CatalogAPIView):
+    def build_payload(self, request, catalog, item_id):
+        item = catalog.get_item(item_id)
+        if item is None:
+            raise NotFound('Menu item not found')
+        return MenuItemSerializer(item, fields=requested_fields(request)).data
+
+
+class MenuSearch(CatalogAPIView):
+    """
+    Instant search: ?q=<words>&limit=&fields=; matches word prefixes and
+    tolerates typos. The limit may go up to the size of the menu, so the
+    menu page can ask for every match of the cards it rendered.
+    """
+
+    def build_payload(self, request, catalog):
+        query = request.query_params.get('q', '')
+        limit = requested_page_size(request, param='limit', default=SEARCH_LIMIT,
+                                    maximum=max(MAX_SEARCH_LIMIT, len(catalog)))
+        results = get_search_index().search(query, limit=limit)
+        return {
+            'query': query,
+            'results': MenuItemSerializer(results, many=True, fields=requested_fields(request)).data,
+        }
+
+
+class Recommendations(CatalogAPIView):
+    """Frequently ordered together: ?items=<id>,<id>&limit=&fields=; add-ons for a cart"""
+
+    def content_digest(self, catalog):
+        return f'{catalog.digest}|{get_recommendation_index().digest}'
+
+    def build_payload(self, request, catalog):
+        item_ids = []
+        for value in request.query_params.get('items', '').split(','):
+            try:
+                item_ids.append(int(value))
+            except ValueError:
+                continue
+        if len(item_ids) > MAX_RECOMMENDATION_ITEMS:
+            raise ValidationError({'items': f'At most {MAX_RECOMMENDATION_ITEMS} items'})
+
+        limit = requested_page_size(request, param='limit', default=RECOMMENDATION_LIMIT,
+                                    maximum=MAX_RECOMMENDATION_LIMIT)
+        # Neighbors that are off the menu are skipped
+        results = [item for item in map(catalog.get_item, recommend(item_ids)) if item is not None][:limit]
+        return {
+            'items': item_ids,
+            'results': MenuItemSerializer(results, many=True, fields=requested_fields(request)).data,
+        }
+
+
+class CategoryList(CatalogAPIView):
+    def build_payload(self, request, catalog):
+        return CategorySerializer(catalog.categories, many=True, fields=requested_fields(request)).data
+
+
+class MenuChangeFeed(APIView):
+    """
+    Delta-sync feed: ?since=<version>&limit=<n>.
+
+    Returns only the newest change per object after `since`, oldest first.
+    Clients apply the changes, store `version` and ask again with it;
+    `has_more` means another page is waiting. A change shows up
+    MENU_CHANGE_FEED_LAG seconds after it is made.
+    """
+
+    def get(self, request):
+        try:
+            since = max(0, int(request.query_params.get('since', 0)))
+        except ValueError:
+            raise ValidationError({'since': 'Must be an integer version.'})
+        limit = requested_page_size(request, param='limit', default=CHANGE_FEED_LIMIT, maximum=MAX_CHANGE_FEED_LIMIT)
+
+        changes = changes_since(since, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        return Response({
+            'since': since,
+            'version': changes[-1].id if changes else since,
+            'has_more': has_more,
+            'changes': [
+                {
+                    'version': change.id,
+                    'model': change.model,
+                    'id': change.object_id,
+                    'action': change.action,
+                    'data': change.data,
+                }
+                for change in changes
+            ],
+        })
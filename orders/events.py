@@ -0,0 +1,108 @@
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import OrderEvent
+
+# Seconds a stream stays open before the browser reconnects; keeps a worker
+# from being held past gunicorn's request timeout
+STREAM_DURATION = 55
+
+# How often a waiting stream re-reads the event log for other workers' events
+POLL_INTERVAL = 2
+
+# Most events sent in one go when a reconnecting board catches up
+REPLAY_BATCH = 200
+
+# Ids are taken when events are written but seen only once they commit, so concurrent writers
+# can commit out of id order; a stream keeps re-reading this many ids behind the newest it sent
+REORDER_WINDOW = 100
+
+
+class OrderEventBroker:
+    """Wakes this process's open streams as soon as an event is logged"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = 0
+
+    def notify(self, event_id):
+        with self._condition:
+            self._latest = max(self._latest, event_id)
+            self._condition.notify_all()
+
+    def wait(self, after_id, timeout):
+        """Block until an event newer than `after_id` is published here, or `timeout` passes"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._latest > after_id, timeout)
+
+
+broker = OrderEventBroker()
+
+
+def publish(kind, statuses):
+    """
+    Log a `kind` event for each {order id: status} once the surrounding
+    transaction commits, then wake this worker's streams. Streams on other
+    workers pick the rows up on their next poll.
+    """
+    events = [OrderEvent(order_id=order_id, kind=kind, status=status) for order_id, status in statuses.items()]
+    if not events:
+        return
+
+    def write():
+        created = OrderEvent.objects.bulk_create(events)
+        broker.notify(max(event.pk for event in created))
+
+    transaction.on_commit(write)
+
+
+def latest_event_id():
+    return OrderEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def follow(last_event_id=None, duration=None):
+    """
+    Yield lists of events (oldest first) until `duration` seconds have
+    passed; an empty list means nothing arrived within POLL_INTERVAL.
+    Without a last id it starts from now. Events that commit after a newer
+    one was sent are still delivered, once per stream, if they fall within
+    REORDER_WINDOW ids of it. A stream resumed from `last_event_id` starts
+    REORDER_WINDOW ids before it, so an event that committed late while the
+    client was reconnecting is not lost; the board patches cards by order,
+    so replaying ones it already has is harmless.
+    """
+    if last_event_id is None:
+        newest = start = latest_event_id()
+    else:
+        newest, start = last_event_id, max(0, last_event_id - REORDER_WINDOW)
+    deadline = time.monotonic() + (STREAM_DURATION if duration is None else duration)
+    sent = set()
+
+    while True:
+        floor = max(start, newest - REORDER_WINDOW)
+        sent = {pk for pk in sent if pk > floor}
+        events = list(
+            OrderEvent.objects.filter(pk__gt=floor).exclude(pk__in=sent)
+            .select_related('order').order_by('pk')[:REPLAY_BATCH]
+        )
+        for event in events:
+            sent.add(event.pk)
+            newest = max(newest, event.pk)
+        yield events
+        if len(events) == REPLAY_BATCH:
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        broker.wait(newest, min(POLL_INTERVAL, remaining))
+
+
+def purge_old_events():
+    """Delete events older than ORDER_EVENT_RETENTION seconds; returns the number deleted"""
+    cutoff = timezone.now() - timedelta(seconds=settings.ORDER_EVENT_RETENTION)
+    deleted, _ = OrderEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import Prefetch
+from django.utils import timezone
+from .models import Order, OrderItem
+
+FORMATS = ('csv', 'jsonl')
+
+ORDER_FIELDS = (
+    'id', 'order_number', 'created_at', 'status', 'order_type', 'payment_status', 'customer_name',
+    'customer_email', 'customer_phone', 'subtotal', 'delivery_fee', 'total',
+)
+ITEM_FIELDS = ('menu_item_id', 'menu_item', 'quantity', 'price', 'line_total')
+
+# Orders fetched (with their items) per round trip; memory use is bounded by this, not by the date range
+EXPORT_CHUNK_SIZE = 500
+
+
+def parse_date(value):
+    """Local midnight at the start of a YYYY-MM-DD date (None for blank)"""
+    if not value:
+        return None
+    try:
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y-%m-%d'), time.min))
+    except ValueError:
+        raise ValueError(f'Dates must look like 2024-01-31, not {value!r}')
+
+
+def export_queryset(status=None, order_type=None, start=None, end=None):
+    """
+    Orders to export, oldest first, filtered by status, order type and the
+    local dates `start` to `end` (YYYY-MM-DD, both included). Raises
+    ValueError for an unknown status or type, or a malformed date.
+    """
+    orders = Order.objects.order_by('created_at', 'id')
+    if status:
+        if status not in dict(Order.ORDER_STATUS_CHOICES):
+            raise ValueError(f'Unknown order status: {status}')
+        orders = orders.filter(status=status)
+    if order_type:
+        if order_type not in dict(Order.ORDER_TYPE_CHOICES):
+            raise ValueError(f'Unknown order type: {order_type}')
+        orders = orders.filter(order_type=order_type)
+    start, end = parse_date(start), parse_date(end)
+    if start:
+        orders = orders.filter(created_at__gte=start)
+    if end:
+        orders = orders.filter(created_at__lt=end + timedelta(days=1))
+    return orders
+
+
+def iter_orders(queryset):
+    """
+    Yield orders with their items without loading the whole result: rows
+    are streamed (a server-side cursor on PostgreSQL) EXPORT_CHUNK_SIZE at
+    a time, and each chunk's items are fetched with one extra query
+    """
+    items = OrderItem.objects.select_related('menu_item').only(
+        'order_id', 'menu_item_id', 'menu_item__name', 'quantity', 'price',
+    ).order_by('id')
+    return queryset.only(*ORDER_FIELDS).prefetch_related(Prefetch('items', queryset=items)).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE,
+    )
+
+
+def _order_values(order):
+    return {
+        field: timezone.localtime(order.created_at).isoformat() if field == 'created_at' else getattr(order, field)
+        for field in ORDER_FIELDS
+    }
+
+
+def _item_values(item):
+    return {
+        'menu_item_id': item.menu_item_id,
+        'menu_item': item.menu_item.name,
+        'quantity': item.quantity,
+        'price': item.price,
+        'line_total': item.total_price,
+    }
+
+
+def _json_value(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def render_orders(orders, fmt):
+    """
+    Yield text chunks: CSV with one row per order line (order columns
+    repeated; orders without lines get one row), or JSON Lines with one
+    order and its items per line
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=ORDER_FIELDS + ITEM_FIELDS)
+        writer.writeheader()
+        for order in orders:
+            values = _order_values(order)
+            lines = order.items.all()
+            for item in lines:
+                writer.writerow({**values, **_item_values(item)})
+            if not lines:
+                writer.writerow(values)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'jsonl':
+        for order in orders:
+            values = _order_values(order)
+            values['items'] = [
+                {key: _json_value(value) for key, value in _item_values(item).items()} for item in order.items.all()
+            ]
+            yield json.dumps({key: _json_value(value) for key, value in values.items()}) + '\n'
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
@@ -0,0 +1,73 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import IdempotencyKey
+
+MAX_KEY_LENGTH = 100
+
+
+class IdempotencyError(ValueError):
+    """The key is malformed or was already used for a different request"""
+
+
+def fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def run_once(key, payload, action):
+    """
+    Run `action()` (returning (order, status, body)) at most once per key.
+
+    The key row is inserted in the same transaction as the order, so a
+    concurrent retry blocks on the unique index until the first attempt
+    commits and then replays its stored response. If `action` raises, the
+    key row is rolled back with everything else and a retry runs afresh.
+
+    Returns (status, body, replayed).
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters')
+    request_fingerprint = fingerprint(payload)
+
+    existing = IdempotencyKey.objects.filter(key=key).first()
+    if existing is not None:
+        if not existing.is_expired:
+            return replay(existing, request_fingerprint)
+        existing.delete()
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    expires_at=timezone.now() + timedelta(seconds=settings.ORDER_IDEMPOTENCY_TTL),
+                )
+        except IntegrityError:
+            # Lost the race to a concurrent request with the same key
+            record = None
+
+        if record is not None:
+            order, status, body = action()
+            record.order = order
+            record.response_status = status
+            record.response_body = body
+            record.save(update_fields=['order', 'response_status', 'response_body'])
+
+    if record is None:
+        return replay(IdempotencyKey.objects.get(key=key), request_fingerprint)
+    return status, body, False
+
+
+def replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        raise IdempotencyError('Idempotency-Key was already used for a different order')
+    return record.response_status, record.response_body, True
+
+
+def purge_expired(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.utils import timezone
+from .events import publish
+from .models import Order
+from .rollups import record_status_changes
+
+# Most orders one bulk request may move
+MAX_BULK_ORDERS = 500
+
+
+class InvalidTransition(ValueError):
+    """The requested status change is not part of the order lifecycle"""
+
+
+def source_statuses(target):
+    """Statuses an order may be in to move to `target`"""
+    if not isinstance(target, str) or target not in dict(Order.ORDER_STATUS_CHOICES):
+        raise InvalidTransition(f'Unknown order status: {target}')
+    return [status for status, targets in Order.STATUS_TRANSITIONS.items() if target in targets]
+
+
+def transition(order_ids, target):
+    """
+    Move the given orders to `target` with a single
+    UPDATE ... WHERE id IN (...) AND status IN (<allowed sources>),
+    stamping `<target>_at`. Orders whose current status may not move to
+    `target` are left alone.
+
+    Returns (moved ids, {rejected id: current status}); ids that do not
+    exist are ignored.
+    """
+    sources = source_statuses(target)
+    order_ids = set(order_ids)
+    now = timezone.now()
+
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=order_ids).order_by().values_list('pk', 'status')
+        )
+        movable = sorted(pk for pk, status in current.items() if status in sources)
+        if movable:
+            Order.objects.filter(pk__in=movable, status__in=sources).update(
+                status=target, updated_at=now, **{Order.status_timestamp_field(target): now},
+            )
+            publish('status', dict.fromkeys(movable, target))
+            record_status_changes({pk: (current[pk], target) for pk in movable})
+
+    rejected = {pk: status for pk, status in current.items() if status not in sources}
+    return movable, rejected
+
+
+def apply_transitions(groups):
+    """
+    Apply [(target status, order ids), ...] in one transaction, one UPDATE
+    per group. Every target is validated before anything is written.
+
+    Returns ({target: moved ids}, {rejected id: status at the time}).
+    """
+    groups = [(target, list(order_ids)) for target, order_ids in groups]
+    if sum(len(order_ids) for _, order_ids in groups) > MAX_BULK_ORDERS:
+        raise InvalidTransition(f'At most {MAX_BULK_ORDERS} orders can be updated at once')
+    for target, _ in groups:
+        source_statuses(target)
+
+    moved, rejected = {}, {}
+    with transaction.atomic():
+        for target, order_ids in groups:
+            moved[target], group_rejected = transition(order_ids, target)
+            rejected.update(group_rejected)
+    return moved, rejected
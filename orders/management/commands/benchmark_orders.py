@@ -0,0 +1,77 @@
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.models import Sum
+from menu.changelog import paused as paused_changelog
+from orders.models import Order, OrderItem
+from orders.services import OutOfStockError, place_order
+from restaurant.models import Category, MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Place orders for one item from many threads and check that stock is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=400, help='Orders to attempt in total')
+        parser.add_argument('--stock', type=int, default=300, help='Starting stock of the benchmark item')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark orders and item afterwards')
+
+    def handle(self, *args, **options):
+        # Unless kept, the benchmark rows are deleted again, so menu sync clients never need to hear about them
+        with nullcontext() if options['keep'] else paused_changelog():
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        category = Category.objects.create(name='Benchmark', is_active=False)
+        item = MenuItem.objects.create(
+            name='Benchmark Burger', description='Load test item', price='10.00',
+            category=category, stock_quantity=options['stock'], is_available=True,
+        )
+
+        def attempt(n):
+            try:
+                for retry in range(5):
+                    try:
+                        place_order(
+                            lines=[{'id': item.id, 'quantity': options['quantity']}],
+                            customer_name=f'Benchmark {n}', customer_phone='000', order_type='pickup',
+                        )
+                        return 'placed'
+                    except OutOfStockError:
+                        return 'rejected'
+                    except OperationalError:
+                        # SQLite allows one writer at a time
+                        time.sleep(0.01 * (retry + 1))
+                return 'error'
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(attempt, range(options['orders'])))
+        elapsed = time.perf_counter() - started
+
+        item.refresh_from_db()
+        sold = OrderItem.objects.filter(menu_item=item).aggregate(total=Sum('quantity'))['total'] or 0
+        oversold = max(0, sold - options['stock'])
+        consistent = sold + item.stock_quantity == options['stock']
+
+        self.stdout.write(f"Threads:         {options['threads']}")
+        self.stdout.write(f"Orders placed:   {results.count('placed')} in {elapsed:.2f}s")
+        self.stdout.write(f"Orders/second:   {len(results) / elapsed:.1f} attempted, {results.count('placed') / elapsed:.1f} placed")
+        self.stdout.write(f"Out of stock:    {results.count('rejected')}")
+        self.stdout.write(f"Errors:          {results.count('error')}")
+        self.stdout.write(f"Units sold:      {sold} of {options['stock']} (final stock {item.stock_quantity})")
+
+        if oversold or not consistent or item.stock_quantity < 0:
+            self.stdout.write(self.style.ERROR(f'Oversold by {oversold} units'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Zero oversells'))
+
+        if not options['keep']:
+            Order.objects.filter(items__menu_item=item).delete()
+            category.delete()
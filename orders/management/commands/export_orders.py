@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from orders.export import FORMATS, export_queryset, iter_orders, render_orders
+
+
+class Command(BaseCommand):
+    help = 'Write orders with their items as CSV or JSON Lines (to a file or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Defaults to stdout')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--status', help='Only orders with this status')
+        parser.add_argument('--type', dest='order_type', help='Only delivery or pickup orders')
+        parser.add_argument('--start', help='First day to export (YYYY-MM-DD, local time)')
+        parser.add_argument('--end', help='Last day to export (YYYY-MM-DD, included)')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(options['status'], options['order_type'], options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        exported = 0
+
+        def counted():
+            nonlocal exported
+            for order in iter_orders(queryset):
+                exported += 1
+                yield order
+
+        chunks = render_orders(counted(), options['format'])
+        if options['path']:
+            with open(options['path'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(chunks)
+            seconds = time.monotonic() - started
+            rate = exported / seconds if seconds else exported
+            self.stdout.write(self.style.SUCCESS(f'Exported {exported} orders in {seconds:.2f}s ({rate:.0f} orders/s)'))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            # Keep stdout clean for piping
+            self.stderr.write(f'Exported {exported} orders')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from orders.events import purge_old_events
+
+
+class Command(BaseCommand):
+    help = 'Delete live order board events older than ORDER_EVENT_RETENTION'
+
+    def handle(self, *args, **options):
+        deleted = purge_old_events()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} order events'))
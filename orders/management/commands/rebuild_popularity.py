@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from orders.rollups import rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the popular items ranking from the hourly sales rollups'
+
+    def handle(self, *args, **options):
+        scored = rebuild_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} menu items'))
@@ -0,0 +1,26 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from orders.rollups import rebuild, rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly and daily sales rollups from the orders (all of them, or from --since onwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD, local time)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(datetime.strptime(options['since'], '%Y-%m-%d'), time.min))
+            except ValueError:
+                raise CommandError('--since must be a date like 2024-01-31')
+
+        written = rebuild(since)
+        scope = f'from {options["since"]}' if since else 'for all orders'
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} sales rollup rows {scope}'))
+        # Popularity scores are derived from the hourly rollups
+        scored = rebuild_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} menu items for popularity'))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='confirmed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='out_for_delivery_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preparing_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='ready_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_status_timestamps'),
+        ('restaurant', '0010_menu_item_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField(help_text='Start of the hour or day (local time)')),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('units', models.IntegerField(default=0, help_text='Menu items sold')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'start'), name='sales_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='restaurant.category')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='restaurant.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'start', 'menu_item'), name='item_sales_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_sales_rollups'),
+        ('restaurant', '0011_menu_item_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('together', models.IntegerField(help_text='Orders that had both items')),
+                ('score', models.FloatField(help_text="Share of the item's orders that also had the neighbor")),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='restaurant.menuitem')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurant.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'neighbor'), name='item_neighbor_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurant.menuitem')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurant.menuitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'other'), name='item_pair_unique')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from restaurant.models import MenuItem
+from django.utils import timezone
+from restaurant.models import Category, MenuItem
 from decimal import Decimal
 
 class Order(models.Model):
@@ -14,6 +15,18 @@ class Order(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+
+    # Statuses each status may move to; completed and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': ('confirmed', 'preparing', 'cancelled'),
+        'confirmed': ('preparing', 'cancelled'),
+        'preparing': ('ready', 'cancelled'),
+        'ready': ('out_for_delivery', 'delivered', 'completed', 'cancelled'),
+        'out_for_delivery': ('delivered',),
+        'delivered': ('completed',),
+        'completed': (),
+        'cancelled': (),
+    }
     
     ORDER_TYPE_CHOICES = [
         ('delivery', 'Delivery'),
@@ -43,8 +56,22 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # When the order entered each status (pending is created_at), for SLA reporting
+    confirmed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    preparing_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    ready_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    out_for_delivery_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    delivered_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the admin order list, unfiltered and by status
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f'Order {self.order_number} - {self.customer_name}'
@@ -55,6 +82,17 @@ class Order(models.Model):
             self.order_number = f'ORD-{uuid.uuid4().hex[:8].upper()}'
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def status_timestamp_field(status):
+        """Name of the field recording when an order entered `status` (None for pending)"""
+        return f'{status}_at' if status in Order.STATUS_TRANSITIONS and status != 'pending' else None
+
+    @property
+    def status_options(self):
+        """(value, label) choices for the current status and the ones it may move to"""
+        allowed = {self.status, *self.STATUS_TRANSITIONS.get(self.status, ())}
+        return [(value, label) for value, label in self.ORDER_STATUS_CHOICES if value in allowed]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -69,3 +107,123 @@ class OrderItem(models.Model):
     @property
     def total_price(self):
         return self.quantity * self.price
+
+class OrderEvent(models.Model):
+    """
+    An order was placed or changed status. The id doubles as the SSE event
+    id, so the live order board can resume from Last-Event-ID on any worker.
+    """
+    KIND_CHOICES = [
+        ('created', 'Created'),
+        ('status', 'Status changed'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, help_text='Order status when the event was logged')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: order {self.order_id} ({self.status})'
+
+class SalesRollup(models.Model):
+    """
+    Sales of one hour or day, by when the orders were placed. Cancelled
+    orders are left out. Kept up to date by orders.rollups.
+    """
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField(help_text='Start of the hour or day (local time)')
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    units = models.IntegerField(default=0, help_text='Menu items sold')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'start'], name='sales_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_period_display()} from {self.start:%Y-%m-%d %H:%M}: {self.revenue}'
+
+    @property
+    def average_basket(self):
+        return (self.revenue / self.order_count).quantize(Decimal('0.01')) if self.order_count else Decimal('0.00')
+
+class ItemSalesRollup(models.Model):
+    """
+    Units and revenue of one menu item in one hour or day. The category is
+    the item's current one: moving an item moves its past sales with it, so
+    the incremental rollups always match a rebuild from OrderItem.
+    """
+    period = models.CharField(max_length=4, choices=SalesRollup.PERIOD_CHOICES)
+    start = models.DateTimeField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='sales_rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='sales_rollups')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'start', 'menu_item'], name='item_sales_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item_id} {self.get_period_display()} from {self.start:%Y-%m-%d %H:%M}: {self.units}'
+
+class ItemPairCount(models.Model):
+    """
+    One cell of the sparse item-by-item co-occurrence matrix: how many
+    orders had both items. Both (a, b) and (b, a) are stored; the diagonal
+    (menu_item == other) counts the orders that had the item at all.
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'other'], name='item_pair_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item_id} & {self.other_id}: {self.orders}'
+
+class ItemNeighbor(models.Model):
+    """One of a menu item's top-K "frequently ordered together" items (see orders.recommendations)"""
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    together = models.IntegerField(help_text='Orders that had both items')
+    score = models.FloatField(help_text="Share of the item's orders that also had the neighbor")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'neighbor'], name='item_neighbor_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item_id} -> {self.neighbor_id} ({self.score:.2f})'
+
+class IdempotencyKey(models.Model):
+    """
+    Result of an order submission, stored under the client's Idempotency-Key
+    so that retries replay the original response instead of ordering twice.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    fingerprint = models.CharField(max_length=64, help_text='SHA-256 of the request body')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='idempotency_keys')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
@@ -0,0 +1,120 @@
+import base64
+import binascii
+from datetime import datetime
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from .models import Order
+
+ORDER_PAGE_SIZE = 15
+
+# How long an order count is reused before it is taken again (seconds)
+ORDER_COUNT_TIMEOUT = 60
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by encode_cursor"""
+
+
+def encode_cursor(direction, order):
+    value = f'{direction}:{order.created_at.isoformat()}|{order.pk}'
+    return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns (direction, created_at, id) for an 'after'/'before' cursor"""
+    try:
+        direction, _, value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').partition(':')
+        created_at, _, order_id = value.partition('|')
+        if direction not in ('after', 'before'):
+            raise ValueError(cursor)
+        return direction, datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(cursor)
+
+
+class OrderPage:
+    """One page of orders, newest first, with cursors to its neighbours"""
+
+    def __init__(self, orders, has_newer, has_older, approximate_count):
+        self.orders = orders
+        self.has_newer = has_newer
+        self.has_older = has_older
+        self.approximate_count = approximate_count
+
+    def __iter__(self):
+        return iter(self.orders)
+
+    def __len__(self):
+        return len(self.orders)
+
+    @property
+    def has_other_pages(self):
+        return self.has_newer or self.has_older
+
+    @property
+    def newer_cursor(self):
+        return encode_cursor('before', self.orders[0]) if self.has_newer else None
+
+    @property
+    def older_cursor(self):
+        return encode_cursor('after', self.orders[-1]) if self.has_older else None
+
+
+def order_page(status=None, cursor=None, page_size=ORDER_PAGE_SIZE):
+    """
+    Keyset page of orders ordered by (created_at, id) descending.
+
+    Each page seeks straight to its cursor through the (status,) created_at,
+    id indexes and reads page_size + 1 rows, so page 500 costs the same as
+    page one. An invalid cursor raises InvalidCursor.
+    """
+    orders = Order.objects.all()
+    if status:
+        orders = orders.filter(status=status)
+
+    if cursor is None:
+        rows = list(orders.order_by('-created_at', '-id')[:page_size + 1])
+        return OrderPage(rows[:page_size], False, len(rows) > page_size, approximate_order_count(status))
+
+    direction, created_at, order_id = decode_cursor(cursor)
+    # created_at <= c AND (created_at < c OR id < i): the first term bounds the index range scan
+    if direction == 'after':
+        rows = list(
+            orders.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=order_id))
+            .order_by('-created_at', '-id')[:page_size + 1]
+        )
+        return OrderPage(rows[:page_size], True, len(rows) > page_size, approximate_order_count(status))
+
+    rows = list(
+        orders.filter(Q(created_at__gte=created_at), Q(created_at__gt=created_at) | Q(id__gt=order_id))
+        .order_by('created_at', 'id')[:page_size + 1]
+    )
+    return OrderPage(rows[:page_size][::-1], len(rows) > page_size, True, approximate_order_count(status))
+
+
+def approximate_order_count(status=None):
+    """
+    Order count that may be up to ORDER_COUNT_TIMEOUT seconds stale.
+
+    On PostgreSQL the unfiltered count comes from the planner's row estimate
+    instead of a COUNT(*) over the whole table.
+    """
+    key = f'ramza:admin:order_count:{status or "all"}'
+    count = cache.get(key)
+    if count is None:
+        count = _estimated_rows() if not status else None
+        if count is None:
+            count = Order.objects.filter(status=status).count() if status else Order.objects.count()
+        cache.set(key, count, ORDER_COUNT_TIMEOUT)
+    return count
+
+
+def _estimated_rows():
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [Order._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first vacuumed/analyzed
+    return int(row[0]) if row and row[0] >= 0 else None
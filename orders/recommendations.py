@@ -0,0 +1,170 @@
+import hashlib
+import heapq
+from collections import Counter, defaultdict, namedtuple
+from itertools import combinations, groupby
+from operator import itemgetter
+from django.db import transaction
+from restaurant.cache import VersionedSnapshot, bump_version
+from .models import ItemNeighbor, ItemPairCount, OrderItem
+from .rollups import increment
+
+# Neighbors kept per item
+NEIGHBORS_PER_ITEM = 10
+
+# Orders with more distinct items than this (catering, office runs) still count towards each
+# item's total but add no pairs: they say little about what goes together and cost n² pairs
+MAX_BASKET_ITEMS = 20
+
+# Pairs seen in fewer orders than this are noise, not a recommendation
+MIN_TOGETHER = 2
+
+# Decimal places of a neighbor score that count as a change other workers must reload for
+SCORE_PRECISION = 2
+
+RecommendationIndex = namedtuple('RecommendationIndex', ['neighbors', 'digest'])
+
+
+def basket_pairs(item_ids):
+    """Co-occurrence matrix cells one order adds to: the diagonal, and both directions of every pair"""
+    items = sorted(set(item_ids))
+    cells = [(item_id, item_id) for item_id in items]
+    if len(items) <= MAX_BASKET_ITEMS:
+        for a, b in combinations(items, 2):
+            cells += [(a, b), (b, a)]
+    return cells
+
+
+def _baskets(order_ids=None):
+    """Yield the menu item ids of each order (all orders, or `order_ids`), streaming the lines"""
+    lines = OrderItem.objects.order_by('order_id')
+    if order_ids is not None:
+        lines = lines.filter(order_id__in=order_ids)
+    rows = lines.values_list('order_id', 'menu_item_id').iterator(chunk_size=5000)
+    for _, basket in groupby(rows, key=itemgetter(0)):
+        yield [menu_item_id for _, menu_item_id in basket]
+
+
+def _ranking(neighbors):
+    """{item id: ((neighbor id, rounded score), ...)} of ItemNeighbor rows, best first"""
+    lists = defaultdict(list)
+    for neighbor in sorted(neighbors, key=lambda row: (row.menu_item_id, -row.score, row.neighbor_id)):
+        lists[neighbor.menu_item_id].append((neighbor.neighbor_id, round(neighbor.score, SCORE_PRECISION)))
+    return {item_id: tuple(pairs) for item_id, pairs in lists.items()}
+
+
+def top_neighbors(item_id, counts):
+    """ItemNeighbors of `item_id` from its row of the matrix ({other id: orders}, diagonal included)"""
+    total = counts.get(item_id, 0)
+    candidates = [(together, other) for other, together in counts.items()
+                  if other != item_id and together >= MIN_TOGETHER]
+    return [
+        ItemNeighbor(menu_item_id=item_id, neighbor_id=other, together=together, score=together / total)
+        for together, other in heapq.nlargest(NEIGHBORS_PER_ITEM, candidates, key=lambda pair: (pair[0], -pair[1]))
+    ]
+
+
+# Incremental updates
+
+def record_orders(order_ids):
+    """Add the baskets of orders placed in the current transaction once it commits"""
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: add_baskets(_baskets(order_ids)))
+
+
+def add_baskets(baskets):
+    """
+    Count the baskets into the matrix and rebuild the neighbor lists of
+    the items in them, which are the only rows whose counts changed.
+    Every worker reloads the whole neighbor table on a version bump, so
+    the version only moves when a list's order or a score at
+    SCORE_PRECISION changed; most orders only nudge the scores.
+    """
+    deltas = Counter()
+    for basket in baskets:
+        deltas.update(basket_pairs(basket))
+    if not deltas:
+        return
+
+    touched = sorted({item_id for item_id, _ in deltas})
+    with transaction.atomic():
+        # A fixed order, so concurrent orders queue rather than deadlock
+        for (item_id, other_id), count in sorted(deltas.items()):
+            increment(ItemPairCount, {'menu_item_id': item_id, 'other_id': other_id}, orders=count)
+
+        rows = defaultdict(dict)
+        cells = ItemPairCount.objects.filter(menu_item_id__in=touched)
+        for item_id, other_id, together in cells.values_list('menu_item_id', 'other_id', 'orders'):
+            rows[item_id][other_id] = together
+        stored = ItemNeighbor.objects.filter(menu_item_id__in=touched)
+        before = _ranking(stored)
+        neighbors = [neighbor for item_id in touched for neighbor in top_neighbors(item_id, rows[item_id])]
+        stored.delete()
+        ItemNeighbor.objects.bulk_create(neighbors)
+        if _ranking(neighbors) != before:
+            bump_version('recommendations')
+
+
+# Batch build
+
+def rebuild():
+    """
+    Recount the whole matrix from OrderItem, one order at a time, and
+    rebuild every neighbor list. Returns (matrix cells, neighbor rows).
+    """
+    matrix = Counter()
+    for basket in _baskets():
+        matrix.update(basket_pairs(basket))
+
+    rows = defaultdict(dict)
+    for (item_id, other_id), together in matrix.items():
+        rows[item_id][other_id] = together
+    neighbors = [neighbor for item_id, counts in rows.items() for neighbor in top_neighbors(item_id, counts)]
+
+    with transaction.atomic():
+        ItemPairCount.objects.all().delete()
+        ItemNeighbor.objects.all().delete()
+        ItemPairCount.objects.bulk_create([
+            ItemPairCount(menu_item_id=item_id, other_id=other_id, orders=together)
+            for (item_id, other_id), together in matrix.items()
+        ], batch_size=1000)
+        ItemNeighbor.objects.bulk_create(neighbors, batch_size=1000)
+        bump_version('recommendations')
+    return len(matrix), len(neighbors)
+
+
+# Reading
+
+def load_index():
+    neighbors = defaultdict(list)
+    rows = ItemNeighbor.objects.order_by('menu_item_id', '-score', 'neighbor_id')
+    for item_id, neighbor_id, score in rows.values_list('menu_item_id', 'neighbor_id', 'score'):
+        neighbors[item_id].append((neighbor_id, score))
+    neighbors = {item_id: tuple(pairs) for item_id, pairs in neighbors.items()}
+    digest = hashlib.sha1(repr(sorted(neighbors.items())).encode('utf-8')).hexdigest()
+    return RecommendationIndex(neighbors, digest)
+
+
+# Swapped for a freshly loaded neighbor table whenever rebuild, or an add_baskets that changes
+# a ranking, commits: in this worker at once and in the others within
+# CACHE_VERSION_CHECK_INTERVAL (see restaurant.cache)
+RECOMMENDATIONS = VersionedSnapshot('recommendations', load_index)
+
+
+def get_recommendation_index():
+    return RECOMMENDATIONS.get()
+
+
+def recommend(item_ids, index=None):
+    """
+    Ids of the items most often ordered with `item_ids`, best first: each
+    cart item's K neighbors are read and their scores summed, so the work
+    is O(K) per cart item. Items already in `item_ids` are left out.
+    """
+    index = index or get_recommendation_index()
+    cart = set(item_ids)
+    scores = defaultdict(float)
+    for item_id in cart:
+        for neighbor_id, score in index.neighbors.get(item_id, ()):
+            if neighbor_id not in cart:
+                scores[neighbor_id] += score
+    return sorted(scores, key=lambda neighbor_id: (-scores[neighbor_id], neighbor_id))
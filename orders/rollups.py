@@ -0,0 +1,268 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from restaurant import popularity
+from restaurant.models import MenuItem
+from .models import ItemSalesRollup, Order, OrderItem, SalesRollup
+
+PERIODS = ('hour', 'day')
+
+TRUNCATE = {'hour': TruncHour, 'day': TruncDay}
+
+# Orders in these statuses are not sales
+EXCLUDED_STATUSES = ('cancelled',)
+
+# Half-lives of sales history rebuild_popularity reads (older sales count for under 1/1000)
+POPULARITY_WINDOW = 10
+
+# Most hourly buckets one series may span
+MAX_HOURLY_BUCKETS = 24 * 14
+
+
+def counts_as_sale(status):
+    return status not in EXCLUDED_STATUSES
+
+
+def bucket_start(moment, period):
+    """Start of the local hour or day containing `moment`, as TruncHour/TruncDay compute it"""
+    start = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if period == 'day' else start
+
+
+# Incremental updates
+
+def _after_commit(write):
+    """
+    Run a rollup write once the current transaction commits. The orders are
+    saved by then, so a failed write (a deadlock, say) is logged instead of
+    failing the customer's request; rebuild_sales_rollups repairs the drift.
+    """
+    transaction.on_commit(write, robust=True)
+
+
+def record_new_orders(order_ids):
+    """Add orders placed in the current transaction to the rollups once it commits"""
+    order_ids = list(order_ids)
+    _after_commit(lambda: _write(_collect(order_ids), 1))
+
+
+def record_status_changes(changes):
+    """
+    Update the rollups for {order id: (old status, new status)} once the
+    current transaction commits: orders cancelled are taken out, orders
+    brought back are added again. Other changes do not touch the rollups.
+    """
+    added = [pk for pk, (old, new) in changes.items() if not counts_as_sale(old) and counts_as_sale(new)]
+    removed = [pk for pk, (old, new) in changes.items() if counts_as_sale(old) and not counts_as_sale(new)]
+    if not added and not removed:
+        return
+
+    def write():
+        _write(_collect(added), 1)
+        _write(_collect(removed), -1)
+
+    _after_commit(write)
+
+
+def record_deleted_orders(order_ids):
+    """Take orders about to be deleted out of the rollups (their rows are read now, before they go)"""
+    sales = _collect(order_ids)
+    _after_commit(lambda: _write(sales, -1))
+
+
+def follow_category_moves(item_ids):
+    """File the item rollups of `item_ids` under each item's current category, as rebuild() does (one UPDATE)"""
+    current = MenuItem.objects.filter(pk=OuterRef('menu_item_id')).values('category_id')[:1]
+    ItemSalesRollup.objects.filter(menu_item_id__in=item_ids).exclude(
+        category_id=F('menu_item__category_id'),
+    ).update(category_id=Subquery(current))
+
+
+def _collect(order_ids):
+    """({(period, start): [orders, revenue, units]}, {(period, start, item id): [category id, units, revenue]})"""
+    totals = defaultdict(lambda: [0, Decimal('0.00'), 0])
+    items = {}
+    if not order_ids:
+        return totals, items
+
+    placed = {}
+    for pk, created_at, total in Order.objects.filter(pk__in=order_ids).order_by().values_list(
+            'pk', 'created_at', 'total'):
+        placed[pk] = [bucket_start(created_at, period) for period in PERIODS]
+        for period, start in zip(PERIODS, placed[pk]):
+            totals[period, start][0] += 1
+            totals[period, start][1] += total
+
+    for order_id, menu_item_id, category_id, quantity, price in OrderItem.objects.filter(
+            order_id__in=placed).order_by().values_list(
+            'order_id', 'menu_item_id', 'menu_item__category_id', 'quantity', 'price'):
+        for period, start in zip(PERIODS, placed[order_id]):
+            totals[period, start][2] += quantity
+            line = items.setdefault((period, start, menu_item_id), [category_id, 0, Decimal('0.00')])
+            line[1] += quantity
+            line[2] += quantity * price
+    return totals, items
+
+
+def increment(model, keys, defaults=None, **deltas):
+    """UPDATE ... SET field = field + delta on one rollup row, creating the row if it is missing"""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another worker created the row first
+        model.objects.filter(**keys).update(**changes)
+
+
+def _write(sales, sign):
+    """
+    Apply collected sales (see _collect) in their own short transaction,
+    in a fixed row order so concurrent writers queue rather than deadlock
+    """
+    totals, items = sales
+    if not totals:
+        return
+    with transaction.atomic():
+        for (period, start), (orders, revenue, units) in sorted(totals.items()):
+            increment(SalesRollup, {'period': period, 'start': start},
+                       order_count=sign * orders, revenue=sign * revenue, units=sign * units)
+        for (period, start, menu_item_id), (category_id, units, revenue) in sorted(items.items()):
+            increment(ItemSalesRollup, {'period': period, 'start': start, 'menu_item_id': menu_item_id},
+                       defaults={'category_id': category_id}, units=sign * units, revenue=sign * revenue)
+        # Hourly buckets are fine-grained enough to time-decay item popularity from
+        popularity.add_sales({
+            (menu_item_id, start): units
+            for (period, start, menu_item_id), (_, units, _) in items.items() if period == 'hour'
+        }, sign)
+
+
+# Backfills
+
+def rebuild(since=None):
+    """
+    Recompute the rollups from Order and OrderItem: all of them, or those
+    from the local day containing `since` onwards. Returns the number of
+    rollup rows written.
+    """
+    orders = Order.objects.exclude(status__in=EXCLUDED_STATUSES)
+    lines = OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+    rollups = SalesRollup.objects.all()
+    item_rollups = ItemSalesRollup.objects.all()
+    if since is not None:
+        since = bucket_start(since, 'day')
+        orders = orders.filter(created_at__gte=since)
+        lines = lines.filter(order__created_at__gte=since)
+        rollups = rollups.filter(start__gte=since)
+        item_rollups = item_rollups.filter(start__gte=since)
+
+    line_revenue = ExpressionWrapper(
+        F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        item_rollups.delete()
+        for period, truncate in TRUNCATE.items():
+            units = dict(
+                lines.annotate(bucket=truncate('order__created_at')).values('bucket')
+                .annotate(units=Sum('quantity')).order_by().values_list('bucket', 'units')
+            )
+            created = SalesRollup.objects.bulk_create([
+                SalesRollup(period=period, start=row['bucket'], order_count=row['order_count'],
+                            revenue=row['revenue'], units=units.get(row['bucket'], 0))
+                for row in orders.annotate(bucket=truncate('created_at')).values('bucket')
+                .annotate(order_count=Count('pk'), revenue=Sum('total')).order_by()
+            ])
+            created_items = ItemSalesRollup.objects.bulk_create([
+                ItemSalesRollup(period=period, start=row['bucket'], menu_item_id=row['menu_item_id'],
+                                category_id=row['menu_item__category_id'], units=row['units'],
+                                revenue=row['revenue'])
+                for row in lines.annotate(bucket=truncate('order__created_at'))
+                .values('bucket', 'menu_item_id', 'menu_item__category_id')
+                .annotate(units=Sum('quantity'), revenue=Sum(line_revenue)).order_by()
+            ], batch_size=1000)
+            written += len(created) + len(created_items)
+    return written
+
+
+def rebuild_popularity():
+    """
+    Recompute every menu item's popularity score from the hourly rollups.
+    Sales older than POPULARITY_WINDOW half-lives weigh too little to matter
+    and are skipped. Returns the number of items scored.
+    """
+    since = timezone.now() - timedelta(seconds=POPULARITY_WINDOW * popularity.half_life_seconds())
+    scores = defaultdict(float)
+    hourly = ItemSalesRollup.objects.filter(period='hour', start__gte=since).order_by()
+    for menu_item_id, start, units in hourly.values_list('menu_item_id', 'start', 'units').iterator(chunk_size=2000):
+        scores[menu_item_id] += units * popularity.sale_weight(start)
+    popularity.set_scores(scores)
+    return len(scores)
+
+
+# Reading
+
+def report_range(days):
+    """(start, end) of the last `days` local days, today included"""
+    end = timezone.now()
+    return bucket_start(end, 'day') - timedelta(days=days - 1), end
+
+
+def sales_series(period, start, end):
+    """
+    One SalesRollup per `period` bucket from `start` to `end`, oldest first;
+    buckets without sales are unsaved zero rows so charts have no gaps
+    """
+    if period not in PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+    stored = {
+        rollup.start: rollup
+        for rollup in SalesRollup.objects.filter(period=period, start__gte=start, start__lt=end)
+    }
+    series, bucket = [], bucket_start(start, period)
+    while bucket < end:
+        series.append(stored.get(bucket) or SalesRollup(period=period, start=bucket))
+        if period == 'hour':
+            bucket = bucket_start(bucket + timedelta(hours=1), 'hour')
+        else:
+            # Step by calendar day; a DST day is not 24 hours long
+            bucket = bucket_start(bucket + timedelta(hours=36), 'day')
+    return series
+
+
+def sales_totals(start, end):
+    """Orders, revenue and units in the daily rollups from `start` to `end`"""
+    totals = SalesRollup.objects.filter(period='day', start__gte=start, start__lt=end).aggregate(
+        order_count=Sum('order_count'), revenue=Sum('revenue'), units=Sum('units'),
+    )
+    return SalesRollup(
+        period='day', start=start, order_count=totals['order_count'] or 0,
+        revenue=totals['revenue'] or Decimal('0.00'), units=totals['units'] or 0,
+    )
+
+
+def top_sellers(start, end, by='item', limit=10):
+    """
+    [{'id', 'name', 'units', 'revenue'}, ...] of the best selling menu items
+    or categories (`by`) in the daily rollups from `start` to `end`
+    """
+    if by not in ('item', 'category'):
+        raise ValueError(f'Unknown breakdown: {by}')
+    key = 'menu_item' if by == 'item' else 'category'
+    rows = (
+        ItemSalesRollup.objects.filter(period='day', start__gte=start, start__lt=end)
+        .values(f'{key}_id', f'{key}__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', '-units', f'{key}__name')[:limit]
+    )
+    return [
+        {'id': row[f'{key}_id'], 'name': row[f'{key}__name'], 'units': row['units'], 'revenue': row['revenue']}
+        for row in rows
+    ]
@@ -0,0 +1,135 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from restaurant.models import MenuItem, SiteSettings
+from restaurant.signals import menu_items_updated
+from restaurant.stock import InsufficientStock, take_stock
+from .models import Order, OrderItem
+
+MAX_ORDER_LINES = 100
+MAX_LINE_QUANTITY = 99
+
+# Largest id a BigAutoField can hold
+MAX_ITEM_ID = 2 ** 63 - 1
+
+CENTS = Decimal('0.01')
+
+
+class OrderError(ValueError):
+    """The order cannot be placed as submitted"""
+
+
+class OutOfStockError(OrderError):
+    def __init__(self, items):
+        self.items = items
+        names = ', '.join(item.name for item in items)
+        super().__init__(f'Not enough stock for: {names}')
+
+
+def _is_int(value):
+    # JSON true/false decode to bools, which are ints to Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def normalize_lines(lines):
+    """
+    Merge [{'id': .., 'quantity': ..}, ...] into {menu_item_id: quantity}.
+    Ids and quantities must be JSON integers; 1.5 or "2" is rejected, not rounded.
+    """
+    if not lines:
+        raise OrderError('Your cart is empty')
+    if not isinstance(lines, list):
+        raise OrderError('Invalid cart')
+    if len(lines) > MAX_ORDER_LINES:
+        raise OrderError(f'An order can have at most {MAX_ORDER_LINES} lines')
+
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict):
+            raise OrderError('Invalid cart line')
+        item_id, quantity = line.get('id'), line.get('quantity', 1)
+        if not _is_int(item_id) or not 0 < item_id <= MAX_ITEM_ID or not _is_int(quantity):
+            raise OrderError('Invalid cart line')
+        if quantity < 1:
+            raise OrderError('Quantities must be at least 1')
+        quantities[item_id] = quantities.get(item_id, 0) + quantity
+        if quantities[item_id] > MAX_LINE_QUANTITY:
+            raise OrderError(f'At most {MAX_LINE_QUANTITY} of one item per order')
+    return quantities
+
+
+def decrement_stock(quantities):
+    """
+    Take `quantities` ({menu_item_id: quantity}) out of stock. Must run
+    inside a transaction: raises OutOfStockError (rolling back whatever was
+    already taken) if any item is short. See restaurant.stock.take_stock.
+    """
+    try:
+        take_stock(quantities)
+    except InsufficientStock as e:
+        raise OutOfStockError(e.items)
+
+
+def order_totals(subtotal, order_type, site_settings=None):
+    """Delivery fee and grand total (tax included) using the site's delivery and tax settings"""
+    site_settings = site_settings or SiteSettings()
+    # Unsaved defaults are floats, saved values Decimals
+    free_delivery_minimum = Decimal(str(site_settings.free_delivery_minimum))
+    tax_rate = Decimal(str(site_settings.tax_rate))
+
+    delivery_fee = Decimal('0.00')
+    if order_type == 'delivery' and subtotal < free_delivery_minimum:
+        delivery_fee = Decimal(str(site_settings.delivery_fee))
+    tax = (subtotal * tax_rate).quantize(CENTS, ROUND_HALF_UP)
+    return delivery_fee.quantize(CENTS), (subtotal + delivery_fee + tax).quantize(CENTS)
+
+
+def place_order(*, lines, customer_name, customer_phone, customer_email='',
+                order_type='delivery', delivery_address='', special_notes='', site_settings=None):
+    """
+    Create an Order with its OrderItems, priced from the database rather than
+    from the client's cart, and take the ordered quantities out of stock.
+    """
+    if not customer_name or not customer_phone:
+        raise OrderError('Name and phone number are required')
+    if not isinstance(order_type, str) or order_type not in dict(Order.ORDER_TYPE_CHOICES):
+        raise OrderError('Unknown order type')
+    if order_type == 'delivery' and not delivery_address:
+        raise OrderError('A delivery address is required')
+
+    quantities = normalize_lines(lines)
+
+    # Reprice the whole cart in one query
+    menu_items = MenuItem.objects.filter(pk__in=quantities, is_available=True).only(
+        'id', 'name', 'price', 'preparation_time',
+    ).in_bulk()
+    missing = set(quantities) - set(menu_items)
+    if missing:
+        raise OrderError('Some items in your cart are no longer available')
+
+    subtotal = sum((menu_items[item_id].price * quantity for item_id, quantity in quantities.items()), Decimal('0.00'))
+    delivery_fee, total = order_totals(subtotal, order_type, site_settings)
+
+    with transaction.atomic():
+        decrement_stock(quantities)
+        order = Order.objects.create(
+            customer_name=customer_name,
+            customer_email=customer_email,
+            customer_phone=customer_phone,
+            order_type=order_type,
+            delivery_address=delivery_address if order_type == 'delivery' else '',
+            special_notes=special_notes,
+            subtotal=subtotal,
+            delivery_fee=delivery_fee,
+            total=total,
+            estimated_time=max(item.preparation_time for item in menu_items.values()),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menu_item_id=item_id, quantity=quantity, price=menu_items[item_id].price)
+            for item_id, quantity in quantities.items()
+        ])
+        # Stock changed through update(): publish it to the change feed once committed
+        transaction.on_commit(lambda: menu_items_updated.send(
+            sender=MenuItem, ids=list(quantities), fields=['stock_quantity'],
+        ))
+
+    return order
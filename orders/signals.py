@@ -0,0 +1,56 @@
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from restaurant.models import MenuItem
+from restaurant.signals import menu_items_updated
+from .events import publish
+from .models import Order
+from .recommendations import record_orders
+from .rollups import counts_as_sale, follow_category_moves, record_deleted_orders, record_new_orders, record_status_changes
+
+
+@receiver(pre_save, sender=Order)
+def remember_stored_status(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    stored = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    instance._stored_status = stored
+    # Saves outside orders.lifecycle (e.g. the Django admin) still stamp the new status
+    field = Order.status_timestamp_field(instance.status)
+    if stored is not None and instance.status != stored and field:
+        setattr(instance, field, timezone.now())
+
+
+@receiver(post_save, sender=Order)
+def announce_order(sender, instance, created, raw=False, **kwargs):
+    """Feed the live order board: new orders and status changes"""
+    stored = instance.__dict__.pop('_stored_status', None)
+    if raw:
+        return
+    if created:
+        publish('created', {instance.pk: instance.status})
+        record_new_orders([instance.pk])
+        record_orders([instance.pk])
+    elif stored is not None and instance.status != stored:
+        publish('status', {instance.pk: instance.status})
+        record_status_changes({instance.pk: (stored, instance.status)})
+
+
+@receiver(pre_delete, sender=Order)
+def forget_order_sales(sender, instance, **kwargs):
+    if counts_as_sale(instance.status):
+        record_deleted_orders([instance.pk])
+
+
+@receiver(post_save, sender=MenuItem)
+def regroup_item_sales(sender, instance, created, raw=False, **kwargs):
+    """Category sales reports follow an item to its new category"""
+    if not raw and not created:
+        follow_category_moves([instance.pk])
+
+
+@receiver(menu_items_updated)
+def regroup_item_sales_after_update(sender, ids, fields=None, **kwargs):
+    # Senders name the field or its column (menu_io sends 'category_id')
+    if not fields or {'category', 'category_id'} & set(fields):
+        follow_category_moves(ids)
@@ -1,3 +1,576 @@
-from django.test import TestCase
+import io
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from restaurant.models import Category, DataVersion, ItemPopularity, MenuItem, SiteSettings
+from restaurant.signals import menu_items_updated
+
+from .events import OrderEventBroker, follow
+from .export import export_queryset, iter_orders, render_orders
+from .idempotency import purge_expired
+from .lifecycle import InvalidTransition, apply_transitions, transition
+from .models import (
+    IdempotencyKey, ItemNeighbor, ItemPairCount, ItemSalesRollup, Order, OrderEvent, OrderItem, SalesRollup,
+)
+from .pagination import InvalidCursor, order_page
+from .recommendations import (
+    MAX_BASKET_ITEMS, add_baskets, basket_pairs, get_recommendation_index, rebuild as rebuild_recommendations, recommend,
+)
+from .rollups import rebuild, rebuild_popularity, report_range, sales_series, top_sellers
+from .services import OutOfStockError, place_order
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Burgers')
+        self.burger = MenuItem.objects.create(name='Chill Burger', description='Beef', price='10.00', category=category, stock_quantity=5)
+        self.fries = MenuItem.objects.create(name='Ramza Fries', description='Fries', price='4.00', category=category, stock_quantity=1)
+
+    def order(self, lines, **kwargs):
+        kwargs.setdefault('order_type', 'pickup')
+        return place_order(lines=lines, customer_name='Thato', customer_phone='0821234567', **kwargs)
+
+    def test_reprices_from_database_and_decrements_stock(self):
+        order = self.order([{'id': self.burger.id, 'quantity': 2, 'price': '0.01'}, {'id': self.fries.id}])
+
+        self.assertEqual(order.subtotal, Decimal('24.00'))
+        self.assertEqual(order.total, Decimal('25.98'))  # 8.25% default tax, no delivery fee for pickup
+        self.assertEqual(sorted(order.items.values_list('quantity', 'price')), [(1, Decimal('4.00')), (2, Decimal('10.00'))])
+        self.burger.refresh_from_db()
+        self.assertEqual(self.burger.stock_quantity, 3)
+
+    def test_out_of_stock_rolls_back_every_line(self):
+        with self.assertRaises(OutOfStockError) as raised:
+            self.order([{'id': self.burger.id, 'quantity': 1}, {'id': self.fries.id, 'quantity': 2}])
+
+        self.assertEqual(raised.exception.items, [self.fries])
+        self.assertFalse(Order.objects.exists())
+        self.burger.refresh_from_db()
+        self.assertEqual(self.burger.stock_quantity, 5)
+
+    def test_delivery_fee_uses_site_settings(self):
+        settings = SiteSettings(delivery_fee=Decimal('20.00'), free_delivery_minimum=Decimal('100.00'), tax_rate=Decimal('0'))
+        order = self.order([{'id': self.burger.id}], order_type='delivery', delivery_address='1 Main Rd', site_settings=settings)
+        self.assertEqual((order.delivery_fee, order.total), (Decimal('20.00'), Decimal('30.00')))
+
+    def test_checkout_endpoint(self):
+        response = self.client.post('/orders/place/', json.dumps({
+            'customer_name': 'Thato',
+            'customer_phone': '0821234567',
+            'order_type': 'pickup',
+            'items': [{'id': self.fries.id, 'quantity': 1}],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Order.objects.filter(order_number=response.json()['order_number']).exists())
+
+        response = self.client.post('/orders/place/', json.dumps({
+            'customer_name': 'Thato',
+            'customer_phone': '0821234567',
+            'order_type': 'pickup',
+            'items': [{'id': self.fries.id, 'quantity': 1}],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['out_of_stock'], [self.fries.id])
+
+    def test_checkout_endpoint_rejects_malformed_carts(self):
+        base = {'customer_name': 'Thato', 'customer_phone': '0821234567', 'order_type': 'pickup',
+                'items': [{'id': self.burger.id, 'quantity': 1}]}
+        payloads = [
+            {'items': 5},
+            {'items': {'id': self.burger.id}},
+            {'items': [self.burger.id]},
+            {'order_type': ['pickup']},
+            {'items': [{'id': 10 ** 30, 'quantity': 1}]},
+            {'items': [{'id': str(self.burger.id), 'quantity': 1}]},
+            {'items': [{'id': self.burger.id, 'quantity': 1.5}]},
+            {'items': [{'id': self.burger.id, 'quantity': True}]},
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                response = self.client.post('/orders/place/', json.dumps({**base, **payload}),
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_endpoint_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        body = json.dumps({
+            'customer_name': 'Thato',
+            'customer_phone': '0821234567',
+            'order_type': 'pickup',
+            'items': [{'id': self.burger.id, 'quantity': 1}],
+        })
+        self.assertEqual(client.post('/orders/place/', body, content_type='application/json').status_code, 403)
+
+        # The checkout page sets the cookie the order form sends back
+        token = client.get('/checkout/').cookies['csrftoken'].value
+        response = client.post('/orders/place/', body, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+
+
+class IdempotentOrderTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Burgers')
+        self.burger = MenuItem.objects.create(name='Chill Burger', description='Beef', price='10.00', category=category, stock_quantity=5)
+        self.body = json.dumps({
+            'customer_name': 'Thato',
+            'customer_phone': '0821234567',
+            'order_type': 'pickup',
+            'items': [{'id': self.burger.id, 'quantity': 2}],
+        })
+
+    def post(self, body, key='checkout-1'):
+        return self.client.post('/orders/place/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_without_touching_stock(self):
+        first = self.post(self.body)
+
+        with self.assertNumQueries(1):
+            retry = self.post(self.body)
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.burger.refresh_from_db()
+        self.assertEqual(self.burger.stock_quantity, 3)
+
+    def test_key_reused_for_different_order_is_rejected(self):
+        self.post(self.body)
+        response = self.post(self.body.replace('"quantity": 2', '"quantity": 1'))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_attempt_does_not_burn_the_key(self):
+        self.burger.stock_quantity = 1
+        self.burger.save()
+        self.assertEqual(self.post(self.body).status_code, 409)
+
+        self.burger.stock_quantity = 5
+        self.burger.save()
+        self.assertEqual(self.post(self.body).status_code, 201)
+
+    def test_expired_keys_are_purged(self):
+        self.post(self.body)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(purge_expired(), 1)
+        self.assertEqual(self.post(self.body).status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Pairs of orders share a timestamp so the id tie-breaker is exercised
+        now = timezone.now()
+        for n in range(7):
+            order = Order.objects.create(customer_name=f'Customer {n}', customer_phone='0800',
+                                         status='pending' if n % 2 else 'ready', subtotal='10.00', total='10.00')
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=n // 2))
+        self.newest_first = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_pages_forward_and_back_without_gaps(self):
+        first = order_page(page_size=3)
+        self.assertFalse(first.has_newer)
+        second = order_page(cursor=first.older_cursor, page_size=3)
+        third = order_page(cursor=second.older_cursor, page_size=3)
+        self.assertEqual([o.id for o in [*first, *second, *third]], self.newest_first)
+        self.assertFalse(third.has_older)
+
+        back = order_page(cursor=third.newer_cursor, page_size=3)
+        self.assertEqual([o.id for o in back], [o.id for o in second])
+        back = order_page(cursor=back.newer_cursor, page_size=3)
+        self.assertEqual([o.id for o in back], [o.id for o in first])
+        self.assertFalse(back.has_newer)
+
+    def test_deep_pages_read_one_page_of_rows(self):
+        first = order_page(page_size=2)
+        with self.assertNumQueries(1):
+            page = order_page(cursor=first.older_cursor, page_size=2)
+        self.assertEqual(len(page), 2)
+
+    def test_status_filter_and_approximate_count(self):
+        page = order_page('ready', page_size=10)
+        self.assertEqual({o.status for o in page}, {'ready'})
+        self.assertEqual(page.approximate_count, 4)
+        Order.objects.create(customer_name='Late', customer_phone='0800', status='ready', subtotal='1', total='1')
+        # Reused until ORDER_COUNT_TIMEOUT passes
+        self.assertEqual(order_page('ready').approximate_count, 4)
+
+    def test_rejects_foreign_cursors(self):
+        for cursor in ('nope', 'YWZ0ZXI6MQ=='):
+            with self.assertRaises(InvalidCursor):
+                order_page(cursor=cursor)
+
+
+class OrderEventTests(TestCase):
+    def place(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Order.objects.create(customer_name='Thabo', customer_phone='0800', subtotal='10.00', total='10.00', **fields)
+
+    def test_logs_new_orders_and_status_changes_only(self):
+        order = self.place()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.special_notes = 'No onions'
+            order.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'preparing'
+            order.save()
+
+        self.assertEqual(list(order.events.values_list('kind', 'status')), [('created', 'pending'), ('status', 'preparing')])
+
+    @mock.patch('orders.events.REORDER_WINDOW', 1)
+    def test_follow_replays_after_the_last_event_id(self):
+        first = self.place()
+        second = self.place()
+        third = self.place()
+        last_id = second.events.get().pk
+
+        # The resumed stream re-reads REORDER_WINDOW ids behind the last id, not further
+        batches = list(follow(last_id, duration=0))
+        self.assertEqual([[event.order_id for event in batch] for batch in batches], [[second.pk, third.pk]])
+        self.assertNotIn(first.pk, [event.order_id for batch in batches for event in batch])
+        # Without a last id the stream starts from now
+        self.assertEqual(list(follow(duration=0)), [[]])
+
+    @mock.patch('orders.events.POLL_INTERVAL', 0)
+    def test_follow_delivers_events_committed_out_of_order(self):
+        orders = [self.place() for _ in range(3)]
+        late = OrderEvent.objects.get(order=orders[1])
+        late.delete()
+
+        stream = follow(OrderEvent.objects.get(order=orders[0]).pk, duration=60)
+        # The resumed stream replays the last event the board had, then the newer one
+        self.assertEqual([event.order_id for event in next(stream)], [orders[0].pk, orders[2].pk])
+
+        # The older id commits after the newer one was sent
+        late.save()
+        self.assertEqual([event.order_id for event in next(stream)], [orders[1].pk])
+        self.assertEqual(next(stream), [])
+
+    def test_event_committed_late_during_a_reconnect_is_delivered(self):
+        orders = [self.place() for _ in range(3)]
+        late = OrderEvent.objects.get(order=orders[1])
+        late.delete()
+
+        # The first connection sends the newest event, then drops
+        sent = [event for batch in follow(OrderEvent.objects.get(order=orders[0]).pk, duration=0) for event in batch]
+        self.assertEqual([event.order_id for event in sent], [orders[0].pk, orders[2].pk])
+
+        # The older id commits while the board reconnects with Last-Event-ID of the newest event
+        late.save()
+        resumed = [event.order_id for batch in follow(sent[-1].pk, duration=0) for event in batch]
+        self.assertIn(orders[1].pk, resumed)
+
+    def test_broker_wakes_waiting_streams(self):
+        local_broker = OrderEventBroker()
+        woke = []
+        waiter = threading.Thread(target=lambda: woke.append(local_broker.wait(10, timeout=5)))
+        waiter.start()
+        local_broker.notify(11)
+        waiter.join()
+        self.assertEqual(woke, [True])
+
+
+class OrderLifecycleTests(TestCase):
+    def setUp(self):
+        self.orders = {
+            status: Order.objects.create(customer_name=status, customer_phone='0800', subtotal='10.00',
+                                         total='10.00', status=status)
+            for status in ('pending', 'preparing', 'completed')
+        }
+
+    def test_moves_only_orders_allowed_to_make_the_move(self):
+        ids = [order.pk for order in self.orders.values()]
+        with CaptureQueriesContext(connection) as captured, self.captureOnCommitCallbacks(execute=True):
+            moved, rejected = transition(ids, 'cancelled')
+
+        updates = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertEqual(moved, sorted([self.orders['pending'].pk, self.orders['preparing'].pk]))
+        self.assertEqual(rejected, {self.orders['completed'].pk: 'completed'})
+        pending = Order.objects.get(pk=self.orders['pending'].pk)
+        self.assertEqual(pending.status, 'cancelled')
+        self.assertIsNotNone(pending.cancelled_at)
+        self.assertEqual(OrderEvent.objects.filter(kind='status', status='cancelled').count(), 2)
+
+    def test_groups_are_validated_before_anything_is_written(self):
+        with self.assertRaises(InvalidTransition):
+            apply_transitions([('ready', [self.orders['preparing'].pk]), ('bogus', [self.orders['pending'].pk])])
+        with self.assertRaises(InvalidTransition):
+            transition([self.orders['preparing'].pk], ['ready'])
+        self.assertEqual(Order.objects.get(pk=self.orders['preparing'].pk).status, 'preparing')
+
+        moved, rejected = apply_transitions([
+            ('ready', [self.orders['preparing'].pk]),
+            ('confirmed', [self.orders['pending'].pk]),
+        ])
+        self.assertEqual(moved, {'ready': [self.orders['preparing'].pk], 'confirmed': [self.orders['pending'].pk]})
+        self.assertEqual(rejected, {})
+
+    def test_saving_a_new_status_stamps_it(self):
+        order = self.orders['preparing']
+        order.status = 'ready'
+        order.save()
+        self.assertIsNotNone(Order.objects.get(pk=order.pk).ready_at)
+        self.assertEqual([value for value, _ in order.status_options],
+                         ['ready', 'out_for_delivery', 'delivered', 'completed', 'cancelled'])
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.burgers = Category.objects.create(name='Burgers')
+        self.drinks = Category.objects.create(name='Drinks')
+        self.burger = MenuItem.objects.create(name='Chill Burger', description='Beef', price='10.00',
+                                              category=self.burgers, stock_quantity=50)
+        self.cola = MenuItem.objects.create(name='Cola', description='Cold', price='2.50',
+                                            category=self.drinks, stock_quantity=50)
+
+    def place(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order(lines=lines, customer_name='Ann', customer_phone='0800', order_type='pickup')
+
+    def rollups(self):
+        return sorted(
+            SalesRollup.objects.values_list('period', 'start', 'order_count', 'revenue', 'units')
+        ), sorted(ItemSalesRollup.objects.values_list('period', 'start', 'menu_item', 'category', 'units', 'revenue'))
+
+    def test_orders_and_cancellations_update_the_rollups(self):
+        first = self.place([{'id': self.burger.id, 'quantity': 2}, {'id': self.cola.id, 'quantity': 1}])
+        second = self.place([{'id': self.burger.id, 'quantity': 1}])
+        day = SalesRollup.objects.get(period='day')
+        self.assertEqual((day.order_count, day.revenue, day.units), (2, first.total + second.total, 4))
+        self.assertEqual(day.average_basket, ((first.total + second.total) / 2).quantize(Decimal('0.01')))
+        self.assertEqual(SalesRollup.objects.get(period='hour').units, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition([second.pk], 'cancelled')
+        day.refresh_from_db()
+        self.assertEqual((day.order_count, day.revenue, day.units), (1, first.total, 3))
+
+        start, end = report_range(1)
+        self.assertEqual(top_sellers(start, end), [
+            {'id': self.burger.id, 'name': 'Chill Burger', 'units': 2, 'revenue': Decimal('20.00')},
+            {'id': self.cola.id, 'name': 'Cola', 'units': 1, 'revenue': Decimal('2.50')},
+        ])
+        self.assertEqual([row['name'] for row in top_sellers(start, end, by='category')], ['Burgers', 'Drinks'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        day.refresh_from_db()
+        self.assertEqual((day.order_count, day.revenue, day.units), (0, Decimal('0.00'), 0))
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.place([{'id': self.burger.id, 'quantity': 3}])
+        cancelled = self.place([{'id': self.cola.id, 'quantity': 2}])
+        self.place([{'id': self.cola.id, 'quantity': 1}, {'id': self.burger.id, 'quantity': 1}])
+        with self.captureOnCommitCallbacks(execute=True):
+            transition([cancelled.pk], 'cancelled')
+        # Past sales follow an item to its new category, as a rebuild files them
+        self.cola.category = self.burgers
+        self.cola.save()
+        incremental = self.rollups()
+        self.assertEqual(set(ItemSalesRollup.objects.values_list('category', flat=True)), {self.burgers.id})
+
+        # Orders from before the rollups existed are picked up by a rebuild
+        old = Order.objects.create(customer_name='Bo', customer_phone='0800', subtotal='5.00', total='5.00')
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        OrderItem.objects.create(order=old, menu_item=self.cola, quantity=2, price='2.50')
+
+        self.assertEqual(rebuild(since=timezone.now()), 6)
+        self.assertEqual(self.rollups(), incremental)
+        self.assertEqual(rebuild(), 10)
+        self.assertEqual(SalesRollup.objects.filter(period='day').count(), 2)
+
+    def test_bulk_category_moves_regroup_the_rollups(self):
+        self.place([{'id': self.cola.id, 'quantity': 2}])
+        # Bulk senders (restaurant.menu_io, for one) name the column, not the field
+        MenuItem.objects.filter(pk=self.cola.pk).update(category=self.burgers)
+        menu_items_updated.send(sender=MenuItem, ids=[self.cola.pk], fields=['category_id', 'price'])
+        self.assertEqual(set(ItemSalesRollup.objects.values_list('category', flat=True)), {self.burgers.id})
+
+        incremental = self.rollups()
+        rebuild()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_failed_rollup_write_does_not_fail_the_order(self):
+        with mock.patch('orders.rollups._write', side_effect=RuntimeError('deadlock')), \
+                self.assertLogs(level='ERROR'):
+            order = self.place([{'id': self.burger.id, 'quantity': 1}])
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(SalesRollup.objects.exists())
+
+        self.assertEqual(rebuild(), 4)
+        self.assertEqual(SalesRollup.objects.get(period='day').order_count, 1)
+
+    def test_orders_feed_item_popularity(self):
+        self.place([{'id': self.cola.id, 'quantity': 3}])
+        cancelled = self.place([{'id': self.burger.id, 'quantity': 5}])
+        self.place([{'id': self.burger.id, 'quantity': 1}])
+        with self.captureOnCommitCallbacks(execute=True):
+            transition([cancelled.pk], 'cancelled')
+        scores = dict(ItemPopularity.objects.values_list('pk', 'score'))
+        self.assertGreater(scores[self.cola.id], scores[self.burger.id])
+
+        ItemPopularity.objects.update(score=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_popularity(), 2)
+        for pk, score in ItemPopularity.objects.values_list('pk', 'score'):
+            self.assertAlmostEqual(score / scores[pk], 1.0)
+
+    def test_series_fills_empty_buckets(self):
+        self.place([{'id': self.burger.id, 'quantity': 1}])
+        series = sales_series('day', *report_range(7))
+        self.assertEqual(len(series), 7)
+        self.assertEqual([rollup.order_count for rollup in series], [0] * 6 + [1])
+
+    def test_chart_endpoints_read_the_rollups(self):
+        self.place([{'id': self.burger.id, 'quantity': 2}])
+        self.client.force_login(User.objects.create_user('admin', password='pass', is_staff=True))
+
+        response = self.client.get('/dashboard/reports/sales/series/', {'days': 1})
+        self.assertEqual(response.json()['period'], 'hour')
+        self.assertEqual(sum(response.json()['units']), 2)
+        response = self.client.get('/dashboard/reports/sales/breakdown/', {'days': 7, 'by': 'category'})
+        self.assertEqual(response.json()['rows'][0]['name'], 'Burgers')
+        self.assertEqual(self.client.get('/dashboard/reports/sales/series/', {'days': 90, 'period': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get('/dashboard/reports/sales/').status_code, 200)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Burgers')
+        self.burger = MenuItem.objects.create(name='Chill Burger', description='Beef', price='10.00', category=category)
+        self.cola = MenuItem.objects.create(name='Cola', description='Cold', price='2.50', category=category)
+        self.orders = []
+        for i, order_type in enumerate(['delivery', 'pickup', 'pickup', 'delivery', 'pickup']):
+            order = Order.objects.create(customer_name=f'Customer {i}', customer_phone='0800', order_type=order_type,
+                                         subtotal='12.50', total='12.50', status='completed' if i else 'cancelled')
+            OrderItem.objects.create(order=order, menu_item=self.burger, quantity=1, price='10.00')
+            OrderItem.objects.create(order=order, menu_item=self.cola, quantity=1, price='2.50')
+            self.orders.append(order)
+
+    def export(self, fmt, **filters):
+        return ''.join(render_orders(iter_orders(export_queryset(**filters)), fmt))
+
+    def test_prefetches_items_a_chunk_at_a_time(self):
+        # One query for the orders plus one for each chunk's items, however many orders there are
+        with mock.patch('orders.export.EXPORT_CHUNK_SIZE', 2), self.assertNumQueries(4):
+            lines = self.export('jsonl').splitlines()
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([order['id'] for order in orders], [order.pk for order in self.orders])
+        self.assertEqual(orders[0]['items'][1], {
+            'menu_item_id': self.cola.pk, 'menu_item': 'Cola', 'quantity': 1, 'price': '2.50', 'line_total': '2.50',
+        })
+
+    def test_filters_and_csv_rows_per_item(self):
+        Order.objects.filter(pk=self.orders[4].pk).update(created_at=timezone.now() - timedelta(days=40))
+        today = timezone.localdate().isoformat()
+        rows = self.export('csv', status='completed', order_type='pickup', start=today, end=today).splitlines()
+        self.assertEqual(rows[0].split(',')[:2], ['id', 'order_number'])
+        self.assertEqual([int(row.split(',')[0]) for row in rows[1:]], [self.orders[1].pk] * 2 + [self.orders[2].pk] * 2)
+        with self.assertRaises(ValueError):
+            export_queryset(start='31/01/2024')
+
+    def test_admin_endpoint_and_command_stream_the_export(self):
+        self.client.force_login(User.objects.create_user('admin', password='pass', is_staff=True))
+        response = self.client.get('/dashboard/orders/export/', {'format': 'jsonl', 'order_type': 'delivery'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+        self.assertEqual(self.client.get('/dashboard/orders/export/', {'status': 'lost'}).status_code, 400)
+
+        stdout = io.StringIO()
+        call_command('export_orders', '--status', 'cancelled', stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Menu')
+        self.burger, self.cola, self.fries, self.shake = [
+            MenuItem.objects.create(name=name, description='Tasty', price='5.00', category=category, stock_quantity=100)
+            for name in ('Burger', 'Cola', 'Fries', 'Shake')
+        ]
+
+    def place(self, *items):
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(lines=[{'id': item.id} for item in items], customer_name='Ann', customer_phone='0800',
+                        order_type='pickup')
+
+    def neighbors(self):
+        return sorted(ItemNeighbor.objects.values_list('menu_item', 'neighbor', 'together', 'score'))
+
+    def test_orders_update_the_neighbor_lists(self):
+        for _ in range(3):
+            self.place(self.burger, self.cola)
+        for _ in range(2):
+            self.place(self.burger, self.fries, self.cola)
+        self.place(self.shake, self.cola)
+
+        burger = list(ItemNeighbor.objects.filter(menu_item=self.burger).order_by('-score').values_list(
+            'neighbor', 'together', 'score'))
+        self.assertEqual(burger, [(self.cola.id, 5, 1.0), (self.fries.id, 2, 0.4)])
+        # Pairs seen once are not recommendations
+        self.assertFalse(ItemNeighbor.objects.filter(menu_item=self.shake).exists())
+
+        self.assertEqual(recommend([self.fries.id]), [self.burger.id, self.cola.id])
+        self.assertEqual(recommend([self.burger.id, self.cola.id]), [self.fries.id])
+
+    def test_orders_taken_by_another_worker_reach_this_one(self):
+        for _ in range(2):
+            self.place(self.burger, self.cola)
+        self.assertEqual(recommend([self.burger.id]), [self.cola.id])
+
+        # Another worker counts three more baskets: its neighbor rows and the shared version change
+        add_baskets([[self.burger.id, self.fries.id]] * 3)
+        DataVersion.objects.filter(name='recommendations').update(token='other-worker')
+        self.assertEqual(recommend([self.burger.id]), [self.cola.id])
+
+        # This worker's copy of the shared versions expires
+        cache.delete('ramza:version:recommendations')
+        self.assertEqual(recommend([self.burger.id]), [self.fries.id, self.cola.id])
+
+    def test_version_moves_only_when_a_ranking_changes(self):
+        for _ in range(2):
+            self.place(self.burger, self.cola)
+        index = get_recommendation_index()
+
+        # Burger and cola keep each other at score 1.0: nothing for the workers to reload
+        self.place(self.burger, self.cola)
+        self.assertIs(get_recommendation_index(), index)
+        self.assertEqual(ItemNeighbor.objects.get(menu_item=self.burger).together, 3)
+
+        # Fries join burger's list
+        for _ in range(2):
+            self.place(self.burger, self.fries)
+        self.assertEqual(recommend([self.burger.id]), [self.cola.id, self.fries.id])
+
+    def test_incremental_updates_match_a_rebuild(self):
+        for items in [(self.burger, self.cola), (self.burger, self.cola, self.fries), (self.fries, self.cola),
+                      (self.burger, self.fries), (self.shake,)]:
+            self.place(*items)
+        matrix = sorted(ItemPairCount.objects.values_list('menu_item', 'other', 'orders'))
+        neighbors = self.neighbors()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_recommendations(), (len(matrix), len(neighbors)))
+        self.assertEqual(sorted(ItemPairCount.objects.values_list('menu_item', 'other', 'orders')), matrix)
+        self.assertEqual(self.neighbors(), neighbors)
+
+    def test_large_baskets_add_no_pairs(self):
+        self.assertEqual(len(basket_pairs([1, 2, 2, 3])), 3 + 6)
+        self.assertEqual(basket_pairs(range(MAX_BASKET_ITEMS + 1)), [(n, n) for n in range(MAX_BASKET_ITEMS + 1)])
@@ -1,3 +1,66 @@
-from django.shortcuts import render
+import json
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from restaurant.context_processors import SITE_CONTENT
+from .idempotency import IdempotencyError, run_once
+from .services import OrderError, OutOfStockError, place_order as create_order
 
-# Create your views here.
+
+def order_payload(order):
+    return {
+        'success': True,
+        'order_number': order.order_number,
+        'status': order.status,
+        'subtotal': str(order.subtotal),
+        'delivery_fee': str(order.delivery_fee),
+        'total': str(order.total),
+        'estimated_time': order.estimated_time,
+    }
+
+
+# Place Order (JSON body posted by checkout.html, with the CSRF token in X-CSRFToken)
+@require_POST
+def place_order(request):
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError(data)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+
+    def submit():
+        order = create_order(
+            lines=data.get('items'),
+            customer_name=str(data.get('customer_name', '')).strip(),
+            customer_phone=str(data.get('customer_phone', '')).strip(),
+            customer_email=str(data.get('customer_email', '')).strip(),
+            order_type=data.get('order_type', 'delivery'),
+            delivery_address=str(data.get('delivery_address', '')).strip(),
+            special_notes=str(data.get('special_notes', '')).strip(),
+            site_settings=SITE_CONTENT.get().site_settings,
+        )
+        return order, 201, order_payload(order)
+
+    key = request.headers.get('Idempotency-Key')
+    replayed = False
+    try:
+        if key:
+            # Retries with the same key get the first response back, without a second order
+            status, body, replayed = run_once(key, data, submit)
+        else:
+            _, status, body = submit()
+    except IdempotencyError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=422)
+    except OutOfStockError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'out_of_stock': [item.id for item in e.items],
+        }, status=409)
+    except OrderError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    response = JsonResponse(body, status=status)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
@@ -1,7 +1,13 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from . import media
+from .cache import bump_version
+from .derivatives import preview_url
+from .search import search_menu_items
+from .signals import menu_items_updated
 from .models import Category, MenuItem, SiteSettings, ContentSection, SiteImage
 from django.db import models
 from django.forms import Textarea
@@ -38,7 +44,7 @@ class CategoryAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="100" height="75" style="border-radius: 8px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="100" height="75" style="border-radius: 8px; object-fit: cover;" />', preview_url(obj.image, 200))
         return "No image uploaded"
     image_preview.short_description = 'Current Image'
     
@@ -86,7 +92,7 @@ class MenuItemAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="120" height="80" style="border-radius: 8px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="120" height="80" style="border-radius: 8px; object-fit: cover;" />', preview_url(obj.image, 240))
         return "⚠️ No image uploaded - Upload an image to make this item more appealing!"
     image_preview.short_description = 'Food Photo'
     
@@ -99,25 +105,38 @@ class MenuItemAdmin(admin.ModelAdmin):
             return format_html('<span style="color: green;">✅ In Stock ({})</span>', obj.stock_quantity)
     stock_status.short_description = 'Stock Status'
     
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index instead of icontains over search_fields; the list's own ordering still applies
+        if not search_term.strip():
+            return queryset, False
+        return search_menu_items(search_term, queryset), False
+    
     actions = ['mark_as_featured', 'remove_from_featured', 'mark_as_unavailable', 'mark_as_available']
     
+    def bulk_update_items(self, queryset, **fields):
+        # update() skips post_save and auto_now: stamp updated_at and announce the change ourselves
+        ids = list(queryset.values_list('pk', flat=True))
+        count = MenuItem.objects.filter(pk__in=ids).update(updated_at=timezone.now(), **fields)
+        menu_items_updated.send(sender=MenuItem, ids=ids, fields=list(fields))
+        return count
+    
     def mark_as_featured(self, request, queryset):
-        count = queryset.update(is_featured=True)
+        count = self.bulk_update_items(queryset, is_featured=True)
         self.message_user(request, f'{count} items marked as featured and will appear on homepage.')
     mark_as_featured.short_description = '⭐ Mark selected items as featured'
     
     def remove_from_featured(self, request, queryset):
-        count = queryset.update(is_featured=False)
+        count = self.bulk_update_items(queryset, is_featured=False)
         self.message_user(request, f'{count} items removed from featured section.')
     remove_from_featured.short_description = '📤 Remove from featured'
     
     def mark_as_unavailable(self, request, queryset):
-        count = queryset.update(is_available=False)
+        count = self.bulk_update_items(queryset, is_available=False)
         self.message_user(request, f'{count} items marked as unavailable and hidden from menu.')
     mark_as_unavailable.short_description = '🚫 Mark as unavailable'
     
     def mark_as_available(self, request, queryset):
-        count = queryset.update(is_available=True)
+        count = self.bulk_update_items(queryset, is_available=True)
         self.message_user(request, f'{count} items marked as available and visible on menu.')
     mark_as_available.short_description = '✅ Mark as available'
 
@@ -167,9 +186,9 @@ class ContentSectionAdmin(admin.ModelAdmin):
     def image_preview(self, obj):
         html = ""
         if obj.image:
-            html += format_html('<div><strong>Main Image:</strong><br><img src="{}" width="200" style="border-radius: 8px; margin: 5px 0;" /></div>', obj.image.url)
+            html += format_html('<div><strong>Main Image:</strong><br><img src="{}" width="200" style="border-radius: 8px; margin: 5px 0;" /></div>', preview_url(obj.image, 400))
         if obj.background_image:
-            html += format_html('<div><strong>Background Image:</strong><br><img src="{}" width="200" style="border-radius: 8px; margin: 5px 0;" /></div>', obj.background_image.url)
+            html += format_html('<div><strong>Background Image:</strong><br><img src="{}" width="200" style="border-radius: 8px; margin: 5px 0;" /></div>', preview_url(obj.background_image, 400))
         return html if html else "No images uploaded"
     image_preview.short_description = 'Image Preview'
     
@@ -218,7 +237,7 @@ class SiteImageAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="200" style="border-radius: 8px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" width="200" style="border-radius: 8px; object-fit: cover;" />', preview_url(obj.image, 400))
         return "No image uploaded"
     image_preview.short_description = 'Preview'
     
@@ -231,12 +250,19 @@ class SiteImageAdmin(admin.ModelAdmin):
     actions = ['mark_as_active', 'mark_as_inactive']
     
     def mark_as_active(self, request, queryset):
-        count = queryset.update(is_active=True)
+        ids = list(queryset.values_list('pk', flat=True))
+        count = SiteImage.objects.filter(pk__in=ids).update(is_active=True, updated_at=timezone.now())
+        media.refresh_active(SiteImage, ids)
+        # update() skips post_save, so invalidate the site chrome ourselves
+        bump_version('site_content')
         self.message_user(request, f'{count} images marked as active.')
     mark_as_active.short_description = '✅ Mark as active'
     
     def mark_as_inactive(self, request, queryset):
-        count = queryset.update(is_active=False)
+        ids = list(queryset.values_list('pk', flat=True))
+        count = SiteImage.objects.filter(pk__in=ids).update(is_active=False, updated_at=timezone.now())
+        media.refresh_active(SiteImage, ids)
+        bump_version('site_content')
         self.message_user(request, f'{count} images marked as inactive.')
     mark_as_inactive.short_description = '❌ Mark as inactive'
 @admin.register(SiteSettings)
@@ -279,7 +305,7 @@ class SiteSettingsAdmin(admin.ModelAdmin):
     
     def logo_preview(self, obj):
         if obj.logo:
-            return format_html('<img src="{}" width="100" height="100" style="border-radius: 8px; object-fit: cover;" />', obj.logo.url)
+            return format_html('<img src="{}" width="100" height="100" style="border-radius: 8px; object-fit: cover;" />', preview_url(obj.logo, 200))
         return "No logo uploaded"
     logo_preview.short_description = 'Logo Preview'
     
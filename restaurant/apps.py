@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class RestaurantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurant'
+
+    def ready(self):
+        # Register cache invalidation receivers
+        from . import signals  # noqa: F401
+
+        # Index background images once at startup; later requests only re-list on mtime change
+        from .backgrounds import background_index
+        background_index.refresh(force=True)
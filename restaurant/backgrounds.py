@@ -0,0 +1,138 @@
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+GRADIENT_CLASSES = ('gradient-1', 'gradient-2', 'gradient-3', 'gradient-4')
+
+# How often (seconds) the directory mtime is re-checked
+CHECK_INTERVAL = 5
+
+BackgroundImage = namedtuple('BackgroundImage', ['name', 'size', 'modified'])
+
+
+def _stable_index(key, count):
+    """Map a string onto range(count) identically in every worker process"""
+    return zlib.crc32(key.encode('utf-8')) % count
+
+
+class BackgroundIndex:
+    """
+    In-memory listing of static/images/background.
+
+    The directory is listed once and re-listed only when its mtime changes,
+    so selecting a background costs no filesystem calls on most requests.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0
+        self._images = ()
+        self.status = 'folder_missing'
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                if self.status != 'folder_missing':
+                    logger.warning(f"Background path does not exist: {self.path}")
+                self._mtime, self._images, self.status = None, (), 'folder_missing'
+                return
+            except OSError as e:
+                logger.error(f"Could not read background path {self.path}: {e}")
+                self._images, self.status = (), 'error'
+                return
+
+            if not force and mtime == self._mtime:
+                return
+
+            images = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    stat = entry.stat()
+                    images.append(BackgroundImage(entry.name, stat.st_size, stat.st_mtime))
+
+            self._mtime = mtime
+            self._images = tuple(sorted(images))
+            self.status = 'active' if images else 'empty'
+            logger.info(f"Indexed {len(images)} background images in {self.path}")
+
+    @property
+    def images(self):
+        self.refresh()
+        return self._images
+
+    @property
+    def signature(self):
+        """Changes whenever the set of indexed images does"""
+        self.refresh()
+        return self._mtime
+
+    def choose(self, key=None, mode=None):
+        """
+        Pick a background image path (relative to STATIC_URL), or None.
+
+        mode is one of:
+          'path'   - stable per `key` (usually request.path)
+          'daily'  - one image for the whole site, changing each day
+          'random' - a new image on every call
+        """
+        images = self.images
+        if not images:
+            return None
+        index = select_index(len(images), key, mode)
+        return f'images/background/{images[index].name}'
+
+
+def _rotation_mode(mode=None):
+    return mode or getattr(settings, 'BACKGROUND_ROTATION', 'path')
+
+
+def select_index(count, key=None, mode=None):
+    """Deterministically (unless mode is 'random') pick an index in range(count)"""
+    mode = _rotation_mode(mode)
+    if mode == 'random':
+        return random.randrange(count)
+    if mode == 'daily':
+        return _stable_index(timezone.localdate().isoformat(), count)
+    return _stable_index(key or '', count)
+
+
+def choose_gradient_class(key=None, mode=None):
+    """Gradient fallback for pages without a background image, chosen like the image"""
+    return GRADIENT_CLASSES[select_index(len(GRADIENT_CLASSES), key, mode)]
+
+
+background_index = BackgroundIndex(os.path.join(settings.BASE_DIR, 'static', 'images', 'background'))
+
+
+def rotation_token(mode=None):
+    """
+    Cache/ETag component that changes exactly when page backgrounds would,
+    or None under 'random' rotation, where no two responses are alike.
+    """
+    mode = _rotation_mode(mode)
+    if mode == 'random':
+        return None
+    token = f'{mode}:{background_index.signature}'
+    if mode == 'daily':
+        token += f':{timezone.localdate().isoformat()}'
+    return token
@@ -0,0 +1,118 @@
+import threading
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import DataVersion
+
+VERSION_KEY_PREFIX = 'ramza:version'
+
+
+def _version_key(name):
+    return f'{VERSION_KEY_PREFIX}:{name}'
+
+
+def get_version(name):
+    """
+    Get the current version token of a cached dataset. Tokens live in the
+    DataVersion table; each process re-reads them at most once every
+    CACHE_VERSION_CHECK_INTERVAL seconds, which bounds how long it can
+    serve a dataset another worker has changed.
+    """
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        versions = dict(DataVersion.objects.values_list('name', 'token'))
+        if name not in versions:
+            # First reader starts a fresh version
+            versions[name] = DataVersion.objects.get_or_create(name=name, defaults={'token': uuid.uuid4().hex})[0].token
+        cache.set_many(
+            {_version_key(dataset): token for dataset, token in versions.items()},
+            settings.CACHE_VERSION_CHECK_INTERVAL,
+        )
+        version = versions[name]
+    return version
+
+
+def set_version(name, token):
+    """Make `token` the version of a dataset for every worker; nothing is written if it already is"""
+    version, created = DataVersion.objects.get_or_create(name=name, defaults={'token': token})
+    if not created and version.token != token:
+        DataVersion.objects.filter(pk=version.pk).update(token=token)
+    cache.set(_version_key(name), token, settings.CACHE_VERSION_CHECK_INTERVAL)
+
+
+def bump_version(name):
+    """
+    Invalidate every snapshot of a dataset once the current transaction
+    commits: at once in this process, and in other workers within
+    CACHE_VERSION_CHECK_INTERVAL seconds. Publishing earlier would let
+    another thread rebuild a snapshot from the old committed rows under
+    the new token and keep serving it after the commit.
+    """
+    transaction.on_commit(lambda: set_version(name, uuid.uuid4().hex))
+
+
+class CacheStats:
+    """Per-process hit/miss counters for the caches layered over the site"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: [0, 0])
+
+    def record(self, name, hit):
+        with self._lock:
+            self._counts[name][0 if hit else 1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = {name: tuple(value) for name, value in self._counts.items()}
+        return {
+            name: {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+            for name, (hits, misses) in sorted(counts.items())
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+class VersionedSnapshot:
+    """
+    Process-level copy of a dataset, rebuilt by `loader` whenever the
+    version token of `name` changes. Readers never block each other:
+    the (version, data) pair is swapped in a single assignment.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._state = None
+
+    def get(self):
+        version = get_version(self.name)
+        state = self._state
+        if version is not None and state is not None and state[0] == version:
+            cache_stats.record(f'snapshot:{self.name}', True)
+            return state[1]
+
+        cache_stats.record(f'snapshot:{self.name}', False)
+        with self._lock:
+            state = self._state
+            if version is not None and state is not None and state[0] == version:
+                return state[1]
+            data = self.loader()
+            self._state = (version, data)
+        return data
+
+    def invalidate(self):
+        bump_version(self.name)
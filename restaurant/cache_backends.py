@@ -0,0 +1,21 @@
+from django.core.cache.backends.locmem import LocMemCache
+from .cache import cache_stats
+
+_MISSING = object()
+
+
+def fragment_name(key):
+    """'template.cache.menu_category_grid.<hash>' -> 'fragment:menu_category_grid'"""
+    parts = key.split('.')
+    if len(parts) >= 4 and parts[0] == 'template' and parts[1] == 'cache':
+        return f'fragment:{".".join(parts[2:-1])}'
+    return 'fragment'
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache that feeds {% cache %} hits and misses into cache_stats"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        cache_stats.record(fragment_name(key), value is not _MISSING)
+        return default if value is _MISSING else value
@@ -0,0 +1,137 @@
+import hashlib
+from collections import namedtuple
+from types import MappingProxyType
+from .cache import VersionedSnapshot
+from .models import Category, MediaAsset, MenuItem
+
+# Tuples keep a 5,000 item menu at a few hundred bytes per item and are
+# safe to share between threads: nothing in the catalog can be mutated.
+CatalogItem = namedtuple('CatalogItem', [
+    'id', 'name', 'description', 'price', 'category', 'category_id',
+    'image', 'image_widths', 'is_featured', 'updated_at',
+])
+
+CatalogCategory = namedtuple('CatalogCategory', [
+    'id', 'name', 'description', 'image', 'image_widths', 'sort_order', 'items', 'updated_at', 'digest',
+])
+
+
+class MenuCatalog:
+    """Immutable, precompiled view of the public menu"""
+
+    __slots__ = (
+        'categories', 'items', 'featured', 'by_id', 'positions', 'categories_by_id', 'category_names',
+        'last_modified', 'digest',
+    )
+
+    def __init__(self, categories):
+        self.categories = tuple(categories)
+        self.items = tuple(item for category in self.categories for item in category.items)
+        self.featured = tuple(item for item in self.items if item.is_featured)
+        self.by_id = MappingProxyType({item.id: item for item in self.items})
+        self.positions = MappingProxyType({item.id: index for index, item in enumerate(self.items)})
+        self.categories_by_id = MappingProxyType({category.id: category for category in self.categories})
+        self.category_names = tuple(category.name for category in self.categories)
+        self.last_modified = max(
+            (row.updated_at for row in self.categories + self.items), default=None,
+        )
+        self.digest = content_digest(self.categories + self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get_item(self, item_id):
+        return self.by_id.get(item_id)
+
+    def sort_key(self, item):
+        """(category sort order, category name, category id, item name, item id): where `item` sits in the catalog"""
+        category = self.categories_by_id[item.category_id]
+        return (category.sort_order, category.name, category.id, item.name, item.id)
+
+
+def content_digest(rows):
+    """
+    Fingerprint of (type, id, updated_at, image widths) for every row.
+    Unlike the newest updated_at alone, it also changes when a row is
+    deleted or hidden, or when its resized images become available.
+    """
+    digest = hashlib.sha1()
+    for row in rows:
+        updated_at = row.updated_at.isoformat() if row.updated_at else ''
+        widths = ','.join(map(str, getattr(row, 'image_widths', ())))
+        digest.update(f'{type(row).__name__}:{row.id}:{updated_at}:{widths};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def image_widths():
+    """{(owner model, id): widths} of the resized copies built for menu and category images"""
+    assets = MediaAsset.objects.filter(
+        owner_model__in=('restaurant.menuitem', 'restaurant.category'), field='image',
+    ).values_list('owner_model', 'owner_id', 'variants')
+    return {(owner_model, owner_id): tuple(variants) for owner_model, owner_id, variants in assets if variants}
+
+
+def compile_catalog():
+    """Build the catalog from available items in active categories (three queries)"""
+    widths = image_widths()
+    categories = list(Category.objects.filter(is_active=True).order_by('sort_order', 'name', 'pk'))
+    # Re-sorted in Python so catalog order is exactly MenuCatalog.sort_key order,
+    # whatever the database collation does with case and accents
+    categories.sort(key=lambda category: (category.sort_order, category.name, category.id))
+    items_by_category = {category.id: [] for category in categories}
+
+    items = (
+        MenuItem.objects
+        .filter(is_available=True, category__is_active=True)
+        .select_related('category')
+        # Items are bucketed per category anyway; this order reads straight off menu_item_available_idx
+        .order_by('category_id', 'name', 'pk')
+        .only(
+            'id', 'name', 'description', 'price', 'category_id', 'image',
+            'is_featured', 'updated_at', 'category__name',
+        )
+    )
+    for item in items:
+        bucket = items_by_category.get(item.category_id)
+        if bucket is None:
+            # Category was activated between the two queries; pick it up next compile
+            continue
+        bucket.append(CatalogItem(
+            id=item.id,
+            name=item.name,
+            description=item.description,
+            price=item.price,
+            category=item.category.name,
+            category_id=item.category_id,
+            image=item.image.url if item.image else None,
+            image_widths=widths.get(('restaurant.menuitem', item.id), ()) if item.image else (),
+            is_featured=item.is_featured,
+            updated_at=item.updated_at,
+        ))
+
+    compiled = []
+    for category in categories:
+        items_by_category[category.id].sort(key=lambda item: (item.name, item.id))
+        entry = CatalogCategory(
+            id=category.id,
+            name=category.name,
+            description=category.description,
+            image=category.image.url if category.image else None,
+            image_widths=widths.get(('restaurant.category', category.id), ()) if category.image else (),
+            sort_order=category.sort_order,
+            items=tuple(items_by_category[category.id]),
+            updated_at=category.updated_at,
+            digest=None,
+        )
+        # Per-category digest keys that category's cached item grid
+        compiled.append(entry._replace(digest=content_digest((entry,) + entry.items)))
+
+    return MenuCatalog(compiled)
+
+
+# Swapped for a freshly compiled catalog whenever restaurant.signals bumps 'catalog' (in any worker)
+CATALOG = VersionedSnapshot('catalog', compile_catalog)
+
+
+def get_catalog():
+    return CATALOG.get()
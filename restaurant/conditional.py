@@ -0,0 +1,107 @@
+import hashlib
+import logging
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+from .backgrounds import rotation_token
+from .cache import cache_stats
+from .catalog import get_catalog
+from .context_processors import SITE_CONTENT
+from .popularity import get_popular_ranking
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshots(uses_catalog, uses_popularity=False):
+    snapshots = [SITE_CONTENT.get()]
+    if uses_catalog:
+        snapshots.append(get_catalog())
+    if uses_popularity:
+        snapshots.append(get_popular_ranking())
+    return snapshots
+
+
+def page_version(request, uses_catalog=True, uses_popularity=False):
+    """
+    Version of everything a public page is rendered from: the site content
+    and (optionally) catalog and popular items digests plus the background
+    rotation. The digests are of the rows themselves, so every worker gives
+    the same ETag for the same content, and each worker's snapshots follow
+    the shared dataset versions (restaurant.cache). Returns None when the
+    response must not be served as a 304.
+    """
+    # Pending flash messages have to be rendered, not answered with "unchanged"
+    if request.COOKIES.get('messages'):
+        return None
+
+    background = rotation_token()
+    if background is None:
+        return None
+
+    try:
+        digests = [snapshot.digest for snapshot in _snapshots(uses_catalog, uses_popularity)]
+    except Exception as e:
+        logger.warning(f"Could not compute page version: {e}")
+        return None
+
+    key = '|'.join([request.path, background] + digests)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def page_last_modified(request, uses_catalog=True, uses_popularity=False):
+    """Newest updated_at among the rows a public page is rendered from"""
+    if page_version(request, uses_catalog, uses_popularity) is None:
+        return None
+    try:
+        dates = [snapshot.last_modified for snapshot in _snapshots(uses_catalog, uses_popularity)]
+    except Exception:
+        return None
+    return max((date for date in dates if date), default=None)
+
+
+def conditional_page(uses_catalog=True, uses_popularity=False):
+    """
+    Send strong ETag / Last-Modified headers and answer matching
+    conditional GETs with 304 before the view or template runs.
+    """
+    def etag_func(request, *args, **kwargs):
+        return page_version(request, uses_catalog, uses_popularity)
+
+    def last_modified_func(request, *args, **kwargs):
+        return page_last_modified(request, uses_catalog, uses_popularity)
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def cache_public_page(uses_catalog=True, uses_popularity=False):
+    """
+    Cache the rendered page for anonymous visitors under its page version,
+    so a catalog or content edit starts a new cache entry straight away.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            version = page_version(request, uses_catalog, uses_popularity)
+            if version is None:
+                return view_func(request, *args, **kwargs)
+
+            path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+            key = f'ramza:page:{version}:{path_hash}'
+            cached = cache.get(key)
+            if cached is not None:
+                cache_stats.record('page', True)
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            cache_stats.record('page', False)
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -1,7 +1,10 @@
-import os
-import random
-from django.conf import settings
+from collections import namedtuple
+from types import MappingProxyType
+from .backgrounds import background_index, choose_gradient_class
+from .cache import VersionedSnapshot
+from .catalog import content_digest
 from .models import SiteSettings, ContentSection, SiteImage
+from .staticfiles import BACKGROUND_WIDTH, optimized_static_path
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,96 +14,83 @@ def background_context(request):
     Context processor to add background images to templates.
     Only applies to non-home and non-admin pages.
     """
-    # Check if this is a home page or admin page
     path = request.path
-    
-    # Debug logging
-    logger.info(f"Background context called for path: {path}")
-    
+
     # Skip background for home page and admin pages
     if path == '/' or path.startswith('/dashboard/') or path.startswith('/admin/'):
-        logger.info(f"Skipping background for path: {path}")
         return {}
-    
-    # Get random background image or gradient
-    background_image = get_random_background()
-    gradient_class = get_random_gradient_class()
-    logger.info(f"Background image selected: {background_image}, Gradient class: {gradient_class}")
-    
+
+    # Same path -> same background, so the page stays cacheable
     return {
-        'page_background': background_image,
-        'gradient_class': gradient_class,
+        'page_background': get_random_background(path),
+        'gradient_class': get_random_gradient_class(path),
         'has_background': True,
     }
 
-def get_random_gradient_class():
-    """Get a random gradient class when no background images are available"""
-    gradient_classes = ['gradient-1', 'gradient-2', 'gradient-3', 'gradient-4']
-    return random.choice(gradient_classes)
+def get_random_gradient_class(key=None):
+    """Get a gradient class for when no background images are available"""
+    return choose_gradient_class(key)
 
-def get_random_background():
-    """Get a random background image from the background folder"""
+def get_random_background(key=None):
+    """Get a background image from the background folder index"""
     try:
-        background_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'background')
-        logger.info(f"Looking for background images in: {background_path}")
-        
-        if os.path.exists(background_path):
-            background_files = [f for f in os.listdir(background_path) 
-                              if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))
-                              and not f.startswith('.')]
-            logger.info(f"Found background files: {background_files}")
-            
-            if background_files:
-                selected_file = random.choice(background_files)
-                logger.info(f"Selected background file: {selected_file}")
-                return f'images/background/{selected_file}'
-            else:
-                logger.warning("No background image files found")
-        else:
-            logger.error(f"Background path does not exist: {background_path}")
+        background = background_index.choose(key)
+        # Resized copy built by collectstatic, if any
+        return optimized_static_path(background, BACKGROUND_WIDTH) if background else None
     except Exception as e:
         logger.error(f"Error in get_random_background: {e}")
-    
-    # Fallback to a subtle default background if no images found
-    logger.info("Returning None - no background image available")
     return None
 
+SiteContent = namedtuple('SiteContent', [
+    'site_settings', 'content_sections', 'site_images', 'last_modified', 'digest',
+])
+
+def load_site_content():
+    """Build the site chrome snapshot: settings, active sections and active images by type"""
+    site_settings = SiteSettings.objects.first()
+
+    content_sections = {
+        section.section: section
+        for section in ContentSection.objects.filter(is_active=True)
+    }
+
+    site_images = {}
+    for image in SiteImage.objects.filter(is_active=True).order_by('image_type', 'sort_order'):
+        site_images.setdefault(image.image_type, []).append(image)
+
+    rows = [site_settings] if site_settings else []
+    rows += list(content_sections.values())
+    rows += [image for images in site_images.values() for image in images]
+
+    return SiteContent(
+        site_settings=site_settings,
+        content_sections=MappingProxyType(content_sections),
+        site_images=MappingProxyType({k: tuple(v) for k, v in site_images.items()}),
+        last_modified=max((row.updated_at for row in rows), default=None),
+        digest=content_digest(rows),
+    )
+
+# Rebuilt only when restaurant.signals bumps the 'site_content' version
+SITE_CONTENT = VersionedSnapshot('site_content', load_site_content)
+
 def site_content(request):
     """Add dynamic site content to all templates"""
-    context = {}
-    
-    # Get site settings
     try:
-        site_settings = SiteSettings.objects.first()
-        if site_settings:
-            context['site_settings'] = site_settings
+        snapshot = SITE_CONTENT.get()
     except Exception as e:
-        logger.warning(f"Could not fetch site settings: {e}")
+        logger.warning(f"Could not fetch site content: {e}")
         # Provide defaults
-        context['site_settings'] = None
-    
-    # Get content sections
-    try:
-        content_sections = {}
-        sections = ContentSection.objects.filter(is_active=True)
-        for section in sections:
-            content_sections[section.section] = section
-        context['content_sections'] = content_sections
-    except Exception as e:
-        logger.warning(f"Could not fetch content sections: {e}")
-        context['content_sections'] = {}
-    
-    # Get site images by type
-    try:
-        site_images = {}
-        images = SiteImage.objects.filter(is_active=True).order_by('sort_order')
-        for image in images:
-            if image.image_type not in site_images:
-                site_images[image.image_type] = []
-            site_images[image.image_type].append(image)
-        context['site_images'] = site_images
-    except Exception as e:
-        logger.warning(f"Could not fetch site images: {e}")
-        context['site_images'] = {}
-    
-    return context
\ No newline at end of file
+        return {
+            'site_settings': None,
+            'content_sections': {},
+            'site_images': {},
+            'site_content_version': None,
+        }
+
+    return {
+        'site_settings': snapshot.site_settings,
+        'content_sections': snapshot.content_sections,
+        'site_images': snapshot.site_images,
+        # Cache key for the {% cache %} nav and footer fragments in base.html
+        'site_content_version': snapshot.digest,
+    }
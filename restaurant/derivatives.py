@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from .cache import bump_version
+from .imaging import VARIANT_FORMATS, resize_variants, variant_name
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Widths (px) generated for every uploaded image; never larger than the original
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+
+# Owners whose pages are rendered from the catalog rather than the site content
+CATALOG_OWNERS = {'restaurant.menuitem', 'restaurant.category'}
+
+
+def generate_variants(name, storage=default_storage):
+    """Write every width/format derivative of `name` beside it; returns the widths written"""
+    with storage.open(name, 'rb') as file:
+        encoded = resize_variants(file, VARIANT_WIDTHS)
+
+    for width, fmt, data in encoded:
+        target = variant_name(name, width, fmt)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(data))
+    return sorted({width for width, _, _ in encoded})
+
+
+def delete_variants(name, widths, storage=default_storage):
+    for width in widths:
+        for fmt in VARIANT_FORMATS:
+            target = variant_name(name, width, fmt)
+            try:
+                storage.delete(target)
+            except OSError as e:
+                logger.warning(f"Could not delete image variant {target}: {e}")
+
+
+def build_variants(asset_id):
+    """Generate the derivatives of one MediaAsset and publish them to the page caches"""
+    asset = MediaAsset.objects.filter(pk=asset_id).first()
+    if asset is None or asset.collection == 'static':
+        return []
+    try:
+        widths = generate_variants(asset.path)
+    except Exception as e:
+        logger.warning(f"Could not build image variants for {asset.path}: {e}")
+        return []
+
+    # The owner may have uploaded another file meanwhile; that upload schedules its own build
+    if MediaAsset.objects.filter(pk=asset.pk, path=asset.path).update(variants=widths):
+        bump_version('catalog' if asset.owner_model in CATALOG_OWNERS else 'site_content')
+    return widths
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants',
+            )
+    return _executor
+
+
+def _build_in_worker(asset_id):
+    close_old_connections()
+    try:
+        build_variants(asset_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(asset_id):
+    """Build an asset's derivatives on the worker pool once the upload has committed"""
+    if not settings.IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(lambda: build_variants(asset_id))
+        return
+    transaction.on_commit(lambda: _pool().submit(_build_in_worker, asset_id))
+
+
+def srcset(url, widths, fmt='jpeg'):
+    """srcset attribute value for the derivatives of an image URL"""
+    return ', '.join(f'{variant_name(url, width, fmt)} {width}w' for width in widths)
+
+
+def preview_url(field_file, width):
+    """Smallest stored variant at least `width` px wide (for admin thumbnails), else the original"""
+    for variant_width in VARIANT_WIDTHS:
+        if variant_width < width:
+            continue
+        name = variant_name(field_file.name, variant_width, 'jpeg')
+        if field_file.storage.exists(name):
+            return field_file.storage.url(name)
+        break
+    return field_file.url
@@ -0,0 +1,61 @@
+"""
+Image resizing shared by the upload derivatives and the collectstatic
+post-processor. Kept free of Django imports so process-pool workers can
+import it without setting Django up.
+"""
+import io
+from PIL import Image, ImageOps
+
+# format: (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(name, width, fmt):
+    """
+    menu_items/burger.png -> menu_items/burger.png.w320.webp (works on URLs too).
+    The source extension stays in the name so burger.png and burger.jpg
+    never share variant files.
+    """
+    return f'{name}.w{width}.{VARIANT_FORMATS[fmt][1]}'
+
+
+def resize_variants(file, widths, max_width=None):
+    """
+    Encode `file` (a file object or bytes) at each width narrower than the
+    original, in every VARIANT_FORMATS format. With `max_width`, the image is
+    also re-encoded at its own width (capped to max_width).
+    Returns [(width, format, bytes)]; picklable, so it can run in a process pool.
+    """
+    source = file if isinstance(file, bytes) else None
+    if source is not None:
+        file = io.BytesIO(source)
+    with Image.open(file) as opened:
+        source_format = opened.format
+        original = ImageOps.exif_transpose(opened)
+        original.load()
+
+    targets = {width for width in widths if width < original.width}
+    if max_width:
+        targets.add(min(original.width, max_width))
+
+    encoded = []
+    for width in sorted(targets):
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for fmt, (pil_format, _, options) in VARIANT_FORMATS.items():
+            image = resized
+            if pil_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            # An already well-compressed JPEG re-encoded at its own size can grow; keep the smaller
+            if source and width == original.width and pil_format == source_format and len(source) < len(data):
+                data = source
+            encoded.append((width, fmt, data))
+    return encoded
@@ -0,0 +1,192 @@
+import bisect
+import re
+import threading
+from functools import lru_cache
+from collections import Counter, defaultdict, namedtuple
+from .catalog import get_catalog
+
+WORD = re.compile(r'\w+')
+
+# Words must share at least this trigram similarity (as pg_trgm) with a query word to count as a typo of it
+FUZZY_THRESHOLD = 0.35
+
+# Match scores: a whole word beats a completion, which beats a typo
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+FUZZY_SCORE = 0.8
+
+# Weight of a word by where it appears in the item
+NAME_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+
+MAX_QUERY_WORDS = 6
+
+# A one-letter prefix can complete to most of the vocabulary; only the first completions count
+MAX_COMPLETIONS = 200
+
+# Shorter query words share too few trigrams with anything for typo matching to mean much
+MIN_FUZZY_LENGTH = 3
+
+# What an item contributes to the index; items whose key is unchanged are not re-indexed
+Document = namedtuple('Document', ['key', 'words'])
+
+
+def words_of(text):
+    return WORD.findall(text.lower())
+
+
+@lru_cache(maxsize=65536)
+def trigrams(word):
+    padded = f'  {word} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _document(item):
+    words = {word: CATEGORY_WEIGHT for word in words_of(item.category)}
+    words.update({word: NAME_WEIGHT for word in words_of(item.name)})
+    return Document(key=(item.name, item.category), words=words)
+
+
+class MenuSearchIndex:
+    """
+    Immutable word and trigram index over one catalog snapshot, answering
+    prefix (autocomplete) and typo-tolerant queries from memory.
+
+    Built from the previous index when there is one: only items whose name
+    or category changed, or that were added or removed, are re-indexed, and
+    the postings they touch are replaced rather than mutated, so readers of
+    the old index are never disturbed.
+    """
+
+    def __init__(self, catalog, previous=None):
+        self.catalog = catalog
+        self.positions = catalog.positions
+        if previous is None:
+            self.documents, self.postings, self.trigram_postings, vocabulary = {}, {}, {}, []
+        else:
+            self.documents = dict(previous.documents)
+            self.postings = dict(previous.postings)
+            self.trigram_postings = dict(previous.trigram_postings)
+            vocabulary = previous.vocabulary
+
+        current = {item.id: item for item in catalog.items}
+        removed, added = defaultdict(set), defaultdict(dict)
+        for item_id, document in list(self.documents.items()):
+            item = current.get(item_id)
+            if item is None or _document(item).key != document.key:
+                del self.documents[item_id]
+                for word in document.words:
+                    removed[word].add(item_id)
+        for item_id, item in current.items():
+            if item_id not in self.documents:
+                document = self.documents[item_id] = _document(item)
+                for word, weight in document.words.items():
+                    added[word][item_id] = weight
+
+        new_words, dead_words = self._apply(self.postings, removed, added)
+        if new_words or dead_words:
+            self.vocabulary = sorted(set(vocabulary).difference(dead_words).union(new_words))
+        else:
+            self.vocabulary = vocabulary
+
+        trigrams_removed, trigrams_added = defaultdict(set), defaultdict(set)
+        for word in dead_words:
+            for trigram in trigrams(word):
+                trigrams_removed[trigram].add(word)
+        for word in new_words:
+            for trigram in trigrams(word):
+                trigrams_added[trigram].add(word)
+        for trigram in trigrams_removed.keys() | trigrams_added.keys():
+            words = self.trigram_postings.get(trigram, frozenset())
+            words = words.difference(trigrams_removed.get(trigram, ())).union(trigrams_added.get(trigram, ()))
+            if words:
+                self.trigram_postings[trigram] = words
+            else:
+                self.trigram_postings.pop(trigram, None)
+
+    @staticmethod
+    def _apply(postings, removed, added):
+        """Replace (never mutate) the posting dict of every touched word; returns (new words, dead words)"""
+        new_words, dead_words = [], []
+        for word in removed.keys() | added.keys():
+            old = postings.get(word, {})
+            gone = removed.get(word, ())
+            updated = {item_id: weight for item_id, weight in old.items() if item_id not in gone}
+            updated.update(added.get(word, {}))
+            if updated:
+                postings[word] = updated
+                if not old:
+                    new_words.append(word)
+            elif old:
+                del postings[word]
+                dead_words.append(word)
+        return new_words, dead_words
+
+    def _completions(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff', start)
+        return self.vocabulary[start:end]
+
+    def _similar(self, word):
+        """{vocabulary word: trigram similarity} for words at least FUZZY_THRESHOLD similar"""
+        query = trigrams(word)
+        shared = Counter()
+        for trigram in query:
+            shared.update(self.trigram_postings.get(trigram, ()))
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(query) + len(trigrams(candidate)) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                similar[candidate] = similarity
+        return similar
+
+    def _word_scores(self, word):
+        """{item id: score} of the items matching one query word"""
+        matches = dict.fromkeys(self._completions(word)[:MAX_COMPLETIONS], PREFIX_SCORE)
+        if word in self.postings:
+            matches[word] = EXACT_SCORE
+        if not matches and len(word) >= MIN_FUZZY_LENGTH:
+            # Nothing starts with the word: treat it as a typo
+            matches = {candidate: FUZZY_SCORE * similarity for candidate, similarity in self._similar(word).items()}
+
+        scores = {}
+        for candidate, score in matches.items():
+            for item_id, weight in self.postings[candidate].items():
+                scores[item_id] = max(scores.get(item_id, 0), score * weight)
+        return scores
+
+    def search(self, query, limit=10):
+        """Catalog items matching every word of `query`, best first (ties in menu order)"""
+        words = words_of(query)[:MAX_QUERY_WORDS]
+        if not words:
+            return []
+
+        totals = None
+        for word in words:
+            scores = self._word_scores(word)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {item_id: total + scores[item_id] for item_id, total in totals.items() if item_id in scores}
+            if not totals:
+                return []
+
+        ranked = sorted(totals, key=lambda item_id: (-totals[item_id], self.positions[item_id]))
+        return [self.catalog.get_item(item_id) for item_id in ranked[:limit]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Index of the current catalog, derived from the last one built in this process"""
+    global _index
+    catalog = get_catalog()
+    index = _index
+    if index is not None and index.catalog is catalog:
+        return index
+    with _index_lock:
+        if _index is None or _index.catalog is not catalog:
+            _index = MenuSearchIndex(catalog, previous=_index)
+        return _index
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+from menu.changelog import paused as paused_changelog
+from restaurant.models import Category, MenuItem, StockShard
+from restaurant.stock import InsufficientStock, reconcile, shard_stock, take_stock
+
+
+class Command(BaseCommand):
+    help = 'Compare stock reservations on a single MenuItem row with sharded stock counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--reservations', type=int, default=1000, help='Reservations to attempt per run')
+        parser.add_argument('--shards', type=int, default=8)
+        parser.add_argument('--hold-ms', type=float, default=2.0,
+                            help='Time each transaction stays open after reserving, standing in for order writes')
+
+    def handle(self, *args, **options):
+        # The benchmark rows are deleted again, so menu sync clients never need to hear about them
+        with paused_changelog():
+            category = Category.objects.create(name='Benchmark', is_active=False)
+            try:
+                for label, shards in (('row', 0), ('sharded', options['shards'])):
+                    item = MenuItem.objects.create(
+                        name=f'Benchmark {label}', description='Load test item', price='10.00',
+                        category=category, stock_quantity=options['reservations'], is_available=True,
+                    )
+                    if shards:
+                        shard_stock(item.pk, shards)
+                    self.report(label, item, options)
+            finally:
+                category.delete()
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite allows one writer at a time, so shards cannot help here; run against PostgreSQL to compare'
+            ))
+
+    def report(self, label, item, options):
+        hold = options['hold_ms'] / 1000
+
+        def reserve(n):
+            try:
+                for retry in range(20):
+                    try:
+                        with transaction.atomic():
+                            take_stock({item.pk: 1})
+                            time.sleep(hold)
+                        return 'reserved'
+                    except InsufficientStock:
+                        return 'rejected'
+                    except OperationalError:
+                        time.sleep(0.005 * (retry + 1))
+                return 'error'
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(reserve, range(options['reservations'])))
+        elapsed = time.perf_counter() - started
+
+        reconcile([item.pk])
+        item.refresh_from_db()
+        reserved = results.count('reserved')
+        self.stdout.write(
+            f"{label:>8}: {reserved / elapsed:8.1f} reservations/s, {reserved} reserved, "
+            f"{results.count('error')} errors, final stock {item.stock_quantity}"
+        )
+        if reserved + item.stock_quantity != options['reservations'] or item.stock_quantity < 0:
+            self.stdout.write(self.style.ERROR(f'{label}: stock does not add up'))
+        StockShard.objects.filter(menu_item=item).delete()
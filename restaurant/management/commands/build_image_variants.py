@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from restaurant.derivatives import build_variants
+from restaurant.models import MediaAsset
+
+
+class Command(BaseCommand):
+    help = 'Build resized WebP/JPEG copies of uploaded images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS)
+        parser.add_argument('--all', action='store_true', help='Rebuild images that already have variants')
+
+    def handle(self, *args, **options):
+        assets = MediaAsset.objects.exclude(collection='static').exclude(content_hash='')
+        if not options['all']:
+            assets = assets.filter(variants=[])
+        ids = list(assets.values_list('pk', flat=True))
+
+        def build(asset_id):
+            try:
+                return build_variants(asset_id)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            built = sum(1 for widths in pool.map(build, ids) if widths)
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} of {len(ids)} images'))
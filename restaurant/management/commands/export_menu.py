@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from restaurant.menu_io import FORMATS, export_rows, render_rows
+
+
+class Command(BaseCommand):
+    help = 'Write every menu item as CSV or JSON (to a file or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Defaults to stdout')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for row in export_rows():
+                rows += 1
+                yield row
+
+        chunks = render_rows(counted(), options['format'])
+        if options['path']:
+            with open(options['path'], 'w', newline='', encoding='utf-8') as stream:
+                stream.writelines(chunks)
+            seconds = time.monotonic() - started
+            rate = rows / seconds if seconds else rows
+            self.stdout.write(self.style.SUCCESS(f'Exported {rows} items in {seconds:.2f}s ({rate:.0f} rows/s)'))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            # Keep stdout clean for piping
+            self.stderr.write(f'Exported {rows} items')
@@ -0,0 +1,31 @@
+import csv
+import os
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.menu_io import FORMATS, IMPORT_CHUNK_SIZE, import_menu, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create or update menu items from a CSV or JSON file (matched by category and name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format')
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                result = import_menu(read_rows(stream, fmt), chunk_size=max(1, options['chunk_size']))
+        except (OSError, ValueError, csv.Error) as e:  # MenuImportError is a ValueError
+            raise CommandError(str(e))
+
+        rate = result.rows / result.seconds if result.seconds else result.rows
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.rows} rows in {result.seconds:.2f}s ({rate:.0f} rows/s): '
+            f'{result.created} created, {result.updated} updated, {result.categories_created} new categories'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from restaurant.media import rebuild_inventory
+
+
+class Command(BaseCommand):
+    help = 'Re-index every uploaded and static image into the media inventory'
+
+    def handle(self, *args, **options):
+        total = rebuild_inventory()
+        self.stdout.write(self.style.SUCCESS(f'Media inventory holds {total} images'))
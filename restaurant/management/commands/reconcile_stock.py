@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from restaurant.stock import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Write sharded stock totals back into MenuItem.stock_quantity'
+
+    def handle(self, *args, **options):
+        changed = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Updated stock for {len(changed)} menu items'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.models import MenuItem
+from restaurant.stock import DEFAULT_SHARDS, shard_stock, unshard_stock
+
+
+class Command(BaseCommand):
+    help = 'Split the stock of hot menu items into shards (or fold it back with --unshard)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('item_ids', nargs='+', type=int)
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+        parser.add_argument('--unshard', action='store_true', help='Move the stock back onto the menu item row')
+
+    def handle(self, *args, **options):
+        if options['shards'] < 1:
+            raise CommandError('--shards must be at least 1')
+
+        for item_id in options['item_ids']:
+            try:
+                item = MenuItem.objects.get(pk=item_id)
+            except MenuItem.DoesNotExist:
+                raise CommandError(f'Menu item {item_id} does not exist')
+
+            if options['unshard']:
+                unshard_stock(item.pk)
+                self.stdout.write(self.style.SUCCESS(f'{item.name}: stock moved back to the item'))
+            else:
+                shard_stock(item.pk, options['shards'])
+                self.stdout.write(self.style.SUCCESS(f"{item.name}: stock split into {options['shards']} shards"))
@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import os
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.db import transaction
+from . import derivatives
+from .models import Category, ContentSection, MediaAsset, MenuItem, SiteImage, SiteSettings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+# Static images listed alongside uploads, relative to static/
+STATIC_IMAGE_DIR = 'images'
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def _menu_item(item, field):
+    return item.name, 'Menu Item', item.is_available
+
+
+def _category(category, field):
+    return category.name, 'Category', category.is_active
+
+
+def _site_settings(site_settings, field):
+    return ('Restaurant Logo', 'Site Logo', True) if field == 'logo' else ('Favicon', 'Favicon', True)
+
+
+def _content_section(section, field):
+    label = 'Section Background' if field == 'background_image' else 'Section Image'
+    return str(section), label, section.is_active
+
+
+def _site_image(image, field):
+    return image.name, image.get_image_type_display(), image.is_active
+
+
+# model: (collection, image fields, describe(instance, field) -> (name, label, is_active))
+TRACKED_MODELS = {
+    MenuItem: ('menu_items', ['image'], _menu_item),
+    Category: ('categories', ['image'], _category),
+    SiteSettings: ('site', ['logo', 'favicon'], _site_settings),
+    ContentSection: ('site', ['image', 'background_image'], _content_section),
+    SiteImage: ('site', ['image'], _site_image),
+}
+
+
+# Flag mirrored into MediaAsset.is_active
+ACTIVE_FIELDS = {
+    MenuItem: 'is_available',
+    Category: 'is_active',
+    ContentSection: 'is_active',
+    SiteImage: 'is_active',
+}
+
+
+def owner_label(model):
+    return model._meta.label_lower
+
+
+def inspect_file(file):
+    """(width, height, size, sha256) of an open file, reading it once in chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    try:
+        width, height = get_image_dimensions(file)
+    except Exception:
+        width = height = None
+    return width, height, size, digest.hexdigest()
+
+
+def _inspect_field_file(field_file):
+    try:
+        with field_file.storage.open(field_file.name, 'rb') as file:
+            return inspect_file(file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {field_file.name} for the media inventory: {e}")
+        return None, None, 0, ''
+
+
+def sync_owner(instance):
+    """Bring the inventory rows of one saved instance in line with its image fields"""
+    collection, fields, describe = TRACKED_MODELS[type(instance)]
+    owner_model = owner_label(type(instance))
+    existing = {
+        asset.field: asset
+        for asset in MediaAsset.objects.filter(owner_model=owner_model, owner_id=instance.pk)
+    }
+
+    for field in fields:
+        field_file = getattr(instance, field)
+        asset = existing.get(field)
+        if not field_file:
+            if asset:
+                _delete_asset(asset)
+            continue
+
+        name, label, is_active = describe(instance, field)
+        if asset is None:
+            asset = MediaAsset(collection=collection, owner_model=owner_model, owner_id=instance.pk, field=field)
+        elif asset.path == field_file.name and (asset.name, asset.label, asset.is_active) == (name, label, is_active):
+            continue
+
+        # Only a new file needs to be read again
+        new_file = asset.path != field_file.name or not asset.content_hash
+        if new_file:
+            _delete_variants(asset)
+            asset.width, asset.height, asset.size, asset.content_hash = _inspect_field_file(field_file)
+            asset.path = field_file.name
+            asset.url = field_file.url
+            asset.variants = []
+        asset.name, asset.label, asset.is_active = name, label, is_active
+        asset.save()
+        if new_file and asset.content_hash:
+            derivatives.schedule_variants(asset.pk)
+
+
+def refresh_active(model, ids):
+    """Re-read the active flag of owners changed through queryset.update()"""
+    active_field = ACTIVE_FIELDS[model]
+    for is_active in (True, False):
+        owners = model.objects.filter(pk__in=ids, **{active_field: is_active}).values('pk')
+        MediaAsset.objects.filter(owner_model=owner_label(model), owner_id__in=owners).update(is_active=is_active)
+
+
+def _delete_variants(asset):
+    """Delete the resized copies of an asset's file, unless another owner still shows the same file"""
+    if not asset.variants:
+        return
+    if MediaAsset.objects.filter(path=asset.path).exclude(collection='static').exclude(pk=asset.pk).exists():
+        return
+    derivatives.delete_variants(asset.path, asset.variants)
+
+
+def _delete_asset(asset):
+    _delete_variants(asset)
+    asset.delete()
+
+
+def remove_owner(instance):
+    for asset in MediaAsset.objects.filter(owner_model=owner_label(type(instance)), owner_id=instance.pk):
+        _delete_asset(asset)
+
+
+def static_image_root():
+    return os.path.join(settings.BASE_DIR, 'static', STATIC_IMAGE_DIR)
+
+
+def sync_static_images():
+    """Index the image files directly under static/images; returns (added, removed)"""
+    folder = static_image_root()
+    files = {}
+    if os.path.isdir(folder):
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                files[f'{STATIC_IMAGE_DIR}/{entry.name}'] = entry.path
+
+    existing = {asset.path: asset for asset in MediaAsset.objects.filter(collection='static')}
+    removed = [asset.pk for path, asset in existing.items() if path not in files]
+    new_assets = []
+    for path, full_path in files.items():
+        if path in existing:
+            continue
+        with open(full_path, 'rb') as file:
+            width, height, size, content_hash = inspect_file(file)
+        new_assets.append(MediaAsset(
+            collection='static', owner_model='static', field='', name=os.path.basename(path),
+            label='Static Image', path=path, url=f'{settings.STATIC_URL.rstrip("/")}/{path}',
+            width=width, height=height, size=size, content_hash=content_hash,
+        ))
+
+    with transaction.atomic():
+        MediaAsset.objects.filter(pk__in=removed).delete()
+        MediaAsset.objects.bulk_create(new_assets)
+    return len(new_assets), len(removed)
+
+
+def rebuild_inventory():
+    """Re-index every tracked model and the static images; returns the number of assets"""
+    for model, (collection, fields, describe) in TRACKED_MODELS.items():
+        owner_model = owner_label(model)
+        live_ids = set()
+        for instance in model.objects.all().iterator():
+            live_ids.add(instance.pk)
+            sync_owner(instance)
+        for asset in MediaAsset.objects.filter(owner_model=owner_model).exclude(owner_id__in=live_ids):
+            _delete_asset(asset)
+    sync_static_images()
+    return MediaAsset.objects.count()
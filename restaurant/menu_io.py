@@ -0,0 +1,258 @@
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from .models import Category, MenuItem
+from .signals import menu_items_updated
+from .stock import shard_counts, shard_stock
+
+FORMATS = ('csv', 'json')
+
+# Columns read by import_menu; items are matched on (category, name)
+IMPORT_FIELDS = (
+    'name', 'category', 'description', 'price', 'ingredients', 'is_available', 'is_featured',
+    'preparation_time', 'stock_quantity', 'low_stock_threshold', 'calories',
+)
+EXPORT_FIELDS = ('id',) + IMPORT_FIELDS
+
+BOOLEAN_FIELDS = {'is_available', 'is_featured'}
+TEXT_FIELDS = {'name', 'category', 'description', 'ingredients'}
+INTEGER_FIELDS = {'preparation_time', 'stock_quantity', 'low_stock_threshold'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+
+ImportResult = namedtuple('ImportResult', ['rows', 'created', 'updated', 'categories_created', 'seconds'])
+
+
+class MenuImportError(ValueError):
+    """A row of the import file cannot be used; nothing was imported"""
+
+    def __init__(self, row_number, message):
+        self.row_number = row_number
+        super().__init__(f'Row {row_number}: {message}')
+
+
+# Reading
+
+def read_rows(stream, fmt):
+    """Yield dicts from a text stream of CSV (with a header) or a JSON array of objects"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'json':
+        yield from _iter_json_array(stream)
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+
+def _iter_json_array(stream, chunk_size=64 * 1024):
+    """Decode a top-level JSON array one element at a time instead of loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    expecting = '['
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer) or expecting == 'value' and buffer[position] not in ']':
+            if position == len(buffer):
+                if eof:
+                    raise ValueError('Unexpected end of JSON input')
+                chunk = stream.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = stream.read(chunk_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            if not isinstance(value, dict):
+                raise ValueError('Expected a JSON array of objects')
+            yield value
+            buffer, position, expecting = buffer[end:], 0, ','
+            continue
+
+        char = buffer[position]
+        position += 1
+        if expecting == '[' and char == '[':
+            expecting = 'value'
+        elif expecting in ('value', ',') and char == ']':
+            return
+        elif expecting == ',' and char == ',':
+            expecting = 'value'
+        else:
+            raise ValueError(f'Expected a JSON array of menu items, found {char!r}')
+
+
+def clean_row(row, row_number):
+    """Typed field values of one import row (only the columns it has)"""
+    values = {}
+    for field in IMPORT_FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        value = value.strip() if isinstance(value, str) else value
+        try:
+            if field in BOOLEAN_FIELDS:
+                value = value if isinstance(value, bool) else str(value).lower() in TRUE_VALUES
+            elif field in INTEGER_FIELDS:
+                value = int(value)
+            elif field == 'calories':
+                value = int(value) if value not in ('', None) else None
+            elif field == 'price':
+                value = Decimal(str(value)).quantize(Decimal('0.01'))
+            elif value is None:
+                value = ''
+            elif field in TEXT_FIELDS and not isinstance(value, str):
+                # e.g. "category": 5 in a JSON file
+                raise TypeError(value)
+        except (ValueError, TypeError, InvalidOperation):
+            raise MenuImportError(row_number, f'invalid {field}: {row[field]!r}')
+        values[field] = value
+
+    for field in ('name', 'category', 'price'):
+        if values.get(field) in (None, ''):
+            raise MenuImportError(row_number, f'{field} is required')
+    return values
+
+
+# Importing
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_menu(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert menu items from dicts (see IMPORT_FIELDS), matching existing
+    items by category and name. Categories are resolved by name from one
+    query and missing ones are created. Each chunk is written with a
+    single bulk_create(update_conflicts=True) on the primary key, and the
+    whole import is one transaction: a bad row aborts it.
+
+    Every row must have the columns of the first row, and existing items
+    get only those columns written. New items take model defaults for the
+    rest. Returns an ImportResult.
+    """
+    started = time.monotonic()
+    total = created = updated = categories_created = 0
+    changed_ids = []
+    columns = update_fields = None
+
+    with transaction.atomic():
+        categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+
+        for chunk in _chunks(enumerate(rows, start=1), chunk_size):
+            cleaned = [clean_row(row, row_number) for row_number, row in chunk]
+            if columns is None:
+                columns = set(cleaned[0])
+                update_fields = [
+                    'category_id' if field == 'category' else field for field in IMPORT_FIELDS if field in columns
+                ] + ['updated_at']
+            for (row_number, _), values in zip(chunk, cleaned):
+                if set(values) != columns:
+                    # A partial row would write defaults over the columns it lacks
+                    missing = ', '.join(sorted(columns - set(values))) or 'none'
+                    extra = ', '.join(sorted(set(values) - columns)) or 'none'
+                    raise MenuImportError(
+                        row_number, f'columns differ from the first row (missing: {missing}; extra: {extra})',
+                    )
+
+            new_names = {}
+            for values in cleaned:
+                new_names.setdefault(values['category'].lower(), values['category'])
+            missing = [name for key, name in new_names.items() if key not in categories]
+            if missing:
+                for category in Category.objects.bulk_create([Category(name=name) for name in missing]):
+                    categories[category.name.lower()] = category.pk
+                categories_created += len(missing)
+
+            # Later rows for the same item win
+            by_key = {}
+            for values in cleaned:
+                category_id = categories[values.pop('category').lower()]
+                by_key[(category_id, values['name'])] = values
+
+            existing = {
+                (category_id, name): pk
+                for pk, category_id, name in MenuItem.objects.filter(
+                    category_id__in={key[0] for key in by_key}, name__in={key[1] for key in by_key},
+                ).values_list('pk', 'category_id', 'name')
+            }
+            now = timezone.now()
+            items = [
+                MenuItem(pk=existing.get(key), category_id=key[0], updated_at=now, **values)
+                for key, values in by_key.items()
+            ]
+            MenuItem.objects.bulk_create(
+                items, update_conflicts=True, unique_fields=['id'], update_fields=update_fields,
+            )
+
+            total += len(chunk)
+            updated += sum(1 for key in by_key if key in existing)
+            created += sum(1 for key in by_key if key not in existing)
+            changed_ids += [item.pk for item in items]
+
+        # bulk_create skips post_save: re-split sharded stock and announce the change once
+        if update_fields and 'stock_quantity' in update_fields:
+            shards = shard_counts()
+            for item_id, stock in MenuItem.objects.filter(
+                    pk__in=[pk for pk in changed_ids if pk in shards]).values_list('pk', 'stock_quantity'):
+                shard_stock(item_id, shards[item_id], quantity=stock)
+        if changed_ids:
+            fields = [field for field in update_fields if field != 'updated_at']
+            transaction.on_commit(lambda: menu_items_updated.send(sender=MenuItem, ids=changed_ids, fields=fields))
+
+    return ImportResult(total, created, updated, categories_created, time.monotonic() - started)
+
+
+# Exporting
+
+def export_rows(queryset=None):
+    """Yield one dict per menu item (EXPORT_FIELDS) without loading the table"""
+    queryset = MenuItem.objects.all() if queryset is None else queryset
+    fields = [('category__name' if field == 'category' else field) for field in EXPORT_FIELDS]
+    for values in queryset.order_by('pk').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dict(zip(EXPORT_FIELDS, values))
+
+
+def _json_value(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def render_rows(rows, fmt):
+    """Yield text chunks of CSV or a JSON array, one row at a time"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'json':
+        separator = '[\n'
+        for row in rows:
+            yield separator + json.dumps({key: _json_value(value) for key, value in row.items()})
+            separator = ',\n'
+        yield '[]\n' if separator == '[\n' else '\n]\n'
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
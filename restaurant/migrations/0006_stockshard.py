@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0005_sitesettings_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='restaurant.menuitem')),
+            ],
+            options={
+                'ordering': ['menu_item', 'shard'],
+                'unique_together': {('menu_item', 'shard')},
+            },
+        ),
+    ]
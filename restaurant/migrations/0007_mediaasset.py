@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0006_stockshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(choices=[('menu_items', 'Menu Items'), ('categories', 'Categories'), ('site', 'Site Images'), ('static', 'Static Files')], max_length=20)),
+                ('owner_model', models.CharField(help_text='Model the image belongs to, e.g. restaurant.menuitem', max_length=50)),
+                ('owner_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('field', models.CharField(blank=True, max_length=50)),
+                ('name', models.CharField(max_length=200)),
+                ('label', models.CharField(help_text='Kind of image, e.g. Menu Item or Site Logo', max_length=50)),
+                ('path', models.CharField(help_text='Storage name, or the path under static/ for static files', max_length=500)),
+                ('url', models.CharField(max_length=500)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('size', models.PositiveBigIntegerField(default=0, help_text='Bytes')),
+                ('content_hash', models.CharField(blank=True, help_text='SHA-256 of the file', max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['collection', 'name', 'id'],
+                'indexes': [models.Index(fields=['collection', 'name', 'id'], name='media_collection_idx'), models.Index(fields=['owner_model', 'owner_id'], name='media_owner_idx'), models.Index(fields=['content_hash'], name='media_hash_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner_model', 'owner_id', 'field'), name='media_owner_field_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0007_mediaasset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='variants',
+            field=models.JSONField(blank=True, default=list, help_text='Widths of the generated WebP/JPEG derivatives'),
+        ),
+    ]
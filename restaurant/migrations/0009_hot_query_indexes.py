@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0008_mediaasset_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'name'], name='menu_item_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_available', True), ('is_featured', True)), fields=['category'], name='menu_item_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='siteimage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['image_type', 'sort_order'], name='site_image_active_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from restaurant.search import install
+    install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from restaurant.search import uninstall
+    uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0010_menu_item_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, help_text='Recent sales with time decay (see restaurant.popularity)'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-popularity'], name='menu_item_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0012_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='stock_reconciled_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Last write-back of sharded stock (see restaurant.stock)', null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_scores(apps, schema_editor):
+    MenuItem = apps.get_model('restaurant', 'MenuItem')
+    ItemPopularity = apps.get_model('restaurant', 'ItemPopularity')
+    ItemPopularity.objects.bulk_create([
+        ItemPopularity(menu_item_id=item_id, score=score)
+        for item_id, score in MenuItem.objects.exclude(popularity=0).values_list('pk', 'popularity').iterator()
+    ], batch_size=500)
+
+
+def restore_scores(apps, schema_editor):
+    MenuItem = apps.get_model('restaurant', 'MenuItem')
+    ItemPopularity = apps.get_model('restaurant', 'ItemPopularity')
+    for item_id, score in ItemPopularity.objects.values_list('menu_item_id', 'score').iterator():
+        MenuItem.objects.filter(pk=item_id).update(popularity=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0013_menu_item_stock_reconciled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemPopularity',
+            fields=[
+                ('menu_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='restaurant.menuitem')),
+                ('score', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='item_popularity_score_idx')],
+            },
+        ),
+        migrations.RunPython(copy_scores, restore_scores),
+        migrations.RemoveIndex(
+            model_name='menuitem',
+            name='menu_item_popular_idx',
+        ),
+        migrations.RemoveField(
+            model_name='menuitem',
+            name='popularity',
+        ),
+    ]
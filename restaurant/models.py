@@ -81,6 +81,11 @@ class SiteImage(models.Model):
     
     class Meta:
         ordering = ['image_type', 'sort_order', 'name']
+        indexes = [
+            # Active images grouped by type, as the site_content context processor reads them
+            models.Index(fields=['image_type', 'sort_order'], condition=models.Q(is_active=True),
+                         name='site_image_active_idx'),
+        ]
         verbose_name = 'Site Image'
         verbose_name_plural = 'Site Images'
     
@@ -131,11 +136,20 @@ class MenuItem(models.Model):
     stock_quantity = models.IntegerField(default=100, help_text="Current stock level (0 = out of stock)")
     low_stock_threshold = models.IntegerField(default=10, help_text="Alert when stock falls below this number")
     calories = models.IntegerField(blank=True, null=True, help_text="Calories per serving (optional)")
+    stock_reconciled_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="Last write-back of sharded stock (see restaurant.stock)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['category', 'name']
+        indexes = [
+            # Catalog compile and Category.available_count: available items per category, by name
+            models.Index(fields=['category', 'name'], condition=models.Q(is_available=True),
+                         name='menu_item_available_idx'),
+            # Dashboard featured count; featured items are a handful, so index only those rows
+            models.Index(fields=['category'], condition=models.Q(is_featured=True, is_available=True),
+                         name='menu_item_featured_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} - R{self.price}'
@@ -149,12 +163,70 @@ class MenuItem(models.Model):
         return self.stock_quantity <= 0
 
     def reduce_stock(self, quantity=1):
-        """Reduce stock when item is ordered"""
-        if self.stock_quantity >= quantity:
-            self.stock_quantity -= quantity
-            self.save()
-            return True
-        return False
+        """Reduce stock when item is ordered (atomic; never goes below zero)"""
+        from django.db import transaction
+        from .signals import menu_items_updated
+        from .stock import InsufficientStock, take_stock
+
+        try:
+            with transaction.atomic():
+                take_stock({self.pk: quantity})
+        except InsufficientStock:
+            return False
+        self.refresh_from_db(fields=['stock_quantity', 'updated_at'])
+        menu_items_updated.send(sender=MenuItem, ids=[self.pk], fields=['stock_quantity'])
+        return True
+
+
+class StockShard(models.Model):
+    """
+    One slice of a hot item's stock. Orders decrement a single slice, so
+    concurrent orders for the same item lock different rows instead of
+    queueing on the MenuItem row. MenuItem.stock_quantity is kept in step
+    by restaurant.stock.reconcile().
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('menu_item', 'shard')
+        ordering = ['menu_item', 'shard']
+
+    def __str__(self):
+        return f'{self.menu_item_id}#{self.shard}: {self.quantity}'
+
+
+class ItemPopularity(models.Model):
+    """
+    Recent sales of one menu item with time decay (see restaurant.popularity).
+    Kept apart from MenuItem so recording an order's sales never locks the
+    catalog row that stock sharding keeps out of the order path.
+    """
+    menu_item = models.OneToOneField(MenuItem, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            # Home page popular items: top-N by score
+            models.Index(fields=['-score'], name='item_popularity_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item_id}: {self.score:.3g}'
+
+
+class DataVersion(models.Model):
+    """
+    Current version token of a cached dataset (see restaurant.cache). Kept
+    in the database so every worker process sees the same token and drops
+    its snapshot of the dataset when another worker changes it.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    token = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f'{self.name}: {self.token}'
 
 class SiteSettings(models.Model):
     """Global site settings that admin can modify"""
@@ -201,6 +273,8 @@ class SiteSettings(models.Model):
     logo = models.ImageField(upload_to='site/', blank=True, null=True, help_text="Restaurant logo (recommended: 200x200px)")
     favicon = models.ImageField(upload_to='site/', blank=True, null=True, help_text="Favicon (recommended: 32x32px)")
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name = 'Site Settings'
         verbose_name_plural = 'Site Settings'
@@ -213,3 +287,51 @@ class SiteSettings(models.Model):
         if not self.pk and SiteSettings.objects.exists():
             raise ValueError('Only one SiteSettings instance is allowed')
         super().save(*args, **kwargs)
+
+class MediaAsset(models.Model):
+    """
+    Inventory of every image the site serves, kept up to date when the
+    owning row is saved or deleted (see restaurant.media). Galleries and
+    image-management pages page through this table instead of walking
+    models and folders.
+    """
+    COLLECTION_CHOICES = [
+        ('menu_items', 'Menu Items'),
+        ('categories', 'Categories'),
+        ('site', 'Site Images'),
+        ('static', 'Static Files'),
+    ]
+
+    collection = models.CharField(max_length=20, choices=COLLECTION_CHOICES)
+    owner_model = models.CharField(max_length=50, help_text="Model the image belongs to, e.g. restaurant.menuitem")
+    owner_id = models.PositiveIntegerField(null=True, blank=True)
+    field = models.CharField(max_length=50, blank=True)
+    name = models.CharField(max_length=200)
+    label = models.CharField(max_length=50, help_text="Kind of image, e.g. Menu Item or Site Logo")
+    path = models.CharField(max_length=500, help_text="Storage name, or the path under static/ for static files")
+    url = models.CharField(max_length=500)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    size = models.PositiveBigIntegerField(default=0, help_text="Bytes")
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the file")
+    variants = models.JSONField(default=list, blank=True, help_text="Widths of the generated WebP/JPEG derivatives")
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['collection', 'name', 'id']
+        indexes = [
+            models.Index(fields=['collection', 'name', 'id'], name='media_collection_idx'),
+            models.Index(fields=['owner_model', 'owner_id'], name='media_owner_idx'),
+            models.Index(fields=['content_hash'], name='media_hash_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['owner_model', 'owner_id', 'field'], name='media_owner_field_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.label})"
+
+    @property
+    def size_kb(self):
+        return round(self.size / 1024, 1)
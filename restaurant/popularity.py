@@ -0,0 +1,107 @@
+import hashlib
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+from .cache import VersionedSnapshot, set_version
+from .models import ItemPopularity
+
+# Scores use forward decay: a sale at time t adds units * 2 ** ((t - POPULARITY_EPOCH) / half-life).
+# Every score shrinks at the same rate as time passes, so the stored order is already the decayed
+# order and never needs rewriting. Weights outgrow a float after ~1000 half-lives (about 19 years
+# at 7 days): move the epoch forward and run rebuild_popularity well before then.
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# How many of the top ids are kept; the home page skips ones that are no longer on the menu
+POPULAR_ITEMS_LIMIT = 12
+
+# Scores written per statement when they are rebuilt
+SCORE_BATCH_SIZE = 500
+
+PopularRanking = namedtuple('PopularRanking', ['item_ids', 'digest', 'last_modified'])
+
+
+def half_life_seconds():
+    return settings.POPULARITY_HALF_LIFE_DAYS * 24 * 60 * 60
+
+
+def sale_weight(sold_at):
+    """What one unit sold at `sold_at` adds to an item's score"""
+    return 2 ** ((sold_at - POPULARITY_EPOCH).total_seconds() / half_life_seconds())
+
+
+def _weighted(scores):
+    return Case(
+        *[When(pk=item_id, then=Value(score)) for item_id, score in scores.items()],
+        default=Value(0.0), output_field=FloatField(),
+    )
+
+
+def add_sales(units, sign=1):
+    """
+    Add (or with sign=-1 take back) {(menu item id, sold at): units} to the
+    ItemPopularity scores in one UPDATE, and refresh the ranking once the
+    write commits. MenuItem rows are not touched.
+    """
+    scores = defaultdict(float)
+    for (item_id, sold_at), quantity in units.items():
+        scores[item_id] += sign * quantity * sale_weight(sold_at)
+    if not scores:
+        return
+    updated = ItemPopularity.objects.filter(pk__in=scores).update(score=F('score') + _weighted(scores))
+    if updated < len(scores):
+        # First sale of some items: another worker may create the same rows, so create at 0 and add
+        existing = set(ItemPopularity.objects.filter(pk__in=scores).values_list('pk', flat=True))
+        missing = {item_id: score for item_id, score in scores.items() if item_id not in existing}
+        ItemPopularity.objects.bulk_create(
+            [ItemPopularity(menu_item_id=item_id) for item_id in missing], ignore_conflicts=True,
+        )
+        ItemPopularity.objects.filter(pk__in=missing).update(score=F('score') + _weighted(missing))
+    transaction.on_commit(refresh_ranking)
+
+
+def set_scores(scores):
+    """Replace every item's score with {menu item id: score} (items not listed get 0)"""
+    with transaction.atomic():
+        ItemPopularity.objects.all().delete()
+        ItemPopularity.objects.bulk_create(
+            [ItemPopularity(menu_item_id=item_id, score=score) for item_id, score in scores.items() if score],
+            batch_size=SCORE_BATCH_SIZE,
+        )
+        transaction.on_commit(refresh_ranking)
+
+
+def top_item_ids(limit=POPULAR_ITEMS_LIMIT):
+    """Best selling available items, read down the score index"""
+    return list(
+        ItemPopularity.objects.filter(score__gt=0, menu_item__is_available=True)
+        .order_by('-score', 'pk').values_list('pk', flat=True)[:limit]
+    )
+
+
+def ranking_digest(item_ids):
+    return hashlib.sha1(','.join(map(str, item_ids)).encode('utf-8')).hexdigest()
+
+
+def refresh_ranking():
+    """
+    Re-read the top items and make their digest the shared version of
+    'popular_items': when the ranking changed, every worker's pages built
+    from the old one are invalidated; otherwise nothing is written
+    """
+    set_version('popular_items', ranking_digest(top_item_ids()))
+
+
+def load_ranking():
+    item_ids = top_item_ids()
+    # Rebuilt only when the ranking changes, so this is no earlier than the change
+    return PopularRanking(tuple(item_ids), ranking_digest(item_ids), timezone.now())
+
+
+POPULAR_ITEMS = VersionedSnapshot('popular_items', load_ranking)
+
+
+def get_popular_ranking():
+    return POPULAR_ITEMS.get()
@@ -0,0 +1,68 @@
+import re
+from django.db import connection, transaction
+
+# Tables that grow with the business; a full scan of any of these is a regression
+WATCHED_TABLES = (
+    'restaurant_menuitem',
+    'restaurant_siteimage',
+    'restaurant_mediaasset',
+    'orders_order',
+    'orders_orderitem',
+)
+
+SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+
+# SQLite >= 3.36 prints "SCAN t", older versions "SCAN TABLE t"; "... USING INDEX" is not a full scan
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def explain(sql, params=()):
+    """Plan lines (SQLite) or plan nodes (PostgreSQL) for one statement"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[3] for row in cursor.fetchall()]
+
+    if connection.vendor == 'postgresql':
+        # Small test tables always plan as Seq Scan; with seq scans priced
+        # out the planner only picks one when no index can answer the query
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return list(_walk(plan[0]['Plan']))
+
+    raise NotImplementedError(f'No plan inspection for {connection.vendor}')
+
+
+def _walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _walk(child)
+
+
+def full_scans(sql, params=(), tables=WATCHED_TABLES):
+    """Watched tables the statement reads in full"""
+    scanned = []
+    for step in explain(sql, params):
+        if connection.vendor == 'sqlite':
+            match = SQLITE_FULL_SCAN.match(step)
+            table = match.group(1) if match else None
+        else:
+            table = step.get('Relation Name') if step['Node Type'] == 'Seq Scan' else None
+        if table in tables:
+            scanned.append(table)
+    return scanned
+
+
+def captured_full_scans(captured_queries, tables=WATCHED_TABLES):
+    """{sql: [tables]} for the SELECTs in a CaptureQueriesContext that scan a watched table"""
+    regressions = {}
+    for query in captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scanned = full_scans(sql, tables=tables)
+        if scanned:
+            regressions[sql] = scanned
+    return regressions
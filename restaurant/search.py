@@ -0,0 +1,157 @@
+import re
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from .models import MenuItem
+
+# SQLite FTS5 index over restaurant_menuitem (an external-content table: it stores only the index)
+FTS_TABLE = 'restaurant_menuitem_fts'
+
+# bm25 weights for name, description, ingredients; PostgreSQL weighs them A, C, B
+FTS_WEIGHTS = (10.0, 1.0, 4.0)
+
+# Words past this are ignored
+MAX_SEARCH_WORDS = 8
+
+WORD = re.compile(r'\w+')
+
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE restaurant_menuitem ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(ingredients, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX menu_item_search_idx ON restaurant_menuitem USING GIN (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS menu_item_search_idx',
+    'ALTER TABLE restaurant_menuitem DROP COLUMN IF EXISTS search_vector',
+]
+
+# Keep the FTS index in step with every write to the indexed columns, including queryset.update()
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON restaurant_menuitem BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description, ingredients)
+            VALUES (new.id, new.name, new.description, new.ingredients);
+        END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON restaurant_menuitem BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, ingredients)
+            VALUES ('delete', old.id, old.name, old.description, old.ingredients);
+        END
+    """,
+    f'{FTS_TABLE}_update': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF name, description, ingredients ON restaurant_menuitem BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, ingredients)
+            VALUES ('delete', old.id, old.name, old.description, old.ingredients);
+            INSERT INTO {FTS_TABLE}(rowid, name, description, ingredients)
+            VALUES (new.id, new.name, new.description, new.ingredients);
+        END
+    """,
+}
+
+
+def install(schema_editor):
+    """Create the search index for the database behind `schema_editor` (called from a migration)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_INSTALL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"name, description, ingredients, content='restaurant_menuitem', content_rowid='id', "
+            f"tokenize='porter unicode61')"
+        )
+        for sql in SQLITE_TRIGGERS.values():
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_UNINSTALL:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def repair_sqlite_index(using='default'):
+    """
+    Recreate missing FTS triggers and rebuild the index. SQLite migrations
+    that alter restaurant_menuitem copy it to a new table, which drops the
+    triggers with the old one. Returns True if anything was repaired.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'restaurant_menuitem'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return False
+        for sql in SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def search_menu_items(query, queryset=None):
+    """
+    Menu items whose name, description or ingredients contain every word of
+    `query` (as a prefix, stemmed), best matches first and annotated with
+    `search_rank`. Uses the tsvector/GIN index on PostgreSQL and FTS5 on
+    SQLite; other databases fall back to icontains.
+    """
+    queryset = MenuItem.objects.all() if queryset is None else queryset
+    words = [word.lower() for word in WORD.findall(query)][:MAX_SEARCH_WORDS]
+    if not words:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return (
+            queryset
+            .alias(search_match=RawSQL(
+                "restaurant_menuitem.search_vector @@ to_tsquery('english', %s)", [tsquery],
+                output_field=BooleanField(),
+            ))
+            .filter(search_match=True)
+            .annotate(search_rank=RawSQL(
+                "ts_rank(restaurant_menuitem.search_vector, to_tsquery('english', %s))", [tsquery],
+                output_field=FloatField(),
+            ))
+            .order_by('-search_rank', 'name')
+        )
+
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return (
+            queryset
+            .filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+            # bm25 scores are lower-is-better
+            .annotate(search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = restaurant_menuitem.id', [match],
+                output_field=FloatField(),
+            ))
+            .order_by('-search_rank', 'name')
+        )
+
+    matches = Q()
+    for word in words:
+        matches &= Q(name__icontains=word) | Q(description__icontains=word) | Q(ingredients__icontains=word)
+    return queryset.filter(matches).annotate(search_rank=Value(0.0)).order_by('name')
@@ -0,0 +1,114 @@
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver, Signal
+from . import media, popularity, search
+from .cache import bump_version
+from .models import Category, MenuItem, SiteSettings, ContentSection, SiteImage
+
+# Sent with ids=[...] and fields=[...] after MenuItem rows change through
+# queryset.update() or F() expressions, which bypass post_save.
+menu_items_updated = Signal()
+
+# The public catalog does not show stock levels
+STOCK_FIELDS = {'stock_quantity'}
+
+
+@receiver([post_save, post_delete], sender=SiteSettings)
+@receiver([post_save, post_delete], sender=ContentSection)
+@receiver([post_save, post_delete], sender=SiteImage)
+def invalidate_site_content(sender, **kwargs):
+    """Drop the cached site chrome whenever settings, sections or images change"""
+    bump_version('site_content')
+
+
+@receiver(m2m_changed, sender=SiteImage.used_in_sections.through)
+def invalidate_site_content_usage(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('site_content')
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    """Recompile the menu catalog whenever an item or category changes"""
+    bump_version('catalog')
+
+
+@receiver(menu_items_updated)
+def invalidate_catalog_after_update(sender, fields=None, **kwargs):
+    # Orders only move stock; recompiling the catalog for each one would defeat it
+    if fields and set(fields) <= STOCK_FIELDS:
+        return
+    bump_version('catalog')
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def refresh_popular_items(sender, raw=False, **kwargs):
+    """An item going on or off the menu can change which items are the most popular"""
+    if not raw:
+        transaction.on_commit(popularity.refresh_ranking)
+
+
+@receiver(menu_items_updated)
+def refresh_popular_items_after_update(sender, fields=None, **kwargs):
+    if not fields or 'is_available' in fields:
+        transaction.on_commit(popularity.refresh_ranking)
+
+
+@receiver(pre_save, sender=MenuItem)
+def remember_stored_stock(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    from .stock import shard_counts
+    if shard_counts([instance.pk]):
+        instance._stored_stock = MenuItem.objects.filter(pk=instance.pk).values_list('stock_quantity', flat=True).first()
+
+
+@receiver(post_save, sender=MenuItem)
+def sync_stock_shards(sender, instance, raw=False, **kwargs):
+    """Saving a sharded item with a new stock_quantity re-splits its shards to that total"""
+    stored = instance.__dict__.pop('_stored_stock', None)
+    if raw or stored is None:
+        return
+    from .stock import reconcile, shard_stock
+    shard_count = instance.stock_shards.count()
+    if not shard_count:
+        return
+    if instance.stock_quantity != stored:
+        shard_stock(instance.pk, shard_count, quantity=instance.stock_quantity)
+    else:
+        # Other fields were edited from a possibly stale form: keep the shard total
+        reconcile([instance.pk])
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_save, sender=ContentSection)
+@receiver(post_save, sender=SiteImage)
+def update_media_inventory(sender, instance, raw=False, **kwargs):
+    """Keep the MediaAsset rows of an image-bearing row in step with its files"""
+    if not raw:
+        media.sync_owner(instance)
+
+
+@receiver(menu_items_updated)
+def update_media_inventory_after_update(sender, ids, fields=None, **kwargs):
+    if fields and 'is_available' not in fields:
+        return
+    media.refresh_active(MenuItem, ids)
+
+
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SiteSettings)
+@receiver(post_delete, sender=ContentSection)
+@receiver(post_delete, sender=SiteImage)
+def remove_from_media_inventory(sender, instance, **kwargs):
+    media.remove_owner(instance)
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, app_config, using='default', **kwargs):
+    if app_config.label == 'restaurant':
+        search.repair_sqlite_index(using)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.templatetags.static import static
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+from .imaging import VARIANT_FORMATS, resize_variants, variant_name
+
+logger = logging.getLogger(__name__)
+
+# Widths (px) built for bundled images; each is also re-encoded at its own width up to the largest
+STATIC_VARIANT_WIDTHS = (480, 960, 1600)
+
+# Widest copy pages ask for when an image fills the viewport
+BACKGROUND_WIDTH = 1600
+
+STATIC_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+VARIANTS_MANIFEST = 'image-variants.json'
+
+VARIANT_SUFFIX = re.compile(r'\.w\d+$')
+
+
+def _is_source_image(name):
+    root, ext = os.path.splitext(name)
+    # Skip our own output (name.jpg.w960.jpg) if it ever ends up in a source folder
+    return ext.lower() in STATIC_IMAGE_EXTENSIONS and not VARIANT_SUFFIX.search(root)
+
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed + compressed storage that, during collectstatic,
+    also writes resized and recompressed JPEG and WebP copies of bundled
+    images. The copies are hashed and compressed like any other file.
+    Images whose content hash is unchanged since the last run are skipped;
+    the rest are encoded in parallel on a process pool.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, a fresh checkout): with
+            # WHITENOISE_MANIFEST_STRICT off, serve the unhashed file via the finders
+            if self.manifest_strict:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            for name in self.build_image_variants(paths):
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def build_image_variants(self, paths):
+        previous = self.read_variants_manifest()
+        manifest, pending = {}, {}
+        for name, (storage, path) in paths.items():
+            if not _is_source_image(name):
+                continue
+            with storage.open(path) as file:
+                data = file.read()
+            content_hash = hashlib.sha256(data).hexdigest()
+
+            entry = previous.get(name)
+            if entry and entry['hash'] == content_hash and all(
+                self.exists(variant_name(name, width, fmt)) for width in entry['widths'] for fmt in VARIANT_FORMATS
+            ):
+                manifest[name] = entry
+            else:
+                pending[name] = (content_hash, data)
+
+        if pending:
+            workers = settings.STATIC_IMAGE_WORKERS or os.cpu_count()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    name: pool.submit(resize_variants, data, STATIC_VARIANT_WIDTHS, max(STATIC_VARIANT_WIDTHS))
+                    for name, (content_hash, data) in pending.items()
+                }
+                for name, future in futures.items():
+                    try:
+                        encoded = future.result()
+                    except Exception as e:
+                        logger.warning(f"Could not optimize {name}: {e}")
+                        continue
+                    for width, fmt, data in encoded:
+                        target = variant_name(name, width, fmt)
+                        if self.exists(target):
+                            self.delete(target)
+                        self._save(target, ContentFile(data))
+                    manifest[name] = {'hash': pending[name][0], 'widths': sorted({width for width, _, _ in encoded})}
+
+        self.write_variants_manifest(manifest)
+        self._image_variants = manifest
+        return [
+            variant_name(name, width, fmt)
+            for name, entry in manifest.items() for width in entry['widths'] for fmt in VARIANT_FORMATS
+        ]
+
+    def read_variants_manifest(self):
+        try:
+            with self.open(VARIANTS_MANIFEST) as file:
+                return json.loads(file.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def write_variants_manifest(self, manifest):
+        if self.exists(VARIANTS_MANIFEST):
+            self.delete(VARIANTS_MANIFEST)
+        self._save(VARIANTS_MANIFEST, ContentFile(json.dumps(manifest, sort_keys=True).encode('utf-8')))
+
+    @property
+    def image_variants(self):
+        """{source path: {'hash': ..., 'widths': [...]}} written by the last collectstatic"""
+        if getattr(self, '_image_variants', None) is None:
+            self._image_variants = self.read_variants_manifest()
+        return self._image_variants
+
+
+def _widths(path):
+    variants = getattr(staticfiles_storage, 'image_variants', None) or {}
+    entry = variants.get(path)
+    return entry['widths'] if entry else []
+
+
+def optimized_static_path(path, width=None, fmt='jpeg'):
+    """
+    Static path of the widest optimized copy of `path` no wider than `width`
+    (the narrowest copy if all are wider); `path` itself when the static
+    storage has not built any. Pass the result to {% static %} / static().
+    """
+    widths = _widths(path)
+    if not widths:
+        return path
+    fitting = [w for w in widths if width is None or w <= width]
+    return variant_name(path, max(fitting) if fitting else min(widths), fmt)
+
+
+def static_srcsets(path):
+    """{'webp': srcset, 'jpeg': srcset} of hashed URLs for a bundled image, or None"""
+    widths = _widths(path)
+    if not widths:
+        return None
+    return {
+        fmt: ', '.join(f'{static(variant_name(path, width, fmt))} {width}w' for width in widths)
+        for fmt in VARIANT_FORMATS
+    }
@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import zlib
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.utils import timezone
+from .models import MenuItem, StockShard
+from .signals import menu_items_updated
+
+logger = logging.getLogger(__name__)
+
+# Items decremented per UPDATE statement
+STOCK_UPDATE_BATCH = 100
+
+DEFAULT_SHARDS = 8
+
+# Seconds between write-backs of shard totals into MenuItem.stock_quantity
+RECONCILE_INTERVAL = 1
+
+
+class InsufficientStock(Exception):
+    def __init__(self, items):
+        self.items = items
+        super().__init__(', '.join(item.name for item in items))
+
+
+def shard_counts(item_ids=None):
+    """
+    {menu_item_id: shard count} of the items (all, or `item_ids`) that keep
+    their stock in shards, read from StockShard so every worker agrees
+    """
+    shards = StockShard.objects.all()
+    if item_ids is not None:
+        shards = shards.filter(menu_item_id__in=item_ids)
+    return dict(shards.values('menu_item_id').annotate(shards=Count('id')).values_list('menu_item_id', 'shards'))
+
+
+def take_stock(quantities):
+    """
+    Take {menu_item_id: quantity} out of stock. Must run inside a
+    transaction; raises InsufficientStock if any item is short, in which
+    case the caller's rollback undoes everything already taken.
+    """
+    # Decided in this transaction, so an item sharded by another worker a moment ago is seen as sharded
+    sharded = shard_counts(quantities)
+    short = []
+
+    plain = {item_id: quantity for item_id, quantity in quantities.items() if item_id not in sharded}
+    short += _take_from_rows(plain)
+
+    for item_id, quantity in quantities.items():
+        if item_id in sharded and not _take_from_shards(item_id, quantity, sharded[item_id]):
+            short.append(item_id)
+
+    if short:
+        raise InsufficientStock(list(MenuItem.objects.filter(pk__in=short).order_by('pk')))
+
+    if sharded:
+        transaction.on_commit(lambda: maybe_reconcile(list(sharded)))
+
+
+def _take_from_rows(quantities):
+    """
+    One conditional UPDATE per batch of MenuItem rows. Each row only
+    matches while it still has enough stock, so concurrent orders can
+    never push stock below zero. Returns the ids that were short.
+    """
+    ids = list(quantities)
+    now = timezone.now()
+    for start in range(0, len(ids), STOCK_UPDATE_BATCH):
+        batch = ids[start:start + STOCK_UPDATE_BATCH]
+        enough_stock = Q()
+        for item_id in batch:
+            enough_stock |= Q(pk=item_id, stock_quantity__gte=quantities[item_id])
+
+        updated = MenuItem.objects.filter(enough_stock).update(
+            stock_quantity=Case(
+                *[When(pk=item_id, then=F('stock_quantity') - quantities[item_id]) for item_id in batch],
+                default=F('stock_quantity'),
+            ),
+            updated_at=now,
+        )
+        if updated != len(batch):
+            short_stock = Q()
+            for item_id in batch:
+                short_stock |= Q(pk=item_id, stock_quantity__lt=quantities[item_id])
+            return list(MenuItem.objects.filter(short_stock).values_list('pk', flat=True))
+    return []
+
+
+def _home_shard(item_id, shard_count):
+    """Each worker thread starts at its own shard, so peers rarely meet on one row"""
+    key = f'{os.getpid()}:{threading.get_ident()}:{item_id}'
+    return zlib.crc32(key.encode('ascii')) % shard_count
+
+
+def _take_from_shards(item_id, quantity, shard_count):
+    home = _home_shard(item_id, shard_count)
+    for offset in range(shard_count):
+        shard = (home + offset) % shard_count
+        if StockShard.objects.filter(
+            menu_item_id=item_id, shard=shard, quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity):
+            return True
+
+    # No single shard has enough (stock is nearly gone): lock them all and take across shards
+    shards = list(StockShard.objects.select_for_update().filter(menu_item_id=item_id))
+    if not shards:
+        # Unsharded since we looked: the stock is back on the item row
+        return not _take_from_rows({item_id: quantity})
+    if sum(shard.quantity for shard in shards) < quantity:
+        return False
+    remaining = quantity
+    for shard in shards:
+        if not shard.quantity:
+            continue
+        taken = min(shard.quantity, remaining)
+        StockShard.objects.filter(pk=shard.pk).update(quantity=F('quantity') - taken)
+        remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def _split(total, shard_count):
+    base, extra = divmod(max(total, 0), shard_count)
+    return [base + (1 if shard < extra else 0) for shard in range(shard_count)]
+
+
+@transaction.atomic
+def shard_stock(item_id, shard_count=DEFAULT_SHARDS, quantity=None):
+    """Move an item's stock into `shard_count` shards (or re-split, optionally to a new total)"""
+    item = MenuItem.objects.select_for_update().get(pk=item_id)
+    existing = StockShard.objects.select_for_update().filter(menu_item=item)
+    if quantity is None:
+        quantity = existing.aggregate(total=Sum('quantity'))['total'] if existing.exists() else item.stock_quantity
+    existing.delete()
+
+    StockShard.objects.bulk_create([
+        StockShard(menu_item=item, shard=shard, quantity=part)
+        for shard, part in enumerate(_split(quantity, shard_count))
+    ])
+    MenuItem.objects.filter(pk=item.pk).update(stock_quantity=quantity, updated_at=timezone.now())
+    transaction.on_commit(lambda: _announce([item.pk]))
+
+
+@transaction.atomic
+def unshard_stock(item_id):
+    """Fold an item's shards back into MenuItem.stock_quantity"""
+    shards = StockShard.objects.select_for_update().filter(menu_item_id=item_id)
+    total = shards.aggregate(total=Sum('quantity'))['total']
+    if total is None:
+        return
+    MenuItem.objects.filter(pk=item_id).update(stock_quantity=total, updated_at=timezone.now())
+    shards.delete()
+    transaction.on_commit(lambda: _announce([item_id]))
+
+
+def reconcile(item_ids=None):
+    """
+    Write shard totals back into MenuItem.stock_quantity so is_low_stock,
+    is_out_of_stock and the admin see current numbers. Returns changed ids.
+    """
+    shards = StockShard.objects.all()
+    if item_ids is not None:
+        shards = shards.filter(menu_item_id__in=item_ids)
+    totals = dict(shards.values('menu_item_id').annotate(total=Sum('quantity')).values_list('menu_item_id', 'total'))
+    current = dict(MenuItem.objects.filter(pk__in=totals).values_list('pk', 'stock_quantity'))
+
+    changed = [item_id for item_id, total in totals.items() if current.get(item_id) != total]
+    now = timezone.now()
+    for item_id in changed:
+        MenuItem.objects.filter(pk=item_id).update(stock_quantity=totals[item_id], updated_at=now)
+    if changed:
+        _announce(changed)
+    return changed
+
+
+def maybe_reconcile(item_ids):
+    """
+    Reconcile, but each item at most once per RECONCILE_INTERVAL across all
+    workers. Items that were throttled get a trailing reconcile from this
+    process once the interval has passed, so the last order of a burst is
+    written back even if no other order follows it.
+    """
+    now = timezone.now()
+    due = Q(stock_reconciled_at__isnull=True) | Q(stock_reconciled_at__lte=now - timedelta(seconds=RECONCILE_INTERVAL))
+    # Of the workers racing for an item, only one UPDATE still matches the row
+    claimed = []
+    throttled = []
+    for item_id in item_ids:
+        if MenuItem.objects.filter(due, pk=item_id).update(stock_reconciled_at=now):
+            claimed.append(item_id)
+        else:
+            throttled.append(item_id)
+    if claimed:
+        reconcile(claimed)
+    if throttled:
+        _schedule_trailing_reconcile(throttled)
+
+
+_pending_lock = threading.Lock()
+_pending_ids = set()
+_pending_timer = None
+
+
+def _schedule_trailing_reconcile(item_ids):
+    """One timer per process covers every item throttled until it fires"""
+    global _pending_timer
+    with _pending_lock:
+        _pending_ids.update(item_ids)
+        if _pending_timer is None:
+            _pending_timer = threading.Timer(RECONCILE_INTERVAL, _run_trailing_reconcile)
+            _pending_timer.daemon = True
+            _pending_timer.start()
+
+
+def run_pending_reconciles():
+    """Reconcile the items whose write-back was throttled; still-throttled items are scheduled again"""
+    global _pending_timer
+    with _pending_lock:
+        item_ids = sorted(_pending_ids)
+        _pending_ids.clear()
+        _pending_timer = None
+    if item_ids:
+        maybe_reconcile(item_ids)
+
+
+def _run_trailing_reconcile():
+    try:
+        run_pending_reconciles()
+    except Exception as e:
+        # The next order or reconcile_stock repairs the totals
+        logger.warning(f"Trailing stock reconcile failed: {e}")
+    finally:
+        connection.close()
+
+
+def _announce(item_ids):
+    menu_items_updated.send(sender=MenuItem, ids=item_ids, fields=['stock_quantity'])
@@ -0,0 +1,31 @@
+from django import template
+from django.utils.html import format_html
+from restaurant import derivatives
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(url, widths, fmt='jpeg'):
+    """{% srcset item.image item.image_widths 'webp' %}"""
+    if not url or not widths:
+        return ''
+    return derivatives.srcset(url, widths, fmt)
+
+
+@register.simple_tag
+def responsive_image(url, widths, alt='', css_class='', sizes='100vw', loading='lazy'):
+    """
+    <picture> serving the WebP, then JPEG, derivatives of an uploaded image,
+    falling back to the original while its derivatives are being built.
+    """
+    if not widths:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', url, alt, css_class, loading)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}">'
+        '</picture>',
+        derivatives.srcset(url, widths, 'webp'), sizes,
+        url, derivatives.srcset(url, widths, 'jpeg'), sizes, alt, css_class, loading,
+    )
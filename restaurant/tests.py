@@ -1,3 +1,728 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from .backgrounds import BackgroundIndex
+from .cache import cache_stats
+from .catalog import get_catalog
+from .instant_search import MenuSearchIndex, get_search_index
+from .menu_io import MenuImportError, export_rows, import_menu, read_rows, render_rows
+from .context_processors import site_content
+from .derivatives import variant_name
+from .models import Category, DataVersion, ItemPopularity, MenuItem, MediaAsset, SiteSettings, ContentSection, SiteImage, StockShard
+from .popularity import add_sales, get_popular_ranking, ranking_digest
+from .query_plans import SUPPORTED_VENDORS, captured_full_scans
+from .search import search_menu_items
+from .staticfiles import OptimizedStaticFilesStorage, optimized_static_path
+from .stock import (
+    InsufficientStock, reconcile, run_pending_reconciles, shard_counts, shard_stock, take_stock, unshard_stock,
+)
+
+
+class SiteContentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        SiteSettings.objects.create(site_name="Ramza's Test Kitchen")
+        ContentSection.objects.create(section='footer', description='Footer text')
+
+    def test_steady_state_render_runs_no_queries(self):
+        request = self.factory.get('/menu/')
+        site_content(request)
+
+        with self.assertNumQueries(0):
+            context = site_content(request)
+
+        self.assertEqual(context['site_settings'].site_name, "Ramza's Test Kitchen")
+        self.assertEqual(context['content_sections']['footer'].description, 'Footer text')
+
+    def test_save_invalidates_snapshot(self):
+        request = self.factory.get('/')
+        site_content(request)
+
+        section = ContentSection.objects.get(section='footer')
+        section.description = 'Updated footer'
+        with self.captureOnCommitCallbacks(execute=True):
+            section.save()
+
+        context = site_content(request)
+        self.assertEqual(context['content_sections']['footer'].description, 'Updated footer')
+
+    def test_delete_invalidates_snapshot(self):
+        request = self.factory.get('/')
+        site_content(request)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ContentSection.objects.filter(section='footer').delete()
+
+        self.assertNotIn('footer', site_content(request)['content_sections'])
+
+    def test_used_in_sections_change_invalidates_snapshot(self):
+        image = SiteImage.objects.create(name='Logo', image_type='logo', image='site_images/logo.png', alt_text='Logo')
+        request = self.factory.get('/')
+        site_content(request)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.used_in_sections.add(ContentSection.objects.get(section='footer'))
+
+        with self.assertNumQueries(3):
+            site_content(request)
+
+
+class BackgroundIndexTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        for name in ('a.jpg', 'b.png', 'c.webp', 'notes.txt', '.hidden.jpg'):
+            open(os.path.join(self.tmpdir, name), 'wb').close()
+        self.index = BackgroundIndex(self.tmpdir)
+
+    def test_indexes_only_visible_images(self):
+        self.assertEqual([image.name for image in self.index.images], ['a.jpg', 'b.png', 'c.webp'])
+        self.assertEqual(self.index.status, 'active')
+
+    def test_path_rotation_is_deterministic(self):
+        first = self.index.choose('/menu/', mode='path')
+        self.assertEqual(first, self.index.choose('/menu/', mode='path'))
+        self.assertTrue(first.startswith('images/background/'))
+
+    def test_unchanged_directory_is_not_relisted(self):
+        self.index.refresh(force=True)
+        with mock.patch('restaurant.backgrounds.os.scandir') as scandir:
+            self.index.refresh(force=False)
+            self.index._checked_at = 0
+            self.index.refresh()
+        scandir.assert_not_called()
+
+
+class MenuCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.burgers = Category.objects.create(name='Burgers', sort_order=1)
+        self.hidden = Category.objects.create(name='Secret', is_active=False)
+        self.burger = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=self.burgers, is_featured=True)
+        MenuItem.objects.create(name='Ramza Special', description='Chicken', price='14.99', category=self.burgers)
+        MenuItem.objects.create(name='Sold Out', description='Gone', price='9.99', category=self.burgers, is_available=False)
+        MenuItem.objects.create(name='Off Menu', description='Hidden', price='9.99', category=self.hidden)
+
+    def test_groups_available_items_by_active_category(self):
+        catalog = get_catalog()
+        self.assertEqual(catalog.category_names, ('Burgers',))
+        self.assertEqual([item.name for item in catalog.categories[0].items], ['Chill Burger', 'Ramza Special'])
+        self.assertEqual([item.name for item in catalog.featured], ['Chill Burger'])
+        self.assertEqual(catalog.get_item(self.burger.id).category, 'Burgers')
+
+    def test_compiled_once_and_swapped_on_change(self):
+        catalog = get_catalog()
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalog(), catalog)
+
+        self.burger.price = Decimal('13.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.burger.save()
+
+        self.assertEqual(get_catalog().get_item(self.burger.id).price, Decimal('13.50'))
+
+    def test_edit_is_published_when_its_transaction_commits(self):
+        catalog = get_catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.burger.price = Decimal('99.00')
+            self.burger.save()
+            # Other threads still read the committed rows, so a snapshot rebuilt now must not take the new version
+            self.assertIs(get_catalog(), catalog)
+            self.assertEqual(get_catalog().get_item(self.burger.id).price, Decimal('12.99'))
+
+        self.assertEqual(get_catalog().get_item(self.burger.id).price, Decimal('99.00'))
+
+    def test_change_in_another_worker_reaches_this_one(self):
+        get_catalog()
+        # Another worker saves the item: the row and the shared version change, not this process's cache
+        MenuItem.objects.filter(pk=self.burger.pk).update(price=Decimal('15.00'))
+        DataVersion.objects.filter(name='catalog').update(token='other-worker')
+        self.assertEqual(get_catalog().get_item(self.burger.id).price, Decimal('12.99'))
+
+        # Once this process's copy of the versions expires, the catalog is rebuilt
+        cache.delete('ramza:version:catalog')
+        self.assertEqual(get_catalog().get_item(self.burger.id).price, Decimal('15.00'))
+
+    def test_menu_page_reads_from_catalog(self):
+        self.client.get('/menu/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/menu/')
+        self.assertContains(response, 'Ramza Special')
+        self.assertNotContains(response, 'Off Menu')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Burgers')
+        self.item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=category)
+
+    def test_matching_etag_returns_304_without_queries(self):
+        response = self.client.get('/menu/')
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_menu_changes(self):
+        etag = self.client.get('/').headers['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_when_another_worker_changes_menu(self):
+        etag = self.client.get('/menu/').headers['ETag']
+        MenuItem.objects.filter(pk=self.item.pk).update(price='13.99', updated_at=timezone.now())
+        DataVersion.objects.filter(name='catalog').update(token='other-worker')
+
+        # This worker's copy of the shared versions expires
+        cache.delete('ramza:version:catalog')
+        response = self.client.get('/menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'R13.99')
+
+    def test_cart_ignores_catalog_changes(self):
+        etag = self.client.get('/cart/').headers['ETag']
+
+        self.item.delete()
+
+        self.assertEqual(self.client.get('/cart/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['template_fragments'].clear()
+        cache_stats.reset()
+        category = Category.objects.create(name='Burgers')
+        self.item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=category)
+
+    def test_second_anonymous_hit_is_served_from_page_cache(self):
+        self.client.get('/menu/')
+        response = self.client.get('/menu/')
+
+        self.assertContains(response, 'Chill Burger')
+        self.assertEqual(cache_stats.snapshot()['page'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_admin_edit_shows_up_immediately(self):
+        self.client.get('/menu/')
+        staff = User.objects.create_user('chef', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/dashboard/menu-items/edit/{self.item.id}/', {
+                'name': 'Chill Burger Deluxe',
+                'description': 'Beef',
+                'price': '15.00',
+                'category': self.item.category_id,
+                'stock_quantity': 50,
+                'is_available': 'on',
+            })
+        self.client.logout()
+
+        response = self.client.get('/menu/')
+        self.assertContains(response, 'Chill Burger Deluxe')
+        self.assertContains(response, 'R15.00')
+
+    def test_edit_in_another_worker_skips_the_cached_page(self):
+        self.client.get('/menu/')
+        MenuItem.objects.filter(pk=self.item.pk).update(name='Chill Burger Deluxe', updated_at=timezone.now())
+        DataVersion.objects.filter(name='catalog').update(token='other-worker')
+        cache.delete('ramza:version:catalog')
+
+        self.assertContains(self.client.get('/menu/'), 'Chill Burger Deluxe')
+        self.assertEqual(cache_stats.snapshot()['page']['hits'], 0)
+
+    def test_fragments_are_reused_across_page_versions(self):
+        self.client.get('/menu/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Drinks')
+        self.client.get('/menu/')
+
+        stats = cache_stats.snapshot()
+        self.assertEqual(stats['fragment:menu_category_grid']['hits'], 1)
+        self.assertEqual(stats['fragment:site_nav']['hits'], 1)
+
+
+class StockShardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Burgers')
+        self.item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=category, stock_quantity=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            shard_stock(self.item.pk, 4)
+
+    def tearDown(self):
+        cache.clear()
+
+    def shard_total(self):
+        return sum(StockShard.objects.filter(menu_item=self.item).values_list('quantity', flat=True))
+
+    def test_stock_is_split_across_shards(self):
+        self.assertEqual(list(StockShard.objects.filter(menu_item=self.item).values_list('quantity', flat=True)), [3, 3, 2, 2])
+        self.assertEqual(shard_counts([self.item.pk]), {self.item.pk: 4})
+
+    def test_take_stock_spans_shards_and_never_oversells(self):
+        with transaction.atomic():
+            take_stock({self.item.pk: 7})
+        self.assertEqual(self.shard_total(), 3)
+
+        with self.assertRaises(InsufficientStock):
+            with transaction.atomic():
+                take_stock({self.item.pk: 4})
+        self.assertEqual(self.shard_total(), 3)
+
+    def test_reconcile_updates_stock_quantity(self):
+        self.assertTrue(self.item.reduce_stock(6))
+        self.assertEqual(reconcile(), [self.item.pk])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_quantity, 4)
+        self.assertTrue(self.item.is_low_stock)
+
+    def test_reconcile_runs_at_most_once_per_interval(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            take_stock({self.item.pk: 2})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_quantity, 8)
+
+        # Another worker's order right after: the write-back waits for the next interval
+        with mock.patch('restaurant.stock.threading.Timer') as timer:
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                take_stock({self.item.pk: 3})
+            self.item.refresh_from_db()
+            self.assertEqual(self.item.stock_quantity, 8)
+            timer.assert_called_once()
+
+            # No order follows: the trailing reconcile scheduled for the burst brings the total in
+            MenuItem.objects.filter(pk=self.item.pk).update(stock_reconciled_at=timezone.now() - timedelta(seconds=5))
+            run_pending_reconciles()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_quantity, self.shard_total())
+        self.assertEqual(self.item.stock_quantity, 5)
+
+    def test_admin_stock_edit_resplits_shards(self):
+        self.item.stock_quantity = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        self.assertEqual(self.shard_total(), 20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            unshard_stock(self.item.pk)
+        self.assertEqual(shard_counts([self.item.pk]), {})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock_quantity, 20)
+
+
+class MediaInventoryTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Burgers')
+
+    def upload(self, name, size=(60, 40)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_records_dimensions_size_and_hash(self):
+        item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99',
+                                       category=self.category, image=self.upload('burger.png'))
+        asset = MediaAsset.objects.get(owner_model='restaurant.menuitem', owner_id=item.pk)
+        self.assertEqual((asset.collection, asset.width, asset.height), ('menu_items', 60, 40))
+        self.assertEqual(asset.size, item.image.size)
+        self.assertEqual(len(asset.content_hash), 64)
+        self.assertEqual(asset.url, item.image.url)
+
+    def test_unchanged_file_is_not_read_again(self):
+        item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99',
+                                       category=self.category, image=self.upload('burger.png'))
+        item.name = 'Chillest Burger'
+        with mock.patch('restaurant.media.inspect_file') as inspect:
+            item.save()
+        inspect.assert_not_called()
+        self.assertEqual(MediaAsset.objects.get(owner_id=item.pk, owner_model='restaurant.menuitem').name, 'Chillest Burger')
+
+    def test_cleared_and_deleted_images_leave_the_inventory(self):
+        settings = SiteSettings.objects.create(logo=self.upload('logo.png'), favicon=self.upload('icon.png', (32, 32)))
+        self.assertEqual(MediaAsset.objects.filter(collection='site').count(), 2)
+
+        settings.favicon = None
+        settings.save()
+        self.assertEqual(list(MediaAsset.objects.values_list('field', flat=True)), ['logo'])
+
+        settings.delete()
+        self.assertFalse(MediaAsset.objects.exists())
+
+    def test_upload_builds_resized_variants_for_the_catalog(self):
+        cache.clear()
+        with self.settings(IMAGE_VARIANTS_ASYNC=False), self.captureOnCommitCallbacks(execute=True):
+            item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99',
+                                           category=self.category, image=self.upload('burger.png', (800, 600)))
+        asset = MediaAsset.objects.get(owner_model='restaurant.menuitem', owner_id=item.pk)
+        self.assertEqual(asset.variants, [160, 320, 640])
+        storage = item.image.storage
+        with storage.open(variant_name(item.image.name, 320, 'webp')) as file:
+            self.assertEqual(Image.open(file).size, (320, 240))
+        self.assertTrue(storage.exists(variant_name(item.image.name, 640, 'jpeg')))
+
+        catalog_item = get_catalog().get_item(item.pk)
+        self.assertEqual(catalog_item.image_widths, (160, 320, 640))
+        html = Template('{% load images %}{% responsive_image item.image item.image_widths alt=item.name %}').render(
+            Context({'item': catalog_item}),
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f'{variant_name(item.image.url, 160, "webp")} 160w', html)
+
+        # A replacement upload drops the old variants
+        old_name = item.image.name
+        with self.settings(IMAGE_VARIANTS_ASYNC=False), self.captureOnCommitCallbacks(execute=True):
+            item.image = self.upload('burger2.png', (200, 100))
+            item.save()
+        self.assertFalse(storage.exists(variant_name(old_name, 320, 'webp')))
+        self.assertEqual(MediaAsset.objects.get(pk=asset.pk).variants, [160])
+
+    def test_variants_of_same_named_images_do_not_collide(self):
+        self.assertNotEqual(variant_name('menu_items/burger.png', 320, 'webp'),
+                            variant_name('menu_items/burger.jpg', 320, 'webp'))
+
+    def test_shared_file_keeps_its_variants_while_still_used(self):
+        with self.settings(IMAGE_VARIANTS_ASYNC=False), self.captureOnCommitCallbacks(execute=True):
+            item = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99',
+                                           category=self.category, image=self.upload('burger.png', (800, 600)))
+            twin = MenuItem.objects.create(name='Chill Burger Meal', description='Beef', price='15.99',
+                                           category=self.category, image=item.image.name)
+        storage = item.image.storage
+        variant = variant_name(item.image.name, 320, 'webp')
+
+        item.delete()
+        self.assertTrue(storage.exists(variant))
+        twin.delete()
+        self.assertFalse(storage.exists(variant))
+
+
+class StaticImageOptimizationTests(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        os.makedirs(os.path.join(self.source_dir, 'images'))
+        Image.new('RGB', (1200, 800), 'orange').save(os.path.join(self.source_dir, 'images', 'kota.jpeg'), 'JPEG', quality=95)
+        self.source = FileSystemStorage(location=self.source_dir)
+
+    def collect(self):
+        storage = OptimizedStaticFilesStorage(location=self.static_root, base_url='/static/')
+        paths = {'images/kota.jpeg': (self.source, 'images/kota.jpeg')}
+        storage._save('images/kota.jpeg', self.source.open('images/kota.jpeg'))
+        with self.settings(STATIC_IMAGE_WORKERS=1):
+            processed = {name: hashed for name, hashed, _ in storage.post_process(paths)}
+        return storage, processed
+
+    def test_collectstatic_writes_hashed_resized_variants(self):
+        storage, processed = self.collect()
+        self.assertEqual(storage.image_variants['images/kota.jpeg']['widths'], [480, 960, 1200])
+        for name in ('images/kota.jpeg.w480.webp', 'images/kota.jpeg.w960.jpg', 'images/kota.jpeg.w1200.webp'):
+            self.assertIn(name, processed)
+            self.assertNotEqual(processed[name], name)
+        with storage.open('images/kota.jpeg.w480.webp') as file:
+            self.assertEqual(Image.open(file).size, (480, 320))
+
+        with mock.patch('restaurant.staticfiles.staticfiles_storage', storage):
+            self.assertEqual(optimized_static_path('images/kota.jpeg', 1000), 'images/kota.jpeg.w960.jpg')
+            self.assertEqual(optimized_static_path('images/other.jpeg', 1000), 'images/other.jpeg')
+
+    def test_unchanged_images_are_not_encoded_again(self):
+        self.collect()
+        with mock.patch('restaurant.staticfiles.ProcessPoolExecutor') as pool:
+            storage, processed = self.collect()
+        pool.assert_not_called()
+        self.assertIn('images/kota.jpeg.w960.webp', processed)
+
+
+class QueryPlanTests(TestCase):
+    """The public pages' queries must stay on indexes as the tables grow"""
+
+    def setUp(self):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            self.skipTest(f'No plan inspection for {connection.vendor}')
+        cache.clear()
+        burgers = Category.objects.create(name='Burgers')
+        for n in range(5):
+            MenuItem.objects.create(name=f'Burger {n}', description='Beef', price='9.99', category=burgers,
+                                    is_featured=n == 0, is_available=n != 4)
+        SiteImage.objects.create(name='Logo', image_type='logo', image='site_images/logo.png', alt_text='Logo')
+
+    def assertNoFullScans(self, captured):
+        regressions = captured_full_scans(captured.captured_queries)
+        self.assertEqual(regressions, {}, 'Queries regressed to full table scans')
+
+    def test_public_pages(self):
+        for url in ('/', '/menu/', '/api/menu/', '/api/categories/'):
+            cache.clear()
+            with self.subTest(url=url), CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertNoFullScans(captured)
+
+    def test_detects_a_full_scan(self):
+        with CaptureQueriesContext(connection) as captured:
+            list(MenuItem.objects.filter(stock_quantity__lt=5))
+        self.assertEqual(list(captured_full_scans(captured.captured_queries).values()), [['restaurant_menuitem']])
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        burgers = Category.objects.create(name='Burgers')
+        self.chill = MenuItem.objects.create(name='Chill Burger', description='Beef patty with cheese', price='12.99',
+                                             category=burgers, ingredients='beef, cheddar, chilli')
+        self.melt = MenuItem.objects.create(name='Cheese Melt', description='Toasted sandwich', price='8.99',
+                                            category=burgers, ingredients='bread, cheese')
+        MenuItem.objects.create(name='Cola', description='Cold drink', price='2.99', category=burgers)
+
+    def names(self, query):
+        return [item.name for item in search_menu_items(query)]
+
+    def test_ranks_name_matches_first_and_matches_prefixes(self):
+        self.assertEqual(self.names('cheese'), ['Cheese Melt', 'Chill Burger'])
+        self.assertEqual(self.names('chedd'), ['Chill Burger'])
+        self.assertEqual(self.names('burgers beef'), ['Chill Burger'])
+        self.assertEqual(self.names('!!'), [])
+
+    def test_index_follows_saves_updates_and_deletes(self):
+        self.melt.name = 'Toastie'
+        self.melt.save()
+        self.assertEqual(self.names('toastie'), ['Toastie'])
+        MenuItem.objects.filter(pk=self.chill.pk).update(ingredients='tofu')
+        self.assertEqual(self.names('tofu'), ['Chill Burger'])
+        self.chill.delete()
+        self.assertEqual(self.names('tofu'), [])
+
+    def test_admin_list_pages_through_ranked_results(self):
+        admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get('/dashboard/menu-items/', {'search': 'cheese'})
+        self.assertEqual([item.name for item in response.context['page_obj']], ['Cheese Melt', 'Chill Burger'])
+
+
+class InstantSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        burgers = Category.objects.create(name='Burgers')
+        drinks = Category.objects.create(name='Drinks')
+        self.chill = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=burgers)
+        MenuItem.objects.create(name='Cheese Melt', description='Toasted', price='8.99', category=burgers)
+        self.cola = MenuItem.objects.create(name='Cola', description='Cold', price='2.99', category=drinks)
+
+    def names(self, query):
+        return [item.name for item in get_search_index().search(query)]
+
+    def test_completes_prefixes_and_tolerates_typos(self):
+        self.assertEqual(self.names('chi'), ['Chill Burger'])
+        self.assertEqual(self.names('chese'), ['Cheese Melt'])
+        # Name matches outrank category matches
+        self.assertEqual(self.names('burger'), ['Chill Burger', 'Cheese Melt'])
+        self.assertEqual(self.names('chill burg'), ['Chill Burger'])
+        self.assertEqual(self.names('pizza'), [])
+
+    def test_rebuilds_only_changed_items(self):
+        index = get_search_index()
+        self.assertIs(get_search_index(), index)
+
+        self.cola.name = 'Iced Tea'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola.save()
+        rebuilt = get_search_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(self.names('iced'), ['Iced Tea'])
+        self.assertEqual(self.names('cola'), [])
+        # Unchanged items keep their documents; the old index still answers as before
+        self.assertIs(rebuilt.documents[self.chill.id], index.documents[self.chill.id])
+        self.assertEqual([item.name for item in index.search('cola')], ['Cola'])
+
+    def test_incremental_index_matches_a_fresh_build(self):
+        get_search_index()
+        self.chill.delete()
+        MenuItem.objects.create(name='Chilli Dog', description='Spicy', price='7.99', category=self.cola.category)
+        incremental = get_search_index()
+        fresh = MenuSearchIndex(get_catalog())
+        self.assertEqual(incremental.postings, fresh.postings)
+        self.assertEqual(incremental.vocabulary, fresh.vocabulary)
+        self.assertEqual(incremental.trigram_postings, fresh.trigram_postings)
+
+
+class MenuImportExportTests(TestCase):
+    def setUp(self):
+        self.burgers = Category.objects.create(name='Burgers')
+        self.chill = MenuItem.objects.create(name='Chill Burger', description='Beef', price='12.99', category=self.burgers)
+
+    def import_csv(self, text):
+        return import_menu(read_rows(io.StringIO(text), 'csv'), chunk_size=2)
+
+    def test_upserts_items_and_creates_missing_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.import_csv(
+                'name,category,description,price,is_available\n'
+                'Chill Burger,burgers,Beef and chilli,13.50,yes\n'
+                'Cola,Drinks,Cold,2.99,1\n'
+                'Lemonade,Drinks,Fresh,3.49,no\n'
+            )
+        self.assertEqual((result.rows, result.created, result.updated, result.categories_created), (3, 2, 1, 1))
+        self.chill.refresh_from_db()
+        self.assertEqual((self.chill.price, self.chill.description), (Decimal('13.50'), 'Beef and chilli'))
+        lemonade = MenuItem.objects.get(name='Lemonade')
+        self.assertEqual((lemonade.category.name, lemonade.is_available), ('Drinks', False))
+        # The catalog, and the database search index, see the imported items
+        self.assertEqual({item.name for item in get_catalog().items}, {'Chill Burger', 'Cola'})
+        self.assertEqual([item.name for item in search_menu_items('lemon')], ['Lemonade'])
+
+    def test_bad_row_imports_nothing(self):
+        with self.assertRaisesMessage(MenuImportError, 'Row 2: invalid price'):
+            self.import_csv('name,category,price\nCola,Drinks,2.99\nTea,Drinks,free\n')
+        self.assertFalse(MenuItem.objects.filter(name='Cola').exists())
+        self.assertFalse(Category.objects.filter(name='Drinks').exists())
+
+    def test_rows_with_other_columns_are_rejected(self):
+        rows = [
+            {'name': 'Cola', 'category': 'Drinks', 'price': '2.99'},
+            {'name': 'Tea', 'category': 'Drinks', 'price': '1.99'},
+            {'name': 'Chill Burger', 'category': 'Burgers', 'price': '13.50', 'stock_quantity': 5},
+        ]
+        with self.assertRaisesMessage(MenuImportError, 'Row 3: columns differ from the first row (missing: none; extra: stock_quantity)'):
+            import_menu(rows, chunk_size=2)
+        self.chill.refresh_from_db()
+        self.assertEqual(self.chill.price, Decimal('12.99'))
+
+    def test_non_text_values_in_text_columns_are_rejected(self):
+        rows = [{'name': 'Cola', 'category': 5, 'price': '2.99'}]
+        with self.assertRaisesMessage(MenuImportError, 'Row 1: invalid category: 5'):
+            import_menu(rows)
+        with self.assertRaisesMessage(MenuImportError, "Row 1: invalid name: ['Cola']"):
+            import_menu([{'name': ['Cola'], 'category': 'Drinks', 'price': '2.99'}])
+        self.assertFalse(MenuItem.objects.filter(name='Cola').exists())
+
+    def test_json_export_round_trips(self):
+        exported = ''.join(render_rows(export_rows(), 'json'))
+        MenuItem.objects.all().delete()
+        result = import_menu(read_rows(io.StringIO(exported), 'json'))
+        self.assertEqual((result.created, result.updated), (1, 0))
+        self.assertEqual(list(MenuItem.objects.values_list('name', 'price')), [('Chill Burger', Decimal('12.99'))])
+
+    def test_admin_import_and_export(self):
+        admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('menu.csv', '\ufeffname,category,price\nCola,Drinks,2.99\n'.encode())
+        response = self.client.post('/dashboard/menu-items/import/', {'file': upload})
+        self.assertRedirects(response, '/dashboard/menu-items/', fetch_redirect_response=False)
+        self.assertTrue(MenuItem.objects.filter(name='Cola', category__name='Drinks').exists())
+
+        # Bad files are reported rather than failing the request
+        oversized = b'name,category,price\n"Tea' + b'a' * 200000 + b'",Drinks,1.99\n'
+        for name, content in (('menu.json', b'[{"name": "Tea", "category": 5, "price": 1}]'), ('menu.csv', oversized)):
+            with self.subTest(name=name):
+                response = self.client.post('/dashboard/menu-items/import/', {'file': SimpleUploadedFile(name, content)})
+                self.assertRedirects(response, '/dashboard/menu-items/', fetch_redirect_response=False)
+        self.assertFalse(MenuItem.objects.filter(name__startswith='Tea').exists())
+
+        response = self.client.get('/dashboard/menu-items/export/', {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'category'])
+        self.assertEqual(len(lines), 3)
+
+
+class PopularItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        burgers = Category.objects.create(name='Burgers')
+        self.items = [
+            MenuItem.objects.create(name=name, description='Tasty', price='9.99', category=burgers)
+            for name in ('Alpha Burger', 'Beta Burger', 'Gamma Burger', 'Delta Burger')
+        ]
+
+    def sell(self, units, sign=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            add_sales(units, sign)
+
+    def test_recent_sales_outweigh_older_ones(self):
+        alpha, beta, gamma, _ = self.items
+        now = timezone.now()
+        # Three weeks is three half-lives: 5 units then count for 0.625
+        self.sell({(alpha.id, now - timedelta(days=21)): 5, (beta.id, now): 1, (gamma.id, now - timedelta(days=7)): 1})
+        self.assertEqual(get_popular_ranking().item_ids, (beta.id, alpha.id, gamma.id))
+
+        # Taking back a sale restores the previous scores exactly
+        self.sell({(gamma.id, now): 2})
+        self.assertEqual(get_popular_ranking().item_ids[0], gamma.id)
+        self.sell({(gamma.id, now): 2}, sign=-1)
+        self.assertEqual(get_popular_ranking().item_ids, (beta.id, alpha.id, gamma.id))
+
+    def test_sales_leave_menu_item_rows_alone(self):
+        alpha = self.items[0]
+        updated_at = MenuItem.objects.get(pk=alpha.pk).updated_at
+        with CaptureQueriesContext(connection) as captured:
+            self.sell({(alpha.id, timezone.now()): 1})
+            self.sell({(alpha.id, timezone.now()): 1})
+        self.assertFalse([query for query in captured.captured_queries
+                          if query['sql'].startswith('UPDATE') and 'restaurant_menuitem' in query['sql'].split('SET')[0]])
+        self.assertEqual(MenuItem.objects.get(pk=alpha.pk).updated_at, updated_at)
+        self.assertEqual(get_popular_ranking().item_ids, (alpha.id,))
+
+    def test_ranking_version_changes_only_with_the_order(self):
+        alpha, beta = self.items[:2]
+        self.sell({(alpha.id, timezone.now()): 2, (beta.id, timezone.now()): 1})
+        ranking = get_popular_ranking()
+        self.sell({(alpha.id, timezone.now()): 1, (beta.id, timezone.now()): 1})
+        self.assertIs(get_popular_ranking(), ranking)
+        self.sell({(beta.id, timezone.now()): 5})
+        self.assertNotEqual(get_popular_ranking().digest, ranking.digest)
+
+    def test_ranking_changed_by_another_worker_is_picked_up(self):
+        alpha, beta = self.items[:2]
+        self.sell({(alpha.id, timezone.now()): 2})
+        self.assertEqual(get_popular_ranking().item_ids, (alpha.id,))
+
+        # Another worker records a sale: its refresh writes the new ranking's digest to the shared version
+        ItemPopularity.objects.create(menu_item=beta, score=ItemPopularity.objects.get(pk=alpha.pk).score * 2)
+        DataVersion.objects.filter(name='popular_items').update(token=ranking_digest([beta.id, alpha.id]))
+        cache.delete('ramza:version:popular_items')
+        self.assertEqual(get_popular_ranking().item_ids, (beta.id, alpha.id))
+
+    def test_home_shows_pins_then_popular_items(self):
+        alpha, beta, gamma, delta = self.items
+        delta.is_featured = True
+        delta.save()
+        self.sell({(gamma.id, timezone.now()): 3, (beta.id, timezone.now()): 1})
+        response = self.client.get('/')
+        self.assertEqual([item['name'] for item in response.context['featured_items']],
+                         ['Delta Burger', 'Gamma Burger', 'Beta Burger'])
+        etag = response['ETag']
+
+        # A new best seller is a new page version, not a stale cached page
+        self.sell({(alpha.id, timezone.now()): 10})
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Alpha Burger')
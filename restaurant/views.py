@@ -1,10 +1,15 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.shortcuts import render
-import random
-import os
-from django.conf import settings
+from itertools import chain
+from django.templatetags.static import static
+from django.views.decorators.csrf import ensure_csrf_cookie
+from .backgrounds import background_index, select_index
+from .catalog import get_catalog
+from .conditional import cache_public_page, conditional_page
 from .models import Category, MenuItem, SiteSettings, ContentSection, SiteImage
+from .popularity import get_popular_ranking
+from .staticfiles import BACKGROUND_WIDTH, optimized_static_path
 
 # Fallback food images
 FOOD_IMAGES = [
@@ -19,30 +24,50 @@ FOOD_IMAGES = [
     'images/insta _ @gorgeous_thato_.jpeg'
 ]
 
-def get_random_background():
-    """Get a random background image from the background folder"""
+# Widest optimized copy used for menu card fallbacks
+FALLBACK_IMAGE_WIDTH = 960
+
+def get_random_background(key=None):
+    """Get a background image from the background folder index"""
     try:
-        background_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'background')
-        if os.path.exists(background_path):
-            background_files = [f for f in os.listdir(background_path) 
-                              if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp'))]
-            if background_files:
-                return f'images/background/{random.choice(background_files)}'
+        background = background_index.choose(key)
+        if background:
+            return optimized_static_path(background, BACKGROUND_WIDTH)
     except Exception:
         pass
     
     # Fallback to a food image if no background images found
-    return random.choice(FOOD_IMAGES)
+    return optimized_static_path(FOOD_IMAGES[select_index(len(FOOD_IMAGES), key)], BACKGROUND_WIDTH)
+
+def fallback_image(name):
+    """URL of a food image for `name`; always the same one so the page stays cacheable"""
+    path = FOOD_IMAGES[select_index(len(FOOD_IMAGES), name, mode='path')]
+    # The resized copy collectstatic built, if any (restaurant.staticfiles)
+    return static(optimized_static_path(path, FALLBACK_IMAGE_WIDTH))
+
+# Items shown in the home page's featured section
+HOME_FEATURED_COUNT = 3
 
+def home_featured_items(catalog, count=HOME_FEATURED_COUNT):
+    """Pinned (is_featured) items first, then the most popular, then the rest of the menu"""
+    ranking = get_popular_ranking()
+    popular = (catalog.get_item(item_id) for item_id in ranking.item_ids)
+    chosen = {}
+    for item in chain(catalog.featured, popular, catalog.items):
+        if item is not None and item.id not in chosen:
+            chosen[item.id] = item
+            if len(chosen) == count:
+                break
+    return list(chosen.values())
+
+@conditional_page(uses_popularity=True)
+@cache_public_page(uses_popularity=True)
 def home(request):
     try:
-        # Get data from database
-        categories = Category.objects.filter(is_active=True)[:4]
-        featured_items = MenuItem.objects.filter(is_featured=True, is_available=True)[:3]
-        
-        # If no featured items, get some random available items
-        if not featured_items:
-            featured_items = MenuItem.objects.filter(is_available=True)[:3]
+        # Get data from the compiled catalog
+        catalog = get_catalog()
+        categories = catalog.categories[:4]
+        featured_items = home_featured_items(catalog)
             
         # Convert to list and add fallback images
         categories_list = []
@@ -50,16 +75,17 @@ def home(request):
             categories_list.append({
                 'name': cat.name,
                 'description': cat.description,
-                'image': cat.image.url if cat.image else random.choice(FOOD_IMAGES)
+                'image': cat.image or fallback_image(cat.name),
+                'image_widths': cat.image_widths if cat.image else (),
             })
             
         # Ensure we have at least 4 categories for the template
         while len(categories_list) < 4:
             default_categories = [
-                {'name': 'Burgers', 'description': 'Juicy burgers', 'image': random.choice(FOOD_IMAGES)},
-                {'name': 'Pizzas', 'description': 'Wood-fired pizzas', 'image': random.choice(FOOD_IMAGES)},
-                {'name': 'Drinks', 'description': 'Refreshing beverages', 'image': random.choice(FOOD_IMAGES)},
-                {'name': 'Sides', 'description': 'Perfect sides', 'image': random.choice(FOOD_IMAGES)},
+                {'name': 'Burgers', 'description': 'Juicy burgers', 'image': fallback_image('Burgers')},
+                {'name': 'Pizzas', 'description': 'Wood-fired pizzas', 'image': fallback_image('Pizzas')},
+                {'name': 'Drinks', 'description': 'Refreshing beverages', 'image': fallback_image('Drinks')},
+                {'name': 'Sides', 'description': 'Perfect sides', 'image': fallback_image('Sides')},
             ]
             if len(categories_list) < len(default_categories):
                 categories_list.append(default_categories[len(categories_list)])
@@ -72,15 +98,16 @@ def home(request):
                 'id': item.id,
                 'name': item.name,
                 'price': item.price,
-                'image': item.image.url if item.image else random.choice(FOOD_IMAGES)
+                'image': item.image or fallback_image(item.name),
+                'image_widths': item.image_widths if item.image else (),
             })
             
         # Ensure we have at least 3 featured items
         while len(featured_list) < 3:
             default_featured = [
-                {'name': 'Chill Burger', 'price': 12.99, 'image': random.choice(FOOD_IMAGES)},
-                {'name': 'Chilla Margherita', 'price': 18.99, 'image': random.choice(FOOD_IMAGES)},
-                {'name': 'Ramza Fries', 'price': 4.99, 'image': random.choice(FOOD_IMAGES)},
+                {'name': 'Chill Burger', 'price': 12.99, 'image': fallback_image('Chill Burger')},
+                {'name': 'Chilla Margherita', 'price': 18.99, 'image': fallback_image('Chilla Margherita')},
+                {'name': 'Ramza Fries', 'price': 4.99, 'image': fallback_image('Ramza Fries')},
             ]
             if len(featured_list) < len(default_featured):
                 featured_list.append(default_featured[len(featured_list)])
@@ -90,15 +117,15 @@ def home(request):
     except Exception as e:
         # Fallback data if database has issues
         categories_list = [
-            {'name': 'Burgers', 'description': 'Juicy burgers', 'image': random.choice(FOOD_IMAGES)},
-            {'name': 'Pizzas', 'description': 'Wood-fired pizzas', 'image': random.choice(FOOD_IMAGES)},
-            {'name': 'Drinks', 'description': 'Refreshing beverages', 'image': random.choice(FOOD_IMAGES)},
-            {'name': 'Sides', 'description': 'Perfect sides', 'image': random.choice(FOOD_IMAGES)},
+            {'name': 'Burgers', 'description': 'Juicy burgers', 'image': fallback_image('Burgers')},
+            {'name': 'Pizzas', 'description': 'Wood-fired pizzas', 'image': fallback_image('Pizzas')},
+            {'name': 'Drinks', 'description': 'Refreshing beverages', 'image': fallback_image('Drinks')},
+            {'name': 'Sides', 'description': 'Perfect sides', 'image': fallback_image('Sides')},
         ]
         featured_list = [
-            {'name': 'Chill Burger', 'price': 12.99, 'image': random.choice(FOOD_IMAGES)},
-            {'name': 'Chilla Margherita', 'price': 18.99, 'image': random.choice(FOOD_IMAGES)},
-            {'name': 'Ramza Fries', 'price': 4.99, 'image': random.choice(FOOD_IMAGES)},
+            {'name': 'Chill Burger', 'price': 12.99, 'image': fallback_image('Chill Burger')},
+            {'name': 'Chilla Margherita', 'price': 18.99, 'image': fallback_image('Chilla Margherita')},
+            {'name': 'Ramza Fries', 'price': 4.99, 'image': fallback_image('Ramza Fries')},
         ]
     
     context = {
@@ -107,26 +134,15 @@ def home(request):
     }
     return render(request, 'home.html', context)
 
+@conditional_page()
+@cache_public_page()
 def menu(request):
     try:
-        # Get all available menu items from database
-        menu_items = MenuItem.objects.filter(is_available=True).select_related('category')
-        categories = ['All'] + list(Category.objects.filter(is_active=True).values_list('name', flat=True))
-        
-        # Convert queryset to list with proper image handling
-        menu_items_list = []
-        for item in menu_items:
-            menu_items_list.append({
-                'id': item.id,
-                'name': item.name,
-                'description': item.description,
-                'price': item.price,
-                'category': item.category.name,
-                'image': item.image.url if item.image else None  # Changed this to None instead of random image
-            })
+        # Items and category names come precompiled from the catalog
+        catalog = get_catalog()
         
         # If no items exist, create fallback data
-        if not menu_items_list:
+        if not catalog.items:
             # Create categories first
             burger_cat, _ = Category.objects.get_or_create(name='Burgers', defaults={'sort_order': 1})
             pizza_cat, _ = Category.objects.get_or_create(name='Pizzas', defaults={'sort_order': 2})
@@ -186,23 +202,35 @@ def menu(request):
                 }
             )
             
-            # Reload data
-            menu_items = MenuItem.objects.filter(is_available=True).select_related('category')
-            categories = ['All'] + list(Category.objects.filter(is_active=True).values_list('name', flat=True))
+            # Reload data (the signals above have already invalidated the catalog)
+            catalog = get_catalog()
+        
+        menu_items = catalog.items
+        catalog_categories = catalog.categories
+        categories = ('All',) + catalog.category_names
             
     except Exception as e:
         # Fallback data
         menu_items = []
+        catalog_categories = ()
         categories = ['All', 'Burgers', 'Pizzas', 'Drinks', 'Sides']
     
     context = {
-        'menu_items': menu_items_list if 'menu_items_list' in locals() else [],
+        'menu_items': menu_items,
+        # Item grids are rendered per category so each can be fragment-cached
+        'catalog_categories': catalog_categories,
         'categories': categories,
     }
     return render(request, 'menu.html', context)
 
+@conditional_page(uses_catalog=False)
+@cache_public_page(uses_catalog=False)
 def cart(request):
     return render(request, 'cart.html')
 
+# The cached page carries no token, so the order form reads it from the csrftoken cookie
+@ensure_csrf_cookie
+@conditional_page(uses_catalog=False)
+@cache_public_page(uses_catalog=False)
 def checkout(request):
     return render(request, 'checkout.html')
\ No newline at end of file
@@ -39,7 +39,8 @@ else:
 # Collect static files
 print("Collecting static files...")
 try:
-    execute_from_command_line(['manage.py', 'collectstatic', '--noinput', '--verbosity=1', '--clear'])
+    # No --clear: unchanged images keep their optimized copies from the last run
+    execute_from_command_line(['manage.py', 'collectstatic', '--noinput', '--verbosity=1'])
     print("Static files collected successfully")
 except Exception as e:
     print(f"Error collecting static files: {e}")
@@ -85,6 +86,8 @@ try:
         'fastfood_restaurant.wsgi:application', 
         '--bind', f'0.0.0.0:{port}',
         '--workers', '4',
+        # Threads, so open live order board streams don't occupy whole workers
+        '--threads', '8',
         '--timeout', '120'
     ])
 except Exception as e: